@@ -1,5 +1,7 @@
 import os
+import click
 from flask import Flask, redirect, url_for
+from flask.cli import AppGroup
 from app.config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -12,11 +14,14 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app.services.storage_service import UploadRequest
+    app.request_class = UploadRequest
+
     db.init_app(app)
     migrate.init_app(app, db)
     
     with app.app_context():
-        from app.models import patient, image, site
+        from app.models import patient, image, site, patient_site_readiness, data_version, image_daily_rollup, image_blob
 
 
     from app.controllers.web.patient_controller import patient_bp
@@ -46,6 +51,115 @@ def create_app(config_class=Config):
 
             clean_upload_directory(app)
 
+    @app.cli.command("backfill-readiness")
+    def backfill_readiness():
+        """Rebuild the patient/site AI-readiness table from the images table."""
+        from app.services.readiness_service import ReadinessService
+
+        with app.app_context():
+            rows = ReadinessService().backfill()
+            print(f"Readiness table rebuilt with {rows} patient/site rows")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups():
+        """Rebuild the daily image rollup table from the images table."""
+        from app.services.rollup_service import RollupService
+
+        with app.app_context():
+            rows = RollupService().rebuild()
+            print(f"Daily rollups rebuilt with {rows} rows")
+
+    @app.cli.command("backfill-image-details")
+    def backfill_image_details():
+        """Record file size, dimensions, mode and format of images stored without them."""
+        from app.services.image_service import ImageService
+
+        with app.app_context():
+            updated, failed = ImageService().backfill_file_details()
+            print(f"File details recorded for {updated} images, {failed} failed")
+
+    @app.cli.command("analyze-pending")
+    def analyze_pending():
+        """Run the over-illumination analysis of images still marked pending."""
+        from app.services.image_service import ImageService
+
+        with app.app_context():
+            analyzed, failed = ImageService().analyze_pending()
+            print(f"Analyzed {analyzed} pending images, {failed} failed")
+
+    @app.cli.command("backfill-thumbnails")
+    def backfill_thumbnails():
+        """Generate missing thumbnails and previews for all stored images."""
+        from app.models.image import Image
+        from app.services.thumbnail_service import ThumbnailService
+
+        with app.app_context():
+            image_paths = (
+                row.image_path
+                for row in db.session.query(Image.image_path).distinct().yield_per(1000)
+            )
+            processed, failed = ThumbnailService().backfill(image_paths)
+            print(f"Thumbnails generated for {processed} images, {failed} failed")
+
+    @app.cli.command("generate-tiles")
+    def generate_tiles():
+        """Build missing Deep Zoom tile pyramids for all stored images."""
+        from app.models.image import Image
+        from app.services.tile_service import TileService
+
+        with app.app_context():
+            image_paths = (
+                row.image_path
+                for row in db.session.query(Image.image_path).distinct().yield_per(1000)
+            )
+            processed, failed = TileService().backfill(image_paths)
+            print(f"Tiles generated for {processed} images, {failed} failed")
+
+    images_cli = AppGroup("images", help="Image maintenance commands.")
+
+    @images_cli.command("reanalyze")
+    @click.option("--threshold", type=float, default=None, help="Luminance threshold, default ILLUMINATION_THRESHOLD.")
+    @click.option("--max-edge", type=int, default=None, help="Analyze downsampled to this edge, default ILLUMINATION_MAX_EDGE.")
+    @click.option("--workers", type=int, default=None, help="Worker processes, default all available cores.")
+    @click.option("--batch-size", type=int, default=500, show_default=True, help="Images per write and checkpoint.")
+    @click.option("--checkpoint", default=None, help="Progress file, default instance/reanalyze-checkpoint.json.")
+    @click.option("--restart", is_flag=True, help="Ignore the checkpoint and start from the first image.")
+    def reanalyze(threshold, max_edge, workers, batch_size, checkpoint, restart):
+        """Re-run the over-illumination analysis of every image on all cores."""
+        from app.services.reanalysis_service import ReanalysisService
+
+        with app.app_context():
+            if threshold is None:
+                threshold = app.config.get("ILLUMINATION_THRESHOLD", 0.9)
+            if max_edge is None:
+                max_edge = app.config.get("ILLUMINATION_MAX_EDGE")
+            checkpoint = checkpoint or os.path.join(app.instance_path, "reanalyze-checkpoint.json")
+
+            def report(summary):
+                print(
+                    f"{summary['processed']}/{summary['remaining']} images, "
+                    f"{summary['images_per_second']} images/sec"
+                )
+
+            summary = ReanalysisService().reanalyze(
+                threshold,
+                max_edge=max_edge,
+                workers=workers,
+                batch_size=batch_size,
+                checkpoint_path=checkpoint,
+                restart=restart,
+                progress=report,
+            )
+            if summary["resumed_from"]:
+                print(f"Resumed after image {summary['resumed_from']}")
+            print(
+                f"Reanalyzed {summary['processed']} images in {summary['elapsed']}s "
+                f"({summary['images_per_second']} images/sec), "
+                f"{summary['changed']} changed, {summary['failed']} failed"
+            )
+
+    app.cli.add_command(images_cli)
+
     setup_upload_destination(app)
 
     return app
@@ -53,51 +167,30 @@ def create_app(config_class=Config):
 
 
 def clean_upload_directory(app):
-    """Remove all files and subdirectories from both upload folders."""
+    """Remove all files and subdirectories from the upload folder."""
     try:
-        import shutil
-        # Clean main upload folder
-        if os.path.exists(app.config['UPLOAD_FOLDER']):
-            for file in os.listdir(app.config['UPLOAD_FOLDER']):
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], file)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-        
-        # Clean static uploads folder
-        static_uploads = os.path.join(app.static_folder, 'uploads/images')
-        if os.path.exists(static_uploads):
-            for file in os.listdir(static_uploads):
-                file_path = os.path.join(static_uploads, file)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-        
-        print("All uploaded files have been removed from both directories!")
+        from app.services.storage_service import StorageService
+
+        with app.app_context():
+            StorageService().clear()
+
+        print("All uploaded files have been removed!")
     except Exception as e:
-        print(f"Error cleaning upload directories: {e}")
+        print(f"Error cleaning upload directory: {e}")
 
 
 def setup_upload_destination(app):
     """
-    Set up the upload directory structure without symlinks.
+    Set up the upload directory, the only place image files are stored;
+    they are served by the images blueprint.
     """
-    # Create the main upload folder
     upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
     os.makedirs(upload_folder, exist_ok=True)
     
-    # Create the static uploads folder for web access
-    static_uploads = os.path.join(app.static_folder, 'uploads/images')
-    os.makedirs(static_uploads, exist_ok=True)
-    
     # Set permissions to ensure both Flask and Docker can write
     try:
         os.chmod(upload_folder, 0o777)
-        os.chmod(static_uploads, 0o777)
     except Exception as e:
         print(f"Warning: Could not set permissions: {e}")
         
     print(f"Upload folder: {upload_folder}")
-    print(f"Static images folder: {static_uploads}")
\ No newline at end of file
@@ -8,4 +8,64 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATION = False
 
-    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads/images'
\ No newline at end of file
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads/images'
+
+    # Largest accepted request body and image file, in bytes
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH') or 64 * 1024 * 1024)
+
+    # Seconds a worker may serve cached dashboard statistics before checking
+    # the database for writes made by other processes
+    STATISTICS_CACHE_MAX_STALENESS = float(os.environ.get('STATISTICS_CACHE_MAX_STALENESS') or 5)
+
+    # Serve the last computed dashboard statistics while a background thread
+    # recomputes them after writes; the refresh waits for writes to pause for
+    # STATISTICS_REFRESH_DEBOUNCE seconds so bulk imports trigger one refresh
+    STATISTICS_BACKGROUND_REFRESH = (os.environ.get('STATISTICS_BACKGROUND_REFRESH') or 'true').lower() == 'true'
+    STATISTICS_REFRESH_DEBOUNCE = float(os.environ.get('STATISTICS_REFRESH_DEBOUNCE') or 1)
+
+    # Dashboard live updates: "poll" revalidates the counters every
+    # DASHBOARD_POLL_INTERVAL seconds with their ETag; "stream" pushes them
+    # over server-sent events, which holds a worker thread per open dashboard
+    # and is only suited to async workers (see README)
+    DASHBOARD_LIVE_UPDATES = (os.environ.get('DASHBOARD_LIVE_UPDATES') or 'poll').lower()
+    DASHBOARD_POLL_INTERVAL = float(os.environ.get('DASHBOARD_POLL_INTERVAL') or 10)
+
+    # Dashboard event stream: seconds between data version checks, between
+    # keepalive comments, and before the stream ends and the browser reconnects
+    DASHBOARD_STREAM_INTERVAL = float(os.environ.get('DASHBOARD_STREAM_INTERVAL') or 2)
+    DASHBOARD_STREAM_KEEPALIVE = float(os.environ.get('DASHBOARD_STREAM_KEEPALIVE') or 15)
+    DASHBOARD_STREAM_DURATION = float(os.environ.get('DASHBOARD_STREAM_DURATION') or 30)
+
+    # After each upload, build Deep Zoom tile pyramids for the image viewer and
+    # resized WebP/AVIF/JPEG variants for the pages, on a background pool of
+    # IMAGE_WORKER_THREADS threads with at most IMAGE_WORKER_QUEUE_SIZE tasks
+    # waiting or running; work beyond that is left to the backfill commands
+    IMAGE_TILE_GENERATION = (os.environ.get('IMAGE_TILE_GENERATION') or 'true').lower() == 'true'
+    IMAGE_VARIANT_GENERATION = (os.environ.get('IMAGE_VARIANT_GENERATION') or 'true').lower() == 'true'
+    IMAGE_WORKER_THREADS = int(os.environ.get('IMAGE_WORKER_THREADS') or 1)
+    IMAGE_WORKER_QUEUE_SIZE = int(os.environ.get('IMAGE_WORKER_QUEUE_SIZE') or 1000)
+
+    # Analyze uploads that come without an over-illumination flag on the
+    # background pool; ILLUMINATION_MAX_EDGE downsamples first, trading
+    # small bright spots for speed (see is_over_illuminated)
+    IMAGE_ANALYSIS_AT_UPLOAD = (os.environ.get('IMAGE_ANALYSIS_AT_UPLOAD') or 'true').lower() == 'true'
+    ILLUMINATION_THRESHOLD = float(os.environ.get('ILLUMINATION_THRESHOLD') or 0.9)
+    ILLUMINATION_MAX_EDGE = int(os.environ.get('ILLUMINATION_MAX_EDGE') or 0) or None
+
+    # Behind nginx, set to an internal location aliasing UPLOAD_FOLDER (e.g.
+    # /protected-images/) so stored files are sent with X-Accel-Redirect
+    # instead of through the Python process; behind Apache or lighttpd, use
+    # Flask's X-Sendfile support instead
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.environ.get('IMAGE_ACCEL_REDIRECT_PREFIX')
+    USE_X_SENDFILE = (os.environ.get('USE_X_SENDFILE') or 'false').lower() == 'true'
+
+    # Image archives registered where they are by the import script
+    # (--in-place), as comma-separated name=path pairs, e.g.
+    # archive=/mnt/fundus. Their files are served and analyzed in place,
+    # previews and tiles still go to UPLOAD_FOLDER, and while
+    # EXTERNAL_IMAGE_ROOTS_READ_ONLY is true deleting an image never
+    # deletes its file
+    EXTERNAL_IMAGE_ROOTS = dict(
+        pair.split('=', 1) for pair in (os.environ.get('EXTERNAL_IMAGE_ROOTS') or '').split(',') if '=' in pair
+    )
+    EXTERNAL_IMAGE_ROOTS_READ_ONLY = (os.environ.get('EXTERNAL_IMAGE_ROOTS_READ_ONLY') or 'true').lower() == 'true'
@@ -1,36 +1,58 @@
+import json
 import logging
-from flask import Blueprint, render_template, jsonify
+import time
+from datetime import date, datetime, timezone
+from flask import (
+    Blueprint, Response, abort, current_app, render_template, jsonify, make_response, request,
+    stream_with_context
+)
 
-from app.services.statistics_service import StatisticsService
+from app import db
+
+from app.models.image import AnatomyScore, ImageQualityScore
+from app.services.image_snapshot_service import ImageSnapshotService
+from app.services.rollup_service import GRANULARITIES, RollupService
+from app.services.statistics_cache import StatisticsCache
+from app.services.statistics_service import counter_changes, dashboard_counters
 
 dashboard_bp = Blueprint('dashboard', __name__)
-statistics_service = StatisticsService()
+statistics_cache = StatisticsCache()
+image_snapshot_service = ImageSnapshotService()
+rollup_service = RollupService()
 
 logger = logging.getLogger(__name__)
 
 @dashboard_bp.route('/', methods=['GET'])
 def index():
     """Display the main dashboard."""
-    site_stats = statistics_service.get_sites_statistics()
-    image_stats = statistics_service.get_image_quality_statistics()
-    global_stats = statistics_service.get_global_statistics()
+    data_version = statistics_cache.get_served_version()
+    snapshot = statistics_cache.get_dashboard_snapshot()
     
     return render_template(
         'dashboard/index.html', 
-        site_stats=site_stats,
-        image_stats=image_stats,
-        global_stats=global_stats
+        site_stats=snapshot['site_stats'],
+        image_stats=snapshot['image_stats'],
+        global_stats=snapshot['global_stats'],
+        counters=dashboard_counters(snapshot),
+        data_version=data_version,
+        live_updates=current_app.config.get('DASHBOARD_LIVE_UPDATES', 'poll'),
+        poll_interval=current_app.config.get('DASHBOARD_POLL_INTERVAL', 10)
     )
 
 @dashboard_bp.route('/api/site-statistics', methods=['GET'])
 def site_statistics_api():
     """API endpoint for retrieving site statistics data for charts."""
     try:
-        site_stats = statistics_service.get_sites_statistics()
-        return jsonify({
+        etag = data_etag('site-statistics', statistics_cache.get_served_version())
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        snapshot = statistics_cache.get_dashboard_snapshot()
+        return with_age(revalidated(jsonify({
             'status': 'success',
-            'data': site_stats
-        })
+            'data': snapshot['site_stats'],
+            'generated_at': snapshot['generated_at'].isoformat()
+        }), etag), snapshot['generated_at'])
     except Exception as e:
         logger.error(f"Error retrieving site statistics: {str(e)}", exc_info=True)
         return jsonify({
@@ -42,14 +64,282 @@ def site_statistics_api():
 def image_statistics_api():
     """API endpoint for retrieving image quality statistics data for charts."""
     try:
-        image_stats = statistics_service.get_image_quality_statistics()
-        return jsonify({
+        etag = data_etag('image-statistics', statistics_cache.get_served_version())
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        snapshot = statistics_cache.get_dashboard_snapshot()
+        return with_age(revalidated(jsonify({
             'status': 'success',
-            'data': image_stats
-        })
+            'data': snapshot['image_stats'],
+            'generated_at': snapshot['generated_at'].isoformat()
+        }), etag), snapshot['generated_at'])
     except Exception as e:
         logger.error(f"Error retrieving image statistics: {str(e)}", exc_info=True)
         return jsonify({
             'status': 'error',
             'message': f"Failed to retrieve statistics: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+@dashboard_bp.route('/api/counters', methods=['GET'])
+def counters_api():
+    """
+    Flat dashboard counters, as pushed by the event stream, for the page to
+    poll. Polls at the current data version get a 304 without any work.
+    """
+    try:
+        version = statistics_cache.get_served_version()
+        etag = data_etag('counters', version)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        snapshot = statistics_cache.get_dashboard_snapshot()
+        return with_age(revalidated(jsonify({
+            'status': 'success',
+            'data': dashboard_counters(snapshot),
+            'generated_at': snapshot['generated_at'].isoformat()
+        }), etag), snapshot['generated_at'])
+    except Exception as e:
+        logger.error(f"Error retrieving dashboard counters: {str(e)}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f"Failed to retrieve counters: {str(e)}"
+        }), 500
+
+@dashboard_bp.route('/api/cache-statistics', methods=['GET'])
+def cache_statistics_api():
+    """API endpoint exposing statistics cache hit/miss counters."""
+    return jsonify({
+        'status': 'success',
+        'data': statistics_cache.get_cache_statistics()
+    })
+
+@dashboard_bp.route('/api/readiness-what-if', methods=['GET'])
+def readiness_what_if_api():
+    """
+    API endpoint evaluating AI readiness under alternative criteria, e.g.
+    ?quality=HIGH,ACCEPTABLE,LOW&anatomy=GOOD,ACCEPTABLE&ignore_illumination=true
+    """
+    try:
+        quality = parse_enum_list(request.args.get('quality'), ImageQualityScore)
+        anatomy = parse_enum_list(request.args.get('anatomy'), AnatomyScore)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    ignore_illumination = request.args.get('ignore_illumination', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        started = time.perf_counter()
+        readiness = image_snapshot_service.evaluate_readiness(
+            quality=quality,
+            anatomy=anatomy,
+            ignore_illumination=ignore_illumination
+        )
+        readiness['criteria'] = {
+            'quality': [score.name for score in quality] if quality is not None else None,
+            'anatomy': [score.name for score in anatomy] if anatomy is not None else None,
+            'ignore_illumination': ignore_illumination
+        }
+        readiness['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return jsonify({
+            'status': 'success',
+            'data': readiness
+        })
+    except Exception as e:
+        logger.error(f"Error evaluating readiness criteria: {str(e)}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f"Failed to evaluate readiness: {str(e)}"
+        }), 500
+
+@dashboard_bp.route('/api/image-counts', methods=['GET'])
+def image_counts_api():
+    """
+    API endpoint for image distributions within an acquisition date window,
+    e.g. ?start=2024-01-01&end=2024-03-31&site_id=1
+    """
+    try:
+        start, end, site_id = parse_window_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        etag = data_etag('image-counts', statistics_cache.get_version())
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        image_counts = rollup_service.get_image_counts(start=start, end=end, site_id=site_id)
+        return revalidated(jsonify({
+            'status': 'success',
+            'data': image_counts
+        }), etag)
+    except Exception as e:
+        logger.error(f"Error retrieving image counts: {str(e)}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f"Failed to retrieve image counts: {str(e)}"
+        }), 500
+
+@dashboard_bp.route('/api/trends', methods=['GET'])
+def trends_api():
+    """
+    API endpoint for image distributions per day, week or month, e.g.
+    ?granularity=month&start=2024-01-01
+    """
+    granularity = request.args.get('granularity', 'week').lower()
+    try:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularity must be one of: {', '.join(GRANULARITIES)}")
+        start, end, site_id = parse_window_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        etag = data_etag('trends', statistics_cache.get_version())
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        trends = rollup_service.get_trends(granularity=granularity, start=start, end=end, site_id=site_id)
+        return revalidated(jsonify({
+            'status': 'success',
+            'data': trends
+        }), etag)
+    except Exception as e:
+        logger.error(f"Error retrieving trends: {str(e)}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'message': f"Failed to retrieve trends: {str(e)}"
+        }), 500
+
+@dashboard_bp.route('/api/stream', methods=['GET'])
+def stream_api():
+    """
+    Server-sent events stream of dashboard counter changes. A "snapshot"
+    event carries every counter and "delta" events only the changed ones,
+    each with the data version as its event id. Clients that already hold
+    the current version (?since= or Last-Event-ID) get no snapshot.
+
+    Only served with DASHBOARD_LIVE_UPDATES=stream, since each open stream
+    holds a worker thread.
+    """
+    if current_app.config.get('DASHBOARD_LIVE_UPDATES', 'poll') != 'stream':
+        abort(404)
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    return Response(
+        stream_with_context(dashboard_events(since)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def dashboard_events(since):
+    """
+    Yield SSE messages until DASHBOARD_STREAM_DURATION elapses; browsers
+    then reconnect with Last-Event-ID, which bounds how long a stream holds
+    a worker thread. The thread sleeps between checks, so each connected
+    dashboard still takes one thread of a sync worker while it streams.
+    """
+    interval = current_app.config.get('DASHBOARD_STREAM_INTERVAL', 2)
+    keepalive = current_app.config.get('DASHBOARD_STREAM_KEEPALIVE', 15)
+    deadline = time.monotonic() + current_app.config.get('DASHBOARD_STREAM_DURATION', 30)
+
+    yield f"retry: {int(interval * 1000)}\n\n"
+
+    version = statistics_cache.get_served_version()
+    counters = dashboard_counters(statistics_cache.get_dashboard_snapshot())
+    db.session.remove()
+    if since != str(version):
+        yield sse_message('snapshot', version, counters)
+    last_message = time.monotonic()
+
+    while time.monotonic() + interval < deadline:
+        time.sleep(interval)
+        try:
+            current_version = statistics_cache.get_served_version()
+            if current_version != version:
+                current = dashboard_counters(statistics_cache.get_dashboard_snapshot())
+                changes = counter_changes(counters, current)
+                version, counters = current_version, current
+                if changes:
+                    yield sse_message('delta', version, changes)
+                    last_message = time.monotonic()
+        finally:
+            # Hand the connection back to the pool between checks
+            db.session.remove()
+
+        if time.monotonic() - last_message >= keepalive:
+            yield ": keepalive\n\n"
+            last_message = time.monotonic()
+
+
+def sse_message(event, event_id, data):
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def data_etag(resource, version):
+    """
+    Strong ETag for a dashboard resource. Everything these endpoints return
+    is a function of the data version (and the request URL, which caches
+    key on anyway), so the ETag can be checked without computing anything.
+    """
+    return f"{resource}-{version}"
+
+def revalidated(response, etag):
+    """Tag a response and let clients keep it only while the ETag still matches."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def with_age(response, generated_at):
+    """Report how long ago a possibly stale snapshot was computed."""
+    age = (datetime.now(timezone.utc) - generated_at).total_seconds()
+    response.headers['Age'] = str(max(int(age), 0))
+    return response
+
+def not_modified(etag):
+    return revalidated(make_response('', 304), etag)
+
+def parse_window_args(args):
+    """Parse the start/end (YYYY-MM-DD) and site_id query arguments."""
+    window = []
+    for name in ('start', 'end'):
+        value = args.get(name)
+        try:
+            window.append(date.fromisoformat(value) if value else None)
+        except ValueError:
+            raise ValueError(f"Invalid {name} date: {value}. Use YYYY-MM-DD")
+
+    site_id = args.get('site_id')
+    if site_id:
+        try:
+            site_id = int(site_id)
+        except ValueError:
+            raise ValueError(f"Invalid site_id: {site_id}")
+    else:
+        site_id = None
+
+    return window[0], window[1], site_id
+
+
+def parse_enum_list(value, enum_class):
+    """Parse a comma separated list of enum names; None when not given."""
+    if value is None:
+        return None
+
+    names = [name.strip().upper() for name in value.split(',') if name.strip()]
+    invalid = [name for name in names if name not in enum_class.__members__]
+    if invalid:
+        raise ValueError(
+            f"Invalid {enum_class.__name__} value(s): {', '.join(invalid)}. "
+            f"Must be one of: {', '.join(enum_class.__members__)}"
+        )
+    return [enum_class[name] for name in names]
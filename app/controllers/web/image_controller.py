@@ -1,11 +1,21 @@
 from datetime import datetime
 import logging
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import (
+    Blueprint, abort, current_app, flash, redirect, render_template, request, send_file, url_for
+)
 
 from app.models.image import AnatomyScore, EyeSide, ImageQualityScore
 from app.services.image_service import ImageService
 from app.services.patient_service import PatientService
 from app.services.site_service import SiteService
+from app.services.storage_service import StorageService
+from app.services.thumbnail_service import (
+    DEFAULT_THUMBNAIL_FORMAT, ThumbnailService, size_for_width, supported_formats
+)
+from app.services.tile_service import TileService
 
 
 image_bp = Blueprint("images", __name__)
@@ -13,6 +23,15 @@ image_bp = Blueprint("images", __name__)
 image_service = ImageService()
 patient_service = PatientService()
 site_service = SiteService()
+storage_service = StorageService()
+thumbnail_service = ThumbnailService()
+tile_service = TileService()
+
+# Content-addressed files, and the thumbnails and tiles derived from them,
+# never change under the same URL, so browsers may keep them; those of
+# images in external roots are regenerated when the image is edited and
+# revalidated instead
+IMMUTABLE_FILE_MAX_AGE = 365 * 24 * 3600
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +117,10 @@ def upload(patient_id):
         flash("Image uploaded successfully", "success")
         return redirect(url_for("patients.show", id=patient_id))
 
+    except ValueError as e:
+        logger.warning(f"Rejected image upload for patient {patient_id}: {str(e)}")
+        flash(f"Error uploading image: {str(e)}", "error")
+        return render_template("images/upload.html", patient=patient, sites=sites), 400
     except Exception as e:
         logger.error(
             f"Failed to upload image for patient {patient_id}: {str(e)}", exc_info=True
@@ -123,8 +146,75 @@ def show(image_id):
         flash("Patient not found", "error")
         return redirect(url_for("patients.index"))
 
+    # Until the pyramid is ready the page shows the medium preview
+    has_tiles = tile_service.has_pyramid(image.image_path)
+    if not has_tiles:
+        tile_service.schedule(image.image_path)
+
     logger.debug(f"Showing image with id={image_id}")
-    return render_template("images/show.html", image=image, patient=patient)
+    return render_template("images/show.html", image=image, patient=patient, has_tiles=has_tiles)
+
+
+@image_bp.route("/files/<path:filename>", methods=["GET"])
+def image_file(filename):
+    """
+    Serve a stored image file, answering If-None-Match and Range requests;
+    404 for unknown or unsafe paths.
+    """
+    try:
+        path = storage_service.path_for(filename)
+    except ValueError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    # The content hash in a blob path is a strong validator; files stored
+    # under other names fall back to mtime and size and are revalidated
+    sha256 = storage_service.blob_digest(filename)
+    if sha256:
+        return immutable_file(path, etag=sha256)
+    return stored_file(path)
+
+
+@image_bp.route("/thumbnails/<size>/<path:filename>", methods=["GET"])
+def thumbnail(size, filename):
+    """
+    Serve a downscaled preview of a stored image, generating it on first
+    request. size is a preview size name or a width in pixels; the format is
+    the best one the browser accepts.
+    """
+    if size.isdigit():
+        size = size_for_width(int(size))
+    format = negotiate_thumbnail_format()
+    try:
+        path = thumbnail_service.get_thumbnail(filename, size, format)
+    except (ValueError, OSError) as e:
+        logger.warning(f"No {size} thumbnail for {filename}: {str(e)}")
+        abort(404)
+
+    response = derived_file(filename, path, thumbnail_service.media_type(format))
+    response.vary.add("Accept")
+    return response
+
+
+@image_bp.route("/tiles/<path:filename>.dzi", methods=["GET"])
+def tile_descriptor(filename):
+    """Serve the Deep Zoom descriptor of a stored image's tile pyramid."""
+    try:
+        path = tile_service.get_descriptor(filename)
+    except (ValueError, OSError):
+        abort(404)
+    return derived_file(filename, path, "application/xml")
+
+
+@image_bp.route("/tiles/<path:filename>_files/<int:level>/<int:column>_<int:row>.jpg", methods=["GET"])
+def tile(filename, level, column, row):
+    """Serve one tile of a stored image's pyramid."""
+    try:
+        path = tile_service.get_tile(filename, level, column, row)
+    except (ValueError, OSError):
+        abort(404)
+    return derived_file(filename, path, "image/jpeg")
 
 
 @image_bp.route("/<int:image_id>/edit", methods=['GET'])
@@ -266,3 +356,58 @@ def validate_image_data(eye_side, quality_score, anatomy_score, acquisition_date
             errors.append("Acquisition date must be in YYYY-MM-DD format")
 
     return errors
+
+
+def stored_file(path, mimetype=None, etag=True, max_age=None):
+    """
+    Send a file under the storage root as a conditional response.
+
+    With IMAGE_ACCEL_REDIRECT_PREFIX set, only the headers are sent and nginx
+    streams the bytes (and byte ranges) from that internal location; Flask's
+    USE_X_SENDFILE does the same for Apache and lighttpd. Otherwise the file
+    is sent with sendfile where the WSGI server supports it.
+    """
+    prefix = current_app.config.get("IMAGE_ACCEL_REDIRECT_PREFIX")
+    if not prefix:
+        return send_file(path, mimetype=mimetype, etag=etag, max_age=max_age, conditional=True)
+
+    stat = os.stat(path)
+    response = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    )
+    # Files in external roots are under <prefix>/external/<root name>/
+    response.headers["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{quote(storage_service.image_path_for(path))}"
+    response.last_modified = stat.st_mtime
+    response.set_etag(etag if isinstance(etag, str) else f"{stat.st_mtime}-{stat.st_size}")
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request.environ)
+
+
+def immutable_file(path, mimetype=None, etag=True):
+    response = stored_file(path, mimetype=mimetype, etag=etag, max_age=IMMUTABLE_FILE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+def derived_file(image_path, path, mimetype):
+    """Send a thumbnail or tile of image_path, immutable unless the image can change in place."""
+    if storage_service.is_external(image_path):
+        return stored_file(path, mimetype=mimetype)
+    return immutable_file(path, mimetype)
+
+
+def negotiate_thumbnail_format():
+    """
+    Most preferred preview format the request names in its Accept header.
+    Wildcards are not enough: older browsers send image/* without decoding
+    WebP or AVIF, so they get the JPEG fallback.
+    """
+    accepted = set(request.accept_mimetypes.values())
+    for format in supported_formats():
+        if thumbnail_service.media_type(format) in accepted:
+            return format
+    return DEFAULT_THUMBNAIL_FORMAT
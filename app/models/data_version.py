@@ -0,0 +1,38 @@
+import time
+from datetime import datetime, timezone
+from app import db
+from sqlalchemy import BigInteger, Column, Integer, event
+
+DATA_VERSION_ID = 1
+
+
+class DataVersion(db.Model):
+    """
+    Single-row counter bumped by every service write path. Caches and HTTP
+    validators key on it to know when statistics have to be recomputed.
+    """
+    __tablename__ = "data_versions"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    modified_at = Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<DataVersion {self.version}>"
+
+
+def initial_version():
+    """
+    Start counting from the current time in milliseconds, so a recreated
+    database never reuses a version an older one already handed out.
+    """
+    return int(time.time() * 1000)
+
+
+@event.listens_for(DataVersion.__table__, "after_create")
+def seed_data_version(target, connection, **kw):
+    connection.execute(target.insert().values(id=DATA_VERSION_ID, version=initial_version()))
@@ -2,7 +2,10 @@ import sqlalchemy
 import enum
 from datetime import datetime, timezone
 from app import db
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Boolean
+
+# Room for paths of images registered in place deep inside an archive
+IMAGE_PATH_LENGTH = 1024
 
 
 class EyeSide(enum.Enum):
@@ -22,6 +25,12 @@ class AnatomyScore(enum.Enum):
     GOOD = "GOOD"
 
 
+class AnalysisStatus(enum.Enum):
+    PENDING = "PENDING"
+    COMPLETE = "COMPLETE"
+    FAILED = "FAILED"
+
+
 class Image(db.Model):
     __tablename__ = "images"
 
@@ -31,16 +40,26 @@ class Image(db.Model):
     quality_score = Column(sqlalchemy.Enum(ImageQualityScore), nullable=True)
     anatomy_score = Column(sqlalchemy.Enum(AnatomyScore), nullable=True)
     site_id = Column(Integer, ForeignKey("sites.id"), nullable=True)
-    over_illuminated = Column(Boolean, default=False)
-    image_path = Column(String(255), nullable=False)
+    # None while the analysis is pending or when it failed
+    over_illuminated = Column(Boolean, nullable=True)
+    # Automatic over-illumination analysis; None when the flag was given
+    analysis_status = Column(sqlalchemy.Enum(AnalysisStatus), nullable=True)
+    image_path = Column(String(IMAGE_PATH_LENGTH), nullable=False, index=True)
+    # Read from the file header at upload, so pages need not open the file
+    file_size = Column(BigInteger, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    color_mode = Column(String(16), nullable=True)
+    image_format = Column(String(16), nullable=True)
     acquisition_date = Column(
-        sqlalchemy.DateTime, default=datetime.now(timezone.utc), nullable=True
+        sqlalchemy.DateTime, default=lambda: datetime.now(timezone.utc), nullable=True
     )
-    created_at = Column(sqlalchemy.DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(sqlalchemy.DateTime, default=lambda: datetime.now(timezone.utc))
     modified_at = Column(
         sqlalchemy.DateTime,
-        default=datetime.now(timezone.utc),
-        onupdate=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        index=True,
     )
 
     def __repr__(self):
@@ -66,7 +85,13 @@ class Image(db.Model):
                 else None
             ),
             "over_illumination": self.over_illuminated,
+            "analysis_status": self.analysis_status.value if self.analysis_status else None,
             "image_path": self.image_path,
+            "file_size": self.file_size,
+            "width": self.width,
+            "height": self.height,
+            "color_mode": self.color_mode,
+            "image_format": self.image_format,
             "acquisition_date": (
                 self.acquisition_date.isoformat() if self.acquisition_date else None
             ),
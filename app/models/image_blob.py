@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from app import db
+from sqlalchemy import BigInteger, Column, Integer, String
+
+
+class ImageBlob(db.Model):
+    """
+    A stored image file, named by the SHA-256 of its content. ref_count is
+    the number of images whose image_path points at it; the file is removed
+    when the last of them is deleted.
+    """
+    __tablename__ = "image_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(255), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<ImageBlob {self.sha256[:12]} refs={self.ref_count}>"
+
+    def to_dict(self):
+        return {
+            "sha256": self.sha256,
+            "path": self.path,
+            "size": self.size,
+            "ref_count": self.ref_count,
+        }
@@ -0,0 +1,51 @@
+import sqlalchemy
+from app import db
+from app.models.image import AnatomyScore, EyeSide, ImageQualityScore
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, Date, Index, String, cast, func
+
+
+class ImageDailyRollup(db.Model):
+    """
+    Pre-aggregated image counts per acquisition day and site, eye side,
+    quality, anatomy and illumination. Maintained by the image write paths
+    so dashboard date windows sum a few rollup rows instead of scanning
+    images. There is one row per combination of dimensions, enforced by a
+    unique index over them with NULLs coalesced, since NULLs never collide
+    in a plain unique constraint.
+    """
+    __tablename__ = "image_daily_rollups"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    site_id = Column(Integer, ForeignKey("sites.id"), nullable=True)
+    eye_side = Column(sqlalchemy.Enum(EyeSide), nullable=False)
+    quality_score = Column(sqlalchemy.Enum(ImageQualityScore), nullable=True)
+    anatomy_score = Column(sqlalchemy.Enum(AnatomyScore), nullable=True)
+    over_illuminated = Column(Boolean, nullable=False, default=False)
+    image_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ImageDailyRollup {self.day} site={self.site_id}: {self.image_count}>"
+
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat() if self.day else None,
+            "site_id": self.site_id,
+            "eye_side": self.eye_side.value if self.eye_side else None,
+            "quality_score": self.quality_score.value if self.quality_score else None,
+            "anatomy_score": self.anatomy_score.value if self.anatomy_score else None,
+            "over_illuminated": self.over_illuminated,
+            "image_count": self.image_count,
+        }
+
+
+Index(
+    "uq_image_daily_rollups_dimensions",
+    ImageDailyRollup.day,
+    func.coalesce(ImageDailyRollup.site_id, 0),
+    ImageDailyRollup.eye_side,
+    func.coalesce(cast(ImageDailyRollup.quality_score, String), ""),
+    func.coalesce(cast(ImageDailyRollup.anatomy_score, String), ""),
+    ImageDailyRollup.over_illuminated,
+    unique=True,
+)
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from app import db
+from sqlalchemy import Column, Integer, ForeignKey, Boolean
+
+
+class PatientSiteReadiness(db.Model):
+    """
+    Denormalized AI-readiness flags, one row per (patient, site) pair that
+    has at least one image. Maintained by the service write paths.
+    """
+    __tablename__ = "patient_site_readiness"
+
+    patient_id = Column(Integer, ForeignKey("patients.id"), primary_key=True)
+    site_id = Column(Integer, ForeignKey("sites.id"), primary_key=True, index=True)
+    has_good_left = Column(Boolean, nullable=False, default=False)
+    has_good_right = Column(Boolean, nullable=False, default=False)
+    modified_at = Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<PatientSiteReadiness patient={self.patient_id} site={self.site_id}>"
+
+    @property
+    def is_available(self):
+        return bool(self.has_good_left and self.has_good_right)
+
+    def to_dict(self):
+        return {
+            "patient_id": self.patient_id,
+            "site_id": self.site_id,
+            "has_good_left": self.has_good_left,
+            "has_good_right": self.has_good_right,
+            "is_available": self.is_available,
+        }
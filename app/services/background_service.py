@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+
+from flask import current_app
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# One pool per process, shared by every BackgroundService and created on
+# first use so that forked workers never inherit the parent's threads
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_pending = set()
+
+
+class BackgroundService:
+    """
+    Bounded thread pool for image processing that should not hold up the
+    request that triggered it.
+
+    Tasks are keyed so that the same work is queued at most once at a time,
+    and each runs in an application context of the app that submitted it.
+    At most IMAGE_WORKER_QUEUE_SIZE tasks are queued or running; beyond
+    that, submit() turns work away rather than letting the executor's
+    queue grow without limit. Rejected work is left for the backfill
+    commands (analyze-pending, backfill-thumbnails, generate-tiles).
+    """
+
+    def submit(self, key, task, *args):
+        """
+        Run task(*args) on the pool unless a task with the same key is
+        already queued or running, or the queue is full.
+
+        Returns:
+            bool: True if the task was queued
+        """
+        global _executor, _executor_pid
+        app = current_app._get_current_object()
+
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config.get("IMAGE_WORKER_THREADS", 1),
+                    thread_name_prefix="image-worker",
+                )
+                _executor_pid = os.getpid()
+                _pending.clear()
+            if key in _pending:
+                return False
+            if len(_pending) >= app.config.get("IMAGE_WORKER_QUEUE_SIZE", 1000):
+                logger.warning(f"Background queue full, not queuing {key}")
+                return False
+            _pending.add(key)
+            _executor.submit(self._run, app, key, task, args)
+        return True
+
+    def is_pending(self, key):
+        with _lock:
+            return key in _pending
+
+    def _run(self, app, key, task, args):
+        with app.app_context():
+            try:
+                task(*args)
+            except Exception as e:
+                logger.error(f"Error in background task {key}: {str(e)}", exc_info=True)
+            finally:
+                db.session.remove()
+                with _lock:
+                    _pending.discard(key)
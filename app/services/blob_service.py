@@ -0,0 +1,265 @@
+from collections import Counter, namedtuple
+import os
+
+from flask import current_app, has_app_context
+from PIL import Image as PILImage
+from sqlalchemy import bindparam, delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models.image import Image
+from app.models.image_blob import ImageBlob
+from app.services.storage_service import StorageService
+from app.services.thumbnail_service import ThumbnailService
+from app.services.tile_service import TileService
+
+ImageDetails = namedtuple("ImageDetails", ["width", "height", "mode", "format"])
+
+
+def probe_image(path):
+    """
+    Read the dimensions, mode and format of an image from its header,
+    without decoding the pixel data.
+
+    Raises:
+        ValueError: If the file is not an image Pillow can read
+    """
+    try:
+        with PILImage.open(path) as img:
+            return ImageDetails(img.width, img.height, img.mode, img.format)
+    except (OSError, PILImage.DecompressionBombError) as e:
+        raise ValueError(f"File is not a supported image: {str(e)}")
+
+
+class BlobService:
+    """
+    Reference counting for content-addressed image files.
+
+    Images pointing at the same content share one file. References are
+    added and released in the caller's transaction; files are only
+    unlinked after the commit, once nothing points at them any more, and
+    the content of a new reference is settled in place after its commit,
+    so an unlink racing the reference cannot leave it without a file.
+    """
+
+    def __init__(self):
+        self.storage_service = StorageService()
+        self.thumbnail_service = ThumbnailService()
+        self.tile_service = TileService()
+
+    def store(self, image_file, filename):
+        """
+        Store an upload (or local file) and take a reference to it. The
+        file is rejected before it is stored if it is larger than
+        MAX_CONTENT_LENGTH or its header is not a readable image.
+
+        Returns:
+            StoredBlob: The image path to record on the Image, with the
+                content hash, size and ImageDetails
+
+        Raises:
+            ValueError: If the file is too large or not an image
+        """
+        return self.reference(self.store_file(image_file, filename))
+
+    def store_file(self, image_file, filename):
+        """
+        The file half of store(): write the file under its content hash
+        without touching the database, so it can run on worker threads.
+        The result must be passed to reference() before the commit.
+
+        Raises:
+            ValueError: If the file is too large or not an image
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        return self.storage_service.store_blob(
+            image_file, extension, max_size=current_app.config.get("MAX_CONTENT_LENGTH"), inspect=probe_image
+        )
+
+    def register_in_place(self, path):
+        """
+        Like store_file(), for a file in an EXTERNAL_IMAGE_ROOTS archive:
+        only its header is read and nothing is copied. Such files are not
+        content-addressed and take no blob reference.
+
+        Raises:
+            ValueError: If the file is not under an external root or not
+                an image
+        """
+        return self.storage_service.register_in_place(path, inspect=probe_image)
+
+    def reference(self, stored):
+        """
+        The database half of store(): add a reference to a stored file.
+        When a concurrent upload of the same content inserts its blob
+        first, the reference is added to that blob instead.
+
+        Returns:
+            StoredBlob: stored, with the path of the first file stored with
+                the same content if there is one
+        """
+        sha256, image_path, size, _, _ = stored
+
+        if not self._add_reference(sha256):
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(
+                        insert(ImageBlob).values(sha256=sha256, path=image_path, size=size, ref_count=1)
+                    )
+                return self._settle_after_commit(stored)
+            except IntegrityError:
+                self._add_reference(sha256)
+
+        # Same content uploaded under another extension: share the first file
+        existing_path = db.session.query(ImageBlob.path).filter(ImageBlob.sha256 == sha256).scalar()
+        if existing_path != image_path:
+            self.storage_service.delete(image_path)
+        return self._settle_after_commit(stored._replace(path=existing_path))
+
+    def _add_reference(self, sha256):
+        result = db.session.execute(
+            update(ImageBlob)
+            .where(ImageBlob.sha256 == sha256)
+            .values(ref_count=ImageBlob.ref_count + 1)
+        )
+        return result.rowcount > 0
+
+    def _settle_after_commit(self, stored):
+        if stored.pending:
+            db.session.info.setdefault("pending_blobs", []).append(stored)
+        return stored
+
+    def reference_many(self, stored_blobs):
+        """
+        reference() for a batch of stored files, with one lookup for the
+        batch and one write per distinct content. Files registered in place
+        are passed through.
+
+        Returns:
+            list: The StoredBlobs with their shared paths, in order
+        """
+        counts = Counter(stored.sha256 for stored in stored_blobs if stored.sha256)
+        if not counts:
+            return list(stored_blobs)
+
+        paths = self._blob_paths(counts)
+        if paths:
+            blobs = ImageBlob.__table__
+            db.session.execute(
+                update(blobs)
+                .where(blobs.c.sha256 == bindparam("blob_sha256"))
+                .values(ref_count=blobs.c.ref_count + bindparam("references")),
+                [{"blob_sha256": sha256, "references": counts[sha256]} for sha256 in paths],
+            )
+
+        new_blobs = []
+        for stored in stored_blobs:
+            if stored.sha256 and stored.sha256 not in paths:
+                paths[stored.sha256] = stored.path
+                new_blobs.append({
+                    "sha256": stored.sha256, "path": stored.path, "size": stored.size,
+                    "ref_count": counts[stored.sha256],
+                })
+        conflicted = set()
+        if new_blobs:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(ImageBlob), new_blobs)
+            except IntegrityError:
+                # A concurrent writer inserted some of them first: reference
+                # the new content one file at a time, as reference() does
+                conflicted = {blob["sha256"] for blob in new_blobs}
+
+        result = []
+        for stored in stored_blobs:
+            if stored.sha256 in conflicted:
+                result.append(self.reference(stored))
+                continue
+            # Same content stored under another extension: share the first file
+            if stored.sha256 and stored.path != paths[stored.sha256]:
+                self.storage_service.delete(stored.path)
+                stored = stored._replace(path=paths[stored.sha256])
+            result.append(self._settle_after_commit(stored))
+        return result
+
+    def _blob_paths(self, sha256s):
+        return dict(db.session.execute(
+            select(ImageBlob.sha256, ImageBlob.path).where(ImageBlob.sha256.in_(sha256s))
+        ).all())
+
+    def abandon(self, stored_blobs):
+        """
+        Undo store_file() for files whose references were rolled back or
+        never taken: drop their pending copies and unlink the files that
+        no image uses.
+        """
+        for stored in stored_blobs:
+            self.storage_service.discard(stored)
+        for image_path in {stored.path for stored in stored_blobs if stored.sha256}:
+            self.remove_if_unreferenced(image_path)
+
+    def release(self, image_path):
+        """
+        Drop one reference to image_path.
+
+        Returns:
+            str: image_path when it may now be unreferenced, for
+                remove_if_unreferenced() to check after the commit
+        """
+        if not image_path:
+            return None
+
+        db.session.execute(
+            update(ImageBlob)
+            .where(ImageBlob.path == image_path)
+            .values(ref_count=ImageBlob.ref_count - 1)
+        )
+        db.session.execute(
+            delete(ImageBlob).where(ImageBlob.path == image_path, ImageBlob.ref_count <= 0)
+        )
+
+        still_referenced = db.session.query(ImageBlob.sha256).filter(ImageBlob.path == image_path).first()
+        return None if still_referenced else image_path
+
+    def remove_if_unreferenced(self, image_path):
+        """
+        Unlink a released file unless an image or blob record points at it
+        again, e.g. the same content re-uploaded since it was released.
+        References are checked again once the file is out of the way, see
+        StorageService.delete_unless().
+        """
+        if not image_path:
+            return False
+
+        def is_referenced():
+            return bool(
+                db.session.query(Image.id).filter(Image.image_path == image_path).first()
+                or db.session.query(ImageBlob.sha256).filter(ImageBlob.path == image_path).first()
+            )
+
+        if is_referenced() or not self.storage_service.delete_unless(image_path, is_referenced):
+            return False
+
+        self.thumbnail_service.delete(image_path)
+        self.tile_service.delete(image_path)
+        return True
+
+
+@event.listens_for(Session, "after_commit")
+def _settle_after_commit(session):
+    # Also fired when a savepoint is released; only the outer commit counts
+    if session.in_nested_transaction():
+        return
+    pending = session.info.pop("pending_blobs", [])
+    if pending and has_app_context():
+        storage_service = StorageService()
+        for stored in pending:
+            storage_service.settle(stored)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_rollback(session, transaction):
+    if transaction.parent is None and has_app_context():
+        storage_service = StorageService()
+        for stored in session.info.pop("pending_blobs", []):
+            storage_service.discard(stored)
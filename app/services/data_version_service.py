@@ -0,0 +1,101 @@
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models.data_version import DATA_VERSION_ID, DataVersion
+
+
+class _VersionMemo:
+    """Per-application copy of the last data version read from the database."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = 0.0
+        self.generation = 0
+        self.commit_listeners = []
+
+    def expire(self):
+        with self.lock:
+            self.version = None
+            # Reads started before this must not store what they fetched
+            self.generation += 1
+
+
+def _get_memo():
+    return current_app.extensions.setdefault("data_version", _VersionMemo())
+
+
+class DataVersionService:
+    """
+    Reads and bumps the data version counter.
+
+    Write paths call bump() before committing so the new version becomes
+    visible atomically with the data. Readers get the version from memory,
+    re-reading the database at most every max_staleness seconds; writes made
+    by this process expire the in-memory copy as soon as they commit.
+    """
+
+    def get_version(self, max_staleness=0):
+        memo = _get_memo()
+        now = time.monotonic()
+        with memo.lock:
+            if memo.version is not None and now - memo.checked_at < max_staleness:
+                return memo.version
+            generation = memo.generation
+
+        version = self._read_version()
+
+        with memo.lock:
+            # A commit that expired the memo during the read may have made
+            # this version stale; the next read fetches the new one
+            if memo.generation == generation:
+                memo.version = version
+                memo.checked_at = now
+        return version
+
+    def _read_version(self):
+        return (
+            db.session.query(DataVersion.version)
+            .filter(DataVersion.id == DATA_VERSION_ID)
+            .scalar()
+        ) or 0
+
+    def bump(self):
+        result = db.session.execute(
+            update(DataVersion)
+            .where(DataVersion.id == DATA_VERSION_ID)
+            .values(version=DataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(DataVersion(id=DATA_VERSION_ID, version=1))
+
+        db.session.info["data_version_bumped"] = True
+        _get_memo().expire()
+
+    def add_commit_listener(self, callback):
+        """
+        Call callback(app) after every commit in this process that bumped
+        the version. Listeners run inside the commit, so they must only
+        schedule work.
+        """
+        listeners = _get_memo().commit_listeners
+        if callback not in listeners:
+            listeners.append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _expire_after_commit(session):
+    if session.info.pop("data_version_bumped", False) and has_app_context():
+        memo = _get_memo()
+        memo.expire()
+        for callback in list(memo.commit_listeners):
+            callback(current_app._get_current_object())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("data_version_bumped", None)
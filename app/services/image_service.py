@@ -1,18 +1,52 @@
+from collections import Counter
 from datetime import datetime, timezone
+import logging
+import math
 import os
-import shutil
 
+import numpy as np
 from flask import current_app
+from PIL import Image as PILImage
+from sqlalchemy import update
 from app import db
-from app.models.image import Image
+from app.models.image import AnalysisStatus, Image
+from app.services.background_service import BackgroundService
+from app.services.blob_service import BlobService, probe_image
+from app.services.data_version_service import DataVersionService
+from app.services.readiness_service import ReadinessService
+from app.services.rollup_service import RollupService
 from app.services.site_service import SiteService
+from app.services.thumbnail_service import ThumbnailService
+from app.services.tile_service import TileService
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 
+logger = logging.getLogger(__name__)
+
+# Rec. 709 relative luminance weights, scaled to integers summing to 10000
+LUMINANCE_WEIGHTS = (2126, 7152, 722)
+LUMINANCE_SCAN_ROWS = 256
+
+# Brightest possible value of each single-band mode; "I" is 16-bit PNG data
+GRAYSCALE_PEAKS = {
+    "L": 255,
+    "I": 65535,
+    "I;16": 65535,
+    "I;16L": 65535,
+    "I;16B": 65535,
+}
+
 
 class ImageService:
     def __init__(self):
         self.site_service = SiteService()
+        self.readiness_service = ReadinessService()
+        self.rollup_service = RollupService()
+        self.data_version_service = DataVersionService()
+        self.blob_service = BlobService()
+        self.thumbnail_service = ThumbnailService()
+        self.tile_service = TileService()
+        self.background_service = BackgroundService()
 
     def get_patient_images(self, patient_id):
         return (
@@ -26,35 +60,85 @@ class ImageService:
 
     def create_image(self, image_data, image_file=None):
         """
-        Create a new image record and save the uploaded file
+        Create a new image record and save the uploaded file. When an
+        uploaded file comes without an over_illuminated flag, it is analyzed
+        on the background pool and the image is marked pending until then.
 
         Args:
             image_data (dict): Dictionary containing image metadata
-            image_file (FileStorage, optional): The uploaded image file
+            image_file (FileStorage or str, optional): The uploaded image file,
+                or the path of a local file to link into storage
 
         Returns:
             Image: The created image
         """
         # Handle file upload if provided
-        image_path = None
-        is_io = image_data.get("over_illuminated")
+        stored = None
 
         if image_file:
-            filename = secure_filename(image_file.filename)
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            unique_filename = f"{timestamp}_{filename}"
+            if isinstance(image_file, (str, os.PathLike)):
+                filename = secure_filename(os.path.basename(image_file))
+            else:
+                filename = secure_filename(image_file.filename)
+
+            # Stored under its content hash, so re-uploads share one file
+            stored = self.blob_service.store(image_file, filename)
+
+        image = self._build_image(image_data, stored)
+        db.session.add(image)
+        self.readiness_service.refresh(image.patient_id, image.site_id)
+        self.rollup_service.add_image(image)
+        self.data_version_service.bump()
+        db.session.commit()
+
+        self._schedule_processing(image.id, image.image_path, image.analysis_status)
+        return image
+
+    def create_images(self, entries, schedule_processing=True):
+        """
+        Create many image records in one transaction, for bulk imports.
+
+        The files must already be stored with BlobService.store_file(),
+        e.g. on worker threads; their references are taken here. Readiness
+        is refreshed once per patient and site and the data version bumped
+        once for the whole batch.
+
+        Args:
+            entries (list): (image_data, StoredBlob) pairs, as for create_image
+            schedule_processing (bool): Queue analysis, thumbnails and tiles
+                on the background pool; bulk imports leave them to
+                analyze-pending, backfill-thumbnails and generate-tiles
 
-            # Save to upload folder
-            upload_folder = current_app.config["UPLOAD_FOLDER"]
-            file_path = os.path.join(upload_folder, unique_filename)
-            image_file.save(file_path)
+        Returns:
+            list: IDs of the created images
+        """
+        images = []
+        rollup_counts = Counter()
+        stored_blobs = self.blob_service.reference_many([stored for _, stored in entries])
+        for (image_data, _), stored in zip(entries, stored_blobs):
+            image = self._build_image(image_data, stored)
+            db.session.add(image)
+            rollup_counts[self.rollup_service.key_for(image)] += 1
+            images.append(image)
+
+        for key, count in rollup_counts.items():
+            self.rollup_service.record(key, count)
+        for patient_id, site_id in {(image.patient_id, image.site_id) for image in images}:
+            self.readiness_service.refresh(patient_id, site_id)
+        self.data_version_service.bump()
+        db.session.flush()
+        # Read before the commit expires them, rather than reloading each image
+        scheduled = [(image.id, image.image_path, image.analysis_status) for image in images]
+        db.session.commit()
 
-            # Copy to static folder for web access
-            static_folder = os.path.join(current_app.static_folder, "uploads/images")
-            static_path = os.path.join(static_folder, unique_filename)
-            shutil.copy2(file_path, static_path)
+        if schedule_processing:
+            for image_id, image_path, analysis_status in scheduled:
+                self._schedule_processing(image_id, image_path, analysis_status)
+        return [image_id for image_id, _, _ in scheduled]
 
-            image_path = unique_filename
+    def _build_image(self, image_data, stored):
+        is_io = image_data.get("over_illuminated")
+        analyze = stored is not None and is_io is None and current_app.config.get("IMAGE_ANALYSIS_AT_UPLOAD", False)
 
         # Handle site - get or create by name
         site_id = None
@@ -66,29 +150,41 @@ class ImageService:
             )
             site_id = site.id
 
-        # Create image record
-        image = Image(
+        return Image(
             patient_id=image_data.get("patient_id"),
             eye_side=image_data.get("eye_side"),
             quality_score=image_data.get("quality_score"),
             anatomy_score=image_data.get("anatomy_score"),
             site_id=site_id,
-            over_illuminated=is_io if is_io is not None else False,
-            image_path=image_path or image_data.get("image_path"),
+            # Unknown until analyzed, so a pending image is not counted as AI-ready
+            over_illuminated=None if analyze else bool(is_io),
+            analysis_status=AnalysisStatus.PENDING if analyze else None,
+            image_path=stored.path if stored else image_data.get("image_path"),
+            file_size=stored.size if stored else None,
+            width=stored.details.width if stored else None,
+            height=stored.details.height if stored else None,
+            color_mode=stored.details.mode if stored else None,
+            image_format=stored.details.format if stored else None,
             acquisition_date=image_data.get(
                 "acquisition_date", datetime.now(timezone.utc)
             ),
         )
 
-        db.session.add(image)
-        db.session.commit()
-        return image
+    def _schedule_processing(self, image_id, image_path, analysis_status):
+        if analysis_status == AnalysisStatus.PENDING:
+            self.schedule_analysis(image_id)
+        if image_path:
+            self.thumbnail_service.schedule(image_path)
+            self.tile_service.schedule(image_path)
 
     def update_image(self, image_id, image_data):
         image = self.get_image_by_id(image_id)
         if not image:
             raise ValueError(f"Image with ID {image_id} not found")
 
+        previous_site_id = image.site_id
+        previous_rollup_key = self.rollup_service.key_for(image)
+
         if "eye_side" in image_data:
             image.eye_side = image_data["eye_side"]
         if "quality_score" in image_data:
@@ -107,9 +203,17 @@ class ImageService:
 
         if "over_illuminated" in image_data:
             image.over_illuminated = image_data["over_illuminated"]
+            # A flag set by hand wins over a pending analysis
+            image.analysis_status = image_data.get("analysis_status")
         if "acquisition_date" in image_data:
             image.acquisition_date = image_data["acquisition_date"]
 
+        self.readiness_service.refresh(image.patient_id, image.site_id)
+        if previous_site_id != image.site_id:
+            self.readiness_service.refresh(image.patient_id, previous_site_id)
+        self.rollup_service.update_image(previous_rollup_key, image)
+        self.data_version_service.bump()
+
         db.session.commit()
         return image
 
@@ -118,42 +222,193 @@ class ImageService:
         if not image:
             raise ValueError(f"Image with ID {image_id} not found")
 
-        # Remove from upload folder
-        if image.image_path:
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], image.image_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
-        # Remove from static folder
-        if image.image_path:
-            static_path = os.path.join(current_app.static_folder, 'uploads/images', image.image_path)
-            if os.path.exists(static_path):
-                os.remove(static_path)
+        released_path = self.blob_service.release(image.image_path)
 
         db.session.delete(image)
+        self.readiness_service.refresh(image.patient_id, image.site_id)
+        self.rollup_service.remove_image(image)
+        self.data_version_service.bump()
         db.session.commit()
+
+        self.blob_service.remove_if_unreferenced(released_path)
         return True
 
+    def schedule_analysis(self, image_id):
+        """
+        Analyze an image for over-illumination on the background pool.
+
+        Returns:
+            bool: True if the analysis was queued
+        """
+        return self.background_service.submit(f"analysis:{image_id}", self.analyze_image, image_id)
+
+    def analyze_image(self, image_id):
+        """
+        Run the over-illumination analysis of a pending image and record
+        the result, refreshing readiness, rollups and the data version like
+        any other update.
+
+        Returns:
+            bool: The result, or None if the image is gone, no longer
+                pending, or could not be analyzed
+        """
+        row = (
+            db.session.query(Image.image_path, Image.analysis_status)
+            .filter(Image.id == image_id)
+            .first()
+        )
+        # End the read transaction so writers are not held up by the analysis
+        db.session.rollback()
+        if row is None or row.analysis_status != AnalysisStatus.PENDING:
+            return None
+
+        config = current_app.config
+        try:
+            result = bool(is_over_illuminated(
+                self.blob_service.storage_service.path_for(row.image_path),
+                threshold=config.get("ILLUMINATION_THRESHOLD", 0.9),
+                max_edge=config.get("ILLUMINATION_MAX_EDGE"),
+            ))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not analyze image {image_id}: {str(e)}")
+            result = None
+
+        image = self.get_image_by_id(image_id)
+        if image is None or image.analysis_status != AnalysisStatus.PENDING:
+            # Deleted or flagged by hand while the analysis ran
+            db.session.rollback()
+            return None
+
+        if result is None:
+            image.analysis_status = AnalysisStatus.FAILED
+            db.session.commit()
+            return None
+
+        self.update_image(image_id, {"over_illuminated": result, "analysis_status": AnalysisStatus.COMPLETE})
+        return result
+
+    def analyze_pending(self):
+        """
+        Analyze every pending image in this process, e.g. those whose
+        queued analysis was lost when a worker restarted.
+
+        Returns:
+            tuple: (number of images analyzed, number that failed)
+        """
+        image_ids = [
+            image_id for (image_id,) in
+            db.session.query(Image.id).filter(Image.analysis_status == AnalysisStatus.PENDING).order_by(Image.id)
+        ]
+        analyzed = failed = 0
+        for image_id in image_ids:
+            if self.analyze_image(image_id) is None:
+                failed += 1
+            else:
+                analyzed += 1
+        return analyzed, failed
+
+    def backfill_file_details(self, batch_size=500):
+        """
+        Record the size and header details of images stored before they
+        were captured at upload, committing every batch_size images.
+
+        Returns:
+            tuple: (number of images updated, number that failed)
+        """
+        storage_service = self.blob_service.storage_service
+        updated = failed = 0
+        last_id = 0
+
+        while True:
+            batch = (
+                db.session.query(Image.id, Image.image_path)
+                .filter(Image.width.is_(None), Image.id > last_id)
+                .order_by(Image.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            for image_id, image_path in batch:
+                last_id = image_id
+                try:
+                    path = storage_service.path_for(image_path)
+                    details = probe_image(path)
+                    file_size = os.path.getsize(path)
+                except (ValueError, OSError) as e:
+                    logger.warning(f"Could not read image {image_id} at {image_path}: {str(e)}")
+                    failed += 1
+                    continue
+
+                # Details of the file, not an edit: keep modified_at as it was
+                db.session.execute(
+                    update(Image)
+                    .where(Image.id == image_id)
+                    .values(
+                        file_size=file_size,
+                        width=details.width,
+                        height=details.height,
+                        color_mode=details.mode,
+                        image_format=details.format,
+                        modified_at=Image.modified_at,
+                    )
+                )
+                updated += 1
+            db.session.commit()
+
+        return updated, failed
+
+
+def is_over_illuminated(image_path, threshold=0.9, max_edge=None):
+    """
+    Whether any pixel's relative luminance (Rec. 709 weights, 0 to 1) is
+    above threshold.
+
+    Grayscale images are compared by their brightest value, 16-bit ones on
+    a 0-65535 scale. Colour images are first bounded by their per-channel
+    maxima, then scanned a strip of rows at a time in integer arithmetic,
+    stopping at the first bright pixel, so memory stays at a few MB for
+    any resolution. Alpha is ignored.
 
-def is_over_illuminated(image_path, threshold=0.9):
-    import numpy as np
-    from PIL import Image
+    Args:
+        image_path (str): Path of the image file
+        threshold (float): Luminance above which a pixel is over-illuminated
+        max_edge (int, optional): Downsample to at most this many pixels on
+            the longest edge before checking (JPEGs are decoded at reduced
+            scale). Several times faster on large images, but each checked
+            pixel is the average of a block, so a bright spot smaller than
+            the block can be averaged below threshold: the result can turn
+            from True to False, never the other way.
+    """
+    with PILImage.open(image_path) as img:
+        if max_edge:
+            img.draft(img.mode, (max_edge, max_edge))
+            factor = math.ceil(max(img.size) / max_edge)
+            if factor > 1:
+                if img.mode.startswith("I;16"):
+                    img = img.convert("I")
+                img = img.reduce(factor)
 
-    PX_MAX_VALUE = 255.0
-    # Load image
-    img = Image.open(image_path)
-    img_array = np.array(img)
+        if img.mode in GRAYSCALE_PEAKS:
+            return img.getextrema()[1] > threshold * GRAYSCALE_PEAKS[img.mode]
+        if img.mode == "LA":
+            return img.getchannel("L").getextrema()[1] > threshold * 255
 
-    # Convert to luminance using perceptual weights
-    # These weights reflect human perception of brightness
-    luminance = (
-        0.2126 * img_array[:, :, 0]
-        + 0.7152 * img_array[:, :, 1]
-        + 0.0722 * img_array[:, :, 2]
-    ) / PX_MAX_VALUE
+        if img.mode not in ("RGB", "RGBA", "RGBX"):
+            img = img.convert("RGB")
 
-    # Identify pixels with luminance above threshold
-    overexposed_mask = luminance > threshold
+        # Luminance scaled by 255 * 10000 to stay in integers
+        limit = threshold * 255 * sum(LUMINANCE_WEIGHTS)
+        channel_maxima = [high for _, high in img.getextrema()[:3]]
+        if sum(weight * high for weight, high in zip(LUMINANCE_WEIGHTS, channel_maxima)) <= limit:
+            return False
 
-    # The image is over illuminated if it has pixels above the threshold
-    return np.sum(overexposed_mask) > 0
+        red_weight, green_weight, blue_weight = (np.uint32(weight) for weight in LUMINANCE_WEIGHTS)
+        width, height = img.size
+        for top in range(0, height, LUMINANCE_SCAN_ROWS):
+            strip = np.asarray(img.crop((0, top, width, min(top + LUMINANCE_SCAN_ROWS, height))))
+            luminance = strip[..., 0] * red_weight + strip[..., 1] * green_weight + strip[..., 2] * blue_weight
+            if np.any(luminance > limit):
+                return True
+        return False
@@ -0,0 +1,233 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from flask import current_app
+from sqlalchemy.sql import func
+from app import db
+from app.models.image import AnatomyScore, EyeSide, Image, ImageQualityScore
+from app.models.site import Site
+from app.services.data_version_service import DataVersionService
+from app.services.readiness_service import GOOD_ANATOMY, GOOD_QUALITY
+
+EYE_CODES = {side: code for code, side in enumerate(EyeSide)}
+QUALITY_CODES = {score: code for code, score in enumerate(ImageQualityScore)}
+ANATOMY_CODES = {score: code for code, score in enumerate(AnatomyScore)}
+UNSET = -1
+
+# Rows modified this long before the previous refresh started are re-read,
+# so updates committed by slow transactions are not missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+COLUMNS = {
+    "id": np.int64,
+    "patient_id": np.int64,
+    "site_id": np.int64,
+    "eye_side": np.int8,
+    "quality": np.int8,
+    "anatomy": np.int8,
+    "over_illuminated": np.int8,
+}
+
+
+class ImageSnapshotService:
+    """
+    In-memory columnar copy of the images table for ad-hoc readiness
+    analysis.
+
+    Each image is one slot in a set of NumPy arrays sorted by image id, with
+    enums stored as small integer codes and NULL as -1. The (site, patient)
+    grouping does not depend on the readiness criteria, so it is computed
+    once per refresh and every criteria change is evaluated with a few
+    vectorized masks and bincounts.
+    """
+
+    def __init__(self, data_version_service=None):
+        self.data_version_service = data_version_service or DataVersionService()
+        self._lock = threading.Lock()
+        # (columns, groups), swapped as one reference so readers never see a
+        # grouping computed for different columns
+        self._state = None
+        self._version = None
+        self._refreshed_at = None
+
+    def refresh(self):
+        """
+        Bring the snapshot up to date with the images table.
+
+        Only rows created or modified since the previous refresh are read;
+        deletions are detected by comparing row counts, which then costs one
+        extra scan of the id column.
+        """
+        version = self.data_version_service.get_version(
+            max_staleness=current_app.config.get("STATISTICS_CACHE_MAX_STALENESS", 0)
+        )
+
+        with self._lock:
+            if self._state is not None and self._version == version:
+                return
+
+            started_at = datetime.now(timezone.utc)
+            if self._state is None:
+                columns = self._load_rows(db.session.query(*self._row_columns()))
+            else:
+                columns = self._apply_changes(self._state[0])
+
+            total_images = db.session.query(func.count(Image.id)).scalar()
+            if total_images != len(columns["id"]):
+                existing_ids = np.fromiter(
+                    (row[0] for row in db.session.query(Image.id)), dtype=np.int64
+                )
+                keep = np.isin(columns["id"], existing_ids)
+                columns = {name: array[keep] for name, array in columns.items()}
+
+            self._state = (columns, self._group_pairs(columns))
+            self._version = version
+            self._refreshed_at = started_at
+
+    def _row_columns(self):
+        return (
+            Image.id,
+            Image.patient_id,
+            Image.site_id,
+            Image.eye_side,
+            Image.quality_score,
+            Image.anatomy_score,
+            Image.over_illuminated,
+        )
+
+    def _load_rows(self, query):
+        values = {name: [] for name in COLUMNS}
+
+        for row in query.order_by(Image.id).yield_per(10000):
+            values["id"].append(row.id)
+            values["patient_id"].append(row.patient_id)
+            values["site_id"].append(row.site_id if row.site_id is not None else UNSET)
+            values["eye_side"].append(EYE_CODES.get(row.eye_side, UNSET))
+            values["quality"].append(QUALITY_CODES.get(row.quality_score, UNSET))
+            values["anatomy"].append(ANATOMY_CODES.get(row.anatomy_score, UNSET))
+            values["over_illuminated"].append(
+                UNSET if row.over_illuminated is None else int(row.over_illuminated)
+            )
+
+        return {name: np.array(values[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def _apply_changes(self, columns):
+        max_id = int(columns["id"][-1]) if len(columns["id"]) else 0
+        changed = self._load_rows(
+            db.session.query(*self._row_columns()).filter(
+                (Image.id > max_id) | (Image.modified_at >= self._refreshed_at - REFRESH_OVERLAP)
+            )
+        )
+        if not len(changed["id"]):
+            return columns
+
+        # Copy before writing so concurrent readers keep a consistent view
+        positions = np.searchsorted(columns["id"], changed["id"])
+        in_range = positions < len(columns["id"])
+        existing = np.zeros(len(changed["id"]), dtype=bool)
+        existing[in_range] = columns["id"][positions[in_range]] == changed["id"][in_range]
+
+        updated = {name: array.copy() for name, array in columns.items()}
+        for name in COLUMNS:
+            updated[name][positions[existing]] = changed[name][existing]
+
+        added = ~existing
+        if added.any():
+            updated = {
+                name: np.concatenate([updated[name], changed[name][added]]) for name in COLUMNS
+            }
+            order = np.argsort(updated["id"], kind="stable")
+            updated = {name: array[order] for name, array in updated.items()}
+
+        return updated
+
+    def _group_pairs(self, columns):
+        """
+        Precompute the (site, patient) grouping shared by every evaluation,
+        along with the criteria columns of images that have a site.
+        """
+        with_site = columns["site_id"] != UNSET
+        pair_keys = (columns["site_id"][with_site] << 32) | columns["patient_id"][with_site]
+        pairs, pair_index = np.unique(pair_keys, return_inverse=True)
+        sites, site_index = np.unique(pairs >> 32, return_inverse=True)
+
+        return {
+            "eye_side": columns["eye_side"][with_site],
+            "quality": columns["quality"][with_site],
+            "anatomy": columns["anatomy"][with_site],
+            "over_illuminated": columns["over_illuminated"][with_site],
+            "pair_index": pair_index,
+            "pair_count": len(pairs),
+            "sites": sites,
+            "site_index": site_index,
+        }
+
+    def evaluate_readiness(self, quality=None, anatomy=None, ignore_illumination=False):
+        """
+        Evaluate per-site and global AI readiness under arbitrary criteria.
+
+        Args:
+            quality (list, optional): Acceptable ImageQualityScore values
+            anatomy (list, optional): Acceptable AnatomyScore values
+            ignore_illumination (bool): Count over-illuminated images as good
+
+        Returns:
+            dict: "site_stats" and "global_stats" shaped like the dashboard
+                statistics, plus the number of images evaluated
+        """
+        self.refresh()
+        columns, groups = self._state
+
+        quality_codes = [QUALITY_CODES[score] for score in (quality if quality is not None else GOOD_QUALITY)]
+        anatomy_codes = [ANATOMY_CODES[score] for score in (anatomy if anatomy is not None else GOOD_ANATOMY)]
+
+        # Lookup tables indexed by code + 1, so UNSET maps to slot 0
+        quality_ok = np.zeros(len(QUALITY_CODES) + 1, dtype=bool)
+        quality_ok[np.array(quality_codes, dtype=np.int64) + 1] = True
+        anatomy_ok = np.zeros(len(ANATOMY_CODES) + 1, dtype=bool)
+        anatomy_ok[np.array(anatomy_codes, dtype=np.int64) + 1] = True
+
+        good = quality_ok[groups["quality"] + 1] & anatomy_ok[groups["anatomy"] + 1]
+        if not ignore_illumination:
+            good &= groups["over_illuminated"] == 0
+        eye_side = groups["eye_side"]
+
+        pair_index = groups["pair_index"]
+        has_left = np.zeros(groups["pair_count"], dtype=bool)
+        has_left[pair_index[good & (eye_side == EYE_CODES[EyeSide.LEFT])]] = True
+        has_right = np.zeros(groups["pair_count"], dtype=bool)
+        has_right[pair_index[good & (eye_side == EYE_CODES[EyeSide.RIGHT])]] = True
+
+        site_count = len(groups["sites"])
+        total_patients = np.bincount(groups["site_index"], minlength=site_count)
+        available = np.bincount(groups["site_index"][has_left & has_right], minlength=site_count)
+        per_site = {
+            int(site_id): (int(total), int(ready))
+            for site_id, total, ready in zip(groups["sites"], total_patients, available)
+        }
+
+        site_stats = []
+        for site in Site.query.order_by(Site.name).all():
+            total, ready = per_site.get(site.id, (0, 0))
+            site_stats.append({
+                "id": site.id,
+                "name": site.name,
+                "location": site.location,
+                "total_patients": total,
+                "available_for_ai": ready,
+                "availability_percentage": round(ready / total * 100, 1) if total > 0 else 0,
+            })
+
+        total = sum(site["total_patients"] for site in site_stats)
+        ready = sum(site["available_for_ai"] for site in site_stats)
+        return {
+            "image_count": len(columns["id"]),
+            "site_stats": site_stats,
+            "global_stats": {
+                "total_sites": len(site_stats),
+                "total_patients": total,
+                "available_patients": ready,
+                "readiness_percentage": round(ready / total * 100, 1) if total > 0 else 0,
+            },
+        }
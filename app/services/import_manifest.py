@@ -0,0 +1,64 @@
+import json
+import os
+import sqlite3
+
+
+class ImportManifest:
+    """
+    Ledger of completed import work, kept in a small SQLite file next to
+    the import rather than in the application database.
+
+    Each unit of work has a key, e.g. a source file identified by its path,
+    size and modification time, recorded once the rows it produced are
+    committed. A resumed import skips recorded keys with one primary key
+    lookup each. Named checkpoints (e.g. CSV rows done) are stored as JSON.
+
+    Keys are recorded after the application commit, so an import killed
+    between the two commits re-imports at most that one batch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, image_id INTEGER);"
+            "CREATE TABLE IF NOT EXISTS checkpoints (name TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    @staticmethod
+    def file_key(path):
+        """Key of a source file, which changes if the file is replaced or edited."""
+        stat = os.stat(path)
+        return f"file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def clear(self):
+        """Forget all recorded work, for a fresh import."""
+        with self.connection:
+            self.connection.execute("DELETE FROM entries")
+            self.connection.execute("DELETE FROM checkpoints")
+
+    def is_done(self, key):
+        return self.connection.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def record(self, entries):
+        """Record (key, image id) pairs as done, in one transaction."""
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO entries (key, image_id) VALUES (?, ?)", entries)
+
+    def done_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_checkpoint(self, name, default=None):
+        row = self.connection.execute("SELECT value FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_checkpoint(self, name, value):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (name, value) VALUES (?, ?)", (name, json.dumps(value))
+            )
+
+    def close(self):
+        self.connection.close()
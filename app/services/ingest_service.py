@@ -0,0 +1,136 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import time
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app import db
+from app.services.image_service import ImageService
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class IngestService:
+    """
+    Parallel bulk import of local image files.
+
+    Worker threads hash, probe and link each file into storage, which is
+    where the disk time goes, while the calling thread is the only one
+    touching the database: it writes the image rows batch_size at a time,
+    in one transaction per batch. At most max_pending files are in flight,
+    so memory stays bounded however many files the input yields, and the
+    input is consumed lazily, so it can be a generator.
+
+    Derived work (analysis of images without a flag, thumbnails, tiles) is
+    not queued, so an import of any size never holds more than a batch in
+    memory and exits once its rows are written; run analyze-pending,
+    backfill-thumbnails and generate-tiles afterwards.
+
+    With an ImportManifest, entries whose key is recorded as done are
+    skipped and the keys of each batch are recorded once it is committed.
+    With in_place, files in an EXTERNAL_IMAGE_ROOTS archive are registered
+    where they are, reading only their headers.
+    """
+
+    def __init__(self):
+        self.image_service = ImageService()
+        self.blob_service = self.image_service.blob_service
+
+    def ingest(self, entries, workers=None, batch_size=500, max_pending=None, progress=None, manifest=None,
+               in_place=False):
+        """
+        Import images from local files.
+
+        Args:
+            entries (iterable): (key, image_data, file path) triples,
+                image_data as for ImageService.create_image and key
+                identifying the entry in the manifest, or None
+            workers (int, optional): File worker threads
+            batch_size (int): Images written per transaction
+            max_pending (int, optional): Files in flight before the input
+                is paused, default four per worker
+            progress (callable, optional): Called with the running summary
+                after each batch
+            manifest (ImportManifest, optional): Ledger of entries already
+                imported
+            in_place (bool): Register files in an external root instead of
+                storing copies
+
+        Returns:
+            dict: imported, skipped and failed counts, elapsed seconds and
+                images_per_second
+        """
+        workers = workers or default_workers()
+        max_pending = max_pending or workers * 4
+        summary = {"imported": 0, "skipped": 0, "failed": 0}
+        started = time.monotonic()
+        app = current_app._get_current_object()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+            pending = deque()
+            batch = []
+
+            def collect():
+                key, image_data, file_path, future = pending.popleft()
+                try:
+                    batch.append((key, image_data, future.result()))
+                except Exception as e:
+                    logger.error(f"Error importing image {file_path}: {str(e)}")
+                    summary["failed"] += 1
+                if len(batch) >= batch_size:
+                    self._write(batch, summary, started, progress, manifest)
+
+            for key, image_data, file_path in entries:
+                if manifest and key and manifest.is_done(key):
+                    summary["skipped"] += 1
+                    continue
+                # Wait for the oldest file before reading more of the input
+                while len(pending) >= max_pending:
+                    collect()
+                pending.append((key, image_data, file_path, executor.submit(self._store, app, file_path, in_place)))
+
+            while pending:
+                collect()
+            if batch:
+                self._write(batch, summary, started, progress, manifest)
+
+        return self._summarize(summary, started)
+
+    def _store(self, app, file_path, in_place):
+        with app.app_context():
+            if in_place:
+                return self.blob_service.register_in_place(file_path)
+            return self.blob_service.store_file(file_path, secure_filename(os.path.basename(file_path)))
+
+    def _write(self, batch, summary, started, progress, manifest):
+        try:
+            image_ids = self.image_service.create_images(
+                [(image_data, stored) for _, image_data, stored in batch], schedule_processing=False
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error writing {len(batch)} images: {str(e)}")
+            summary["failed"] += len(batch)
+            # Their files were stored by the workers; keep none no image uses
+            self.blob_service.abandon([stored for _, _, stored in batch])
+        else:
+            summary["imported"] += len(batch)
+            if manifest:
+                manifest.record([(key, image_id) for (key, _, _), image_id in zip(batch, image_ids) if key])
+        batch.clear()
+        if progress:
+            progress(self._summarize(summary, started))
+
+    def _summarize(self, summary, started):
+        elapsed = time.monotonic() - started
+        return {
+            **summary,
+            "elapsed": round(elapsed, 2),
+            "images_per_second": round(summary["imported"] / elapsed, 1) if elapsed > 0 else 0,
+        }
@@ -1,7 +1,18 @@
+from sqlalchemy import insert, select, update
 from app.models.patient import Patient
+from app.services.blob_service import BlobService
+from app.services.data_version_service import DataVersionService
+from app.services.readiness_service import ReadinessService
+from app.services.rollup_service import RollupService
 from app import db
 
 class PatientService:
+    def __init__(self):
+        self.readiness_service = ReadinessService()
+        self.rollup_service = RollupService()
+        self.data_version_service = DataVersionService()
+        self.blob_service = BlobService()
+
     def get_all_patients(self):
         return Patient.query.order_by(Patient.created_at.desc()).all()
 
@@ -14,6 +25,7 @@ class PatientService:
             sex = patient_data.get('sex')
         )
         db.session.add(patient)
+        self.data_version_service.bump()
         db.session.commit()
         return patient
     
@@ -27,14 +39,85 @@ class PatientService:
         if 'sex' in patient_data:
             patient.sex = patient_data['sex']
         
+        self.data_version_service.bump()
         db.session.commit()
         return patient
+
+    def upsert_patients(self, patients):
+        """
+        Create or update many patients with given IDs in one transaction.
+
+        Existing IDs are found with a single IN query, then new patients are
+        written with one bulk INSERT and existing ones with one bulk UPDATE
+        by primary key. A later entry for the same ID wins.
+
+        Args:
+            patients (list): Dicts with id, birth_date and sex
+
+        Returns:
+            tuple: (number of patients created, number updated)
+        """
+        by_id = {patient['id']: patient for patient in patients}
+        if not by_id:
+            return 0, 0
+
+        created, updated = self._write_patients(by_id)
+        self.data_version_service.bump()
+        db.session.commit()
+        return created, updated
+
+    def upsert_patients_each(self, patients):
+        """
+        upsert_patients() one patient at a time, each in its own savepoint
+        of a single transaction, for a batch that failed as a whole: only
+        the patients that fail themselves are left out.
+
+        Returns:
+            tuple: (number of patients created, number updated, list of
+                (patient, exception) pairs for those that failed)
+        """
+        created = updated = 0
+        failed = []
+        for patient_id, patient in {patient['id']: patient for patient in patients}.items():
+            try:
+                with db.session.begin_nested():
+                    written = self._write_patients({patient_id: patient})
+            except Exception as e:
+                failed.append((patient, e))
+            else:
+                created += written[0]
+                updated += written[1]
+
+        if created or updated:
+            self.data_version_service.bump()
+        db.session.commit()
+        return created, updated, failed
+
+    def _write_patients(self, by_id):
+        existing_ids = set(db.session.scalars(select(Patient.id).where(Patient.id.in_(by_id))))
+        created = [patient for patient_id, patient in by_id.items() if patient_id not in existing_ids]
+        updated = [patient for patient_id, patient in by_id.items() if patient_id in existing_ids]
+
+        if created:
+            db.session.execute(insert(Patient), created)
+        if updated:
+            db.session.execute(update(Patient), updated)
+        return len(created), len(updated)
     
     def delete_patient(self, patient_id):
         patient = self.get_patient_by_id(patient_id)
         if not patient:
             raise ValueError(f"Patient with ID {patient_id} not found")
         
+        self.readiness_service.remove_patient(patient_id)
+        released_paths = []
+        for image in patient.images:
+            self.rollup_service.remove_image(image)
+            released_paths.append(self.blob_service.release(image.image_path))
         db.session.delete(patient)
+        self.data_version_service.bump()
         db.session.commit()
+
+        for image_path in released_paths:
+            self.blob_service.remove_if_unreferenced(image_path)
         return True
\ No newline at end of file
@@ -0,0 +1,112 @@
+from sqlalchemy import and_, case, delete, insert
+from sqlalchemy.sql import func
+from app import db
+from app.models.image import AnatomyScore, EyeSide, Image, ImageQualityScore
+from app.models.patient import Patient
+from app.models.patient_site_readiness import PatientSiteReadiness
+from app.services.data_version_service import DataVersionService
+
+GOOD_QUALITY = [ImageQualityScore.HIGH, ImageQualityScore.ACCEPTABLE]
+GOOD_ANATOMY = [AnatomyScore.GOOD, AnatomyScore.ACCEPTABLE]
+
+
+class ReadinessService:
+    """
+    Maintains the patient_site_readiness table.
+
+    The write paths call into this service before committing, so the flags
+    always change in the same transaction as the images they summarize.
+    """
+
+    def __init__(self):
+        self.data_version_service = DataVersionService()
+
+    def good_image_condition(self, eye_side):
+        """SQL condition matching a good image of the given eye."""
+        return and_(
+            Image.eye_side == eye_side,
+            Image.quality_score.in_(GOOD_QUALITY),
+            Image.anatomy_score.in_(GOOD_ANATOMY),
+            Image.over_illuminated == False,
+        )
+
+    def patient_readiness_query(self):
+        """
+        One row per (site, patient) pair with images, flagging whether the
+        patient has at least one good image of each eye at that site.
+        """
+        return (
+            db.session.query(
+                Image.patient_id.label("patient_id"),
+                Image.site_id.label("site_id"),
+                (func.max(case((self.good_image_condition(EyeSide.LEFT), 1), else_=0)) == 1).label("has_good_left"),
+                (func.max(case((self.good_image_condition(EyeSide.RIGHT), 1), else_=0)) == 1).label("has_good_right"),
+            )
+            .join(Patient, Patient.id == Image.patient_id)
+            .filter(Image.site_id.isnot(None))
+            .group_by(Image.site_id, Image.patient_id)
+        )
+
+    def refresh(self, patient_id, site_id):
+        """
+        Recompute the readiness row of a single (patient, site) pair from its
+        images. The row is removed once the pair has no images left.
+        """
+        if patient_id is None or site_id is None:
+            return None
+
+        db.session.flush()
+        flags = (
+            self.patient_readiness_query()
+            .filter(Image.patient_id == patient_id, Image.site_id == site_id)
+            .first()
+        )
+        readiness = db.session.get(PatientSiteReadiness, (patient_id, site_id))
+
+        if flags is None:
+            if readiness:
+                db.session.delete(readiness)
+            return None
+
+        if not readiness:
+            readiness = PatientSiteReadiness(patient_id=patient_id, site_id=site_id)
+            db.session.add(readiness)
+
+        readiness.has_good_left = bool(flags.has_good_left)
+        readiness.has_good_right = bool(flags.has_good_right)
+        return readiness
+
+    def remove_patient(self, patient_id):
+        db.session.execute(
+            delete(PatientSiteReadiness).where(PatientSiteReadiness.patient_id == patient_id)
+        )
+
+    def remove_site(self, site_id):
+        db.session.execute(
+            delete(PatientSiteReadiness).where(PatientSiteReadiness.site_id == site_id)
+        )
+
+    def backfill(self):
+        """
+        Rebuild the whole table from the images table with a single
+        INSERT ... SELECT.
+
+        Returns:
+            int: Number of (patient, site) rows written
+        """
+        db.session.execute(delete(PatientSiteReadiness))
+        readiness_rows = self.patient_readiness_query().subquery()
+        db.session.execute(
+            insert(PatientSiteReadiness).from_select(
+                ["patient_id", "site_id", "has_good_left", "has_good_right"],
+                db.select(
+                    readiness_rows.c.patient_id,
+                    readiness_rows.c.site_id,
+                    readiness_rows.c.has_good_left,
+                    readiness_rows.c.has_good_right,
+                ),
+            )
+        )
+        self.data_version_service.bump()
+        db.session.commit()
+        return db.session.query(func.count()).select_from(PatientSiteReadiness).scalar()
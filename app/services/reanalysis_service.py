@@ -0,0 +1,223 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import bindparam, func, select, update
+from app import db
+from app.models.image import AnalysisStatus, Image
+from app.services.data_version_service import DataVersionService
+from app.services.image_service import is_over_illuminated
+from app.services.readiness_service import ReadinessService
+from app.services.rollup_service import RollupService
+from app.services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def analyze_file(task):
+    """Worker process entry point: (image id, path, threshold, max edge) -> (image id, result or None)."""
+    image_id, path, threshold, max_edge = task
+    if path is None:
+        return image_id, None
+    try:
+        return image_id, bool(is_over_illuminated(path, threshold=threshold, max_edge=max_edge))
+    except Exception:
+        return image_id, None
+
+
+class ReanalysisService:
+    """
+    Re-runs the over-illumination analysis over the whole image archive.
+
+    Images are read in id order and analyzed on a process pool, one batch
+    ahead of the batch being written back. Each batch is written in one
+    transaction: a bulk UPDATE records the status of every image, and only
+    images whose flag changed go through the ORM so readiness and rollups
+    stay consistent. After each commit the last image id is saved to a
+    checkpoint file, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self):
+        self.storage_service = StorageService()
+        self.readiness_service = ReadinessService()
+        self.rollup_service = RollupService()
+        self.data_version_service = DataVersionService()
+
+    def reanalyze(self, threshold, max_edge=None, workers=None, batch_size=500,
+                  checkpoint_path=None, restart=False, progress=None):
+        """
+        Analyze every image with the given settings and record the results.
+
+        Args:
+            threshold (float): Luminance threshold for is_over_illuminated
+            max_edge (int, optional): Downsampling for is_over_illuminated
+            workers (int, optional): Worker processes, default all available cores
+            batch_size (int): Images per write transaction and checkpoint
+            checkpoint_path (str, optional): File recording progress; a run
+                with the same settings resumes from it unless restart is set
+            progress (callable, optional): Called with the running summary
+                after each batch
+
+        Returns:
+            dict: processed, changed and failed counts, elapsed seconds and
+                images_per_second for this run
+        """
+        settings = {"threshold": threshold, "max_edge": max_edge}
+        checkpoint = self._load_checkpoint(checkpoint_path, settings) if not restart else None
+        last_id = checkpoint["last_id"] if checkpoint else 0
+        summary = {
+            "processed": 0,
+            "changed": 0,
+            "failed": 0,
+            "remaining": db.session.query(func.count(Image.id)).filter(Image.id > last_id).scalar(),
+            "resumed_from": last_id,
+        }
+        started = time.monotonic()
+
+        workers = workers or available_cores()
+        # Spawned workers start clean instead of inheriting the app's database
+        # connections and background threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            in_flight = deque()
+            for batch in self._batches(last_id, batch_size):
+                tasks = [
+                    (row.id, self._resolve(row.image_path), threshold, max_edge)
+                    for row in batch
+                ]
+                chunksize = max(1, len(tasks) // (workers * 4))
+                in_flight.append((batch, executor.map(analyze_file, tasks, chunksize=chunksize)))
+
+                # Keep the pool busy with the next batch while writing this one
+                if len(in_flight) > 1:
+                    last_id = self._finish(*in_flight.popleft(), summary, started, checkpoint_path, settings, progress)
+
+            while in_flight:
+                last_id = self._finish(*in_flight.popleft(), summary, started, checkpoint_path, settings, progress)
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return self._summarize(summary, started)
+
+    def _resolve(self, image_path):
+        """
+        File path of an image, or None when there is none to analyze, e.g.
+        under an external root that is no longer configured; such images
+        are recorded as failed rather than ending the run.
+        """
+        if not image_path:
+            return None
+        try:
+            return self.storage_service.path_for(image_path)
+        except ValueError as e:
+            logger.warning(str(e))
+            return None
+
+    def _batches(self, last_id, batch_size):
+        # Each batch is read in full by its own keyset query before it is
+        # yielded: _write commits on this session between batches, which
+        # would end a cursor left open across them
+        while True:
+            batch = db.session.execute(
+                select(Image.id, Image.image_path, Image.over_illuminated, Image.analysis_status)
+                .where(Image.id > last_id)
+                .order_by(Image.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield batch
+            if len(batch) < batch_size:
+                return
+
+    def _finish(self, batch, results, summary, started, checkpoint_path, settings, progress):
+        changed = self._write(batch, dict(results))
+        summary["processed"] += len(batch)
+        summary["changed"] += changed["changed"]
+        summary["failed"] += changed["failed"]
+        last_id = batch[-1].id
+
+        if checkpoint_path:
+            self._save_checkpoint(checkpoint_path, {**settings, "last_id": last_id})
+        if progress:
+            progress(self._summarize(summary, started))
+        return last_id
+
+    def _write(self, batch, results):
+        statuses = []
+        changed_flags = {}
+        failed = 0
+
+        for row in batch:
+            result = results.get(row.id)
+            if result is None:
+                failed += 1
+                statuses.append({"image_id": row.id, "status": AnalysisStatus.FAILED})
+            elif row.over_illuminated != result:
+                changed_flags[row.id] = result
+            elif row.analysis_status != AnalysisStatus.COMPLETE:
+                statuses.append({"image_id": row.id, "status": AnalysisStatus.COMPLETE})
+
+        if statuses:
+            images = Image.__table__
+            # Status only, not an edit: keep modified_at as it was
+            db.session.execute(
+                update(images)
+                .where(images.c.id == bindparam("image_id"))
+                .values(analysis_status=bindparam("status"), modified_at=images.c.modified_at),
+                statuses,
+            )
+
+        if changed_flags:
+            refreshed = set()
+            for image in Image.query.filter(Image.id.in_(changed_flags)).all():
+                previous_key = self.rollup_service.key_for(image)
+                image.over_illuminated = changed_flags[image.id]
+                image.analysis_status = AnalysisStatus.COMPLETE
+                self.rollup_service.update_image(previous_key, image)
+                refreshed.add((image.patient_id, image.site_id))
+            db.session.flush()
+            for patient_id, site_id in refreshed:
+                self.readiness_service.refresh(patient_id, site_id)
+            self.data_version_service.bump()
+
+        db.session.commit()
+        return {"changed": len(changed_flags), "failed": failed}
+
+    def _summarize(self, summary, started):
+        elapsed = time.monotonic() - started
+        return {
+            **summary,
+            "elapsed": round(elapsed, 2),
+            "images_per_second": round(summary["processed"] / elapsed, 1) if elapsed > 0 else 0,
+        }
+
+    def _load_checkpoint(self, path, settings):
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if any(checkpoint.get(key) != value for key, value in settings.items()):
+            logger.info(f"Ignoring checkpoint {path} written with other settings")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, path, checkpoint):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        with os.fdopen(fd, "w") as temp:
+            json.dump(checkpoint, temp)
+        os.replace(temp_path, path)
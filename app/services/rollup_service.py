@@ -0,0 +1,226 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import cast, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+from app import db
+from app.models.image import Image
+from app.models.image_daily_rollup import ImageDailyRollup
+from app.services.data_version_service import DataVersionService
+from app.services.statistics_service import empty_image_distribution
+
+DIMENSIONS = ("day", "site_id", "eye_side", "quality_score", "anatomy_score", "over_illuminated")
+GRANULARITIES = ("day", "week", "month")
+
+
+class RollupService:
+    """
+    Maintains the image_daily_rollups table and answers time-windowed
+    questions from it.
+
+    Images without an acquisition date cannot fall into any date window and
+    are not rolled up.
+    """
+
+    def __init__(self):
+        self.data_version_service = DataVersionService()
+
+    def key_for(self, image):
+        """Rollup dimensions of an image, or None when it has no acquisition date."""
+        if not image.acquisition_date:
+            return None
+
+        day = image.acquisition_date
+        if isinstance(day, datetime):
+            day = day.date()
+
+        return (
+            day,
+            image.site_id,
+            image.eye_side,
+            image.quality_score,
+            image.anatomy_score,
+            bool(image.over_illuminated),
+        )
+
+    def record(self, key, delta):
+        """
+        Adjust the image count of one rollup row, creating or removing it as
+        needed. The count is changed with a single UPDATE rather than read
+        and written back, so concurrent writers cannot lose each other's
+        increments. A row is only inserted when none matched; if another
+        writer inserted it first, the unique index on the dimensions (which
+        treats NULLs as equal) rejects the insert and the increment is
+        applied to their row.
+        """
+        if key is None or delta == 0:
+            return
+
+        filters = dict(zip(DIMENSIONS, key))
+        condition = [getattr(ImageDailyRollup, name) == value for name, value in filters.items()]
+
+        if delta < 0:
+            self._increment(condition, delta)
+            db.session.execute(delete(ImageDailyRollup).where(*condition, ImageDailyRollup.image_count <= 0))
+            return
+
+        if self._increment(condition, delta):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(ImageDailyRollup).values(image_count=delta, **filters))
+        except IntegrityError:
+            self._increment(condition, delta)
+
+    def _increment(self, condition, delta):
+        result = db.session.execute(
+            update(ImageDailyRollup)
+            .where(*condition)
+            .values(image_count=ImageDailyRollup.image_count + delta)
+        )
+        return result.rowcount > 0
+
+    def add_image(self, image):
+        self.record(self.key_for(image), 1)
+
+    def remove_image(self, image):
+        self.record(self.key_for(image), -1)
+
+    def update_image(self, previous_key, image):
+        key = self.key_for(image)
+        if key != previous_key:
+            self.record(previous_key, -1)
+            self.record(key, 1)
+
+    def rebuild(self):
+        """
+        Rebuild the whole table from the images table with a single
+        INSERT ... SELECT.
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        if db.session.get_bind().dialect.name == "sqlite":
+            day = func.date(Image.acquisition_date)
+        else:
+            day = cast(Image.acquisition_date, db.Date)
+        over_illuminated = func.coalesce(Image.over_illuminated, False)
+
+        grouped = (
+            db.select(
+                day,
+                Image.site_id,
+                Image.eye_side,
+                Image.quality_score,
+                Image.anatomy_score,
+                over_illuminated,
+                func.count(Image.id),
+            )
+            .where(Image.acquisition_date.isnot(None))
+            .group_by(day, Image.site_id, Image.eye_side, Image.quality_score, Image.anatomy_score, over_illuminated)
+        )
+
+        db.session.execute(delete(ImageDailyRollup))
+        db.session.execute(
+            insert(ImageDailyRollup).from_select([*DIMENSIONS, "image_count"], grouped)
+        )
+        self.data_version_service.bump()
+        db.session.commit()
+        return db.session.query(func.count(ImageDailyRollup.id)).scalar()
+
+    def _window_query(self, columns, start=None, end=None, site_id=None):
+        query = db.session.query(*columns)
+        if start:
+            query = query.filter(ImageDailyRollup.day >= start)
+        if end:
+            query = query.filter(ImageDailyRollup.day <= end)
+        if site_id is not None:
+            query = query.filter(ImageDailyRollup.site_id == site_id)
+        return query
+
+    def _distribution_columns(self):
+        return (
+            ImageDailyRollup.quality_score,
+            ImageDailyRollup.anatomy_score,
+            ImageDailyRollup.over_illuminated,
+            func.sum(ImageDailyRollup.image_count).label("image_count"),
+        )
+
+    def _add_to_distribution(self, distribution, row):
+        distribution["total_images"] += row.image_count
+        quality = row.quality_score.value if row.quality_score else "UNRATED"
+        distribution["quality"][quality] += row.image_count
+        anatomy = row.anatomy_score.value if row.anatomy_score else "UNRATED"
+        distribution["anatomy"][anatomy] += row.image_count
+        illumination = "OVER_ILLUMINATED" if row.over_illuminated else "NORMAL"
+        distribution["illumination"][illumination] += row.image_count
+
+    def get_image_counts(self, start=None, end=None, site_id=None):
+        """
+        Image distributions for images acquired within [start, end].
+
+        Args:
+            start (date, optional): First acquisition day included
+            end (date, optional): Last acquisition day included
+            site_id (int, optional): Restrict counts to one site
+
+        Returns:
+            dict: Same shape as StatisticsService.get_image_quality_statistics
+        """
+        rows = (
+            self._window_query(self._distribution_columns(), start, end, site_id)
+            .group_by(
+                ImageDailyRollup.quality_score,
+                ImageDailyRollup.anatomy_score,
+                ImageDailyRollup.over_illuminated,
+            )
+            .all()
+        )
+
+        distribution = empty_image_distribution()
+        for row in rows:
+            self._add_to_distribution(distribution, row)
+        return distribution
+
+    def get_trends(self, granularity="week", start=None, end=None, site_id=None):
+        """
+        Image distributions per day, week (starting Monday) or month.
+
+        Returns:
+            list: One distribution per period that has images, ordered by
+                period, each with a "period" key holding its first day
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularity must be one of: {', '.join(GRANULARITIES)}")
+
+        rows = (
+            self._window_query((ImageDailyRollup.day, *self._distribution_columns()), start, end, site_id)
+            .group_by(
+                ImageDailyRollup.day,
+                ImageDailyRollup.quality_score,
+                ImageDailyRollup.anatomy_score,
+                ImageDailyRollup.over_illuminated,
+            )
+            .all()
+        )
+
+        periods = {}
+        for row in rows:
+            period = self._period_start(row.day, granularity)
+            if period not in periods:
+                periods[period] = empty_image_distribution()
+            self._add_to_distribution(periods[period], row)
+
+        return [
+            {"period": period.isoformat(), **periods[period]}
+            for period in sorted(periods)
+        ]
+
+    def _period_start(self, day, granularity):
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        if granularity == "week":
+            return day - timedelta(days=day.weekday())
+        if granularity == "month":
+            return day.replace(day=1)
+        return day
@@ -1,7 +1,14 @@
 from app.models.site import Site
+from app.services.data_version_service import DataVersionService
+from app.services.readiness_service import ReadinessService
+from app.services.rollup_service import RollupService
 from app import db
 
 class SiteService:
+    def __init__(self):
+        self.readiness_service = ReadinessService()
+        self.rollup_service = RollupService()
+        self.data_version_service = DataVersionService()
 
     def get_all_sites(self):
         return Site.query.order_by(Site.name).all()
@@ -19,6 +26,7 @@ class SiteService:
         )
 
         db.session.add(site)
+        self.data_version_service.bump()
         db.session.commit()
         return site
     
@@ -33,6 +41,7 @@ class SiteService:
         if 'location' in site_data:
             site.location = site_data['location']
         
+        self.data_version_service.bump()
         db.session.commit()
         return site
     
@@ -42,7 +51,14 @@ class SiteService:
         if not site:
             raise ValueError(f"Site with ID {site_id} not found")
 
+        self.readiness_service.remove_site(site_id)
+        # Images outlive their site with site_id cleared, so their counts move
+        for image in site.images:
+            previous_rollup_key = self.rollup_service.key_for(image)
+            image.site_id = None
+            self.rollup_service.update_image(previous_rollup_key, image)
         db.session.delete(site)
+        self.data_version_service.bump()
         db.session.commit()
         return True
 
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+from app import db
+from app.services.data_version_service import DataVersionService
+from app.services.statistics_service import StatisticsService
+
+logger = logging.getLogger(__name__)
+
+
+class StatisticsCache:
+    """
+    In-memory cache in front of StatisticsService.
+
+    Entries are tagged with the data version they were computed at and are
+    served as-is until a write bumps the version, so repeated dashboard
+    reads between writes cost a dictionary lookup.
+
+    With STATISTICS_BACKGROUND_REFRESH enabled, an out-of-date entry is
+    still served (stale-while-revalidate) while a background thread
+    recomputes it. Only the very first read of an entry computes on the
+    request path.
+    """
+
+    def __init__(self, statistics_service=None, data_version_service=None):
+        self.statistics_service = statistics_service or StatisticsService()
+        self.data_version_service = data_version_service or DataVersionService()
+        self._entries = {}
+        self._computations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        # One refresher thread per process, started on first use so that
+        # forked workers never inherit a thread that only exists in the parent
+        self._refresher = None
+        self._refresher_pid = None
+        self._refresh_app = None
+        self._wake = threading.Event()
+
+    def get_dashboard_snapshot(self):
+        return self._get("dashboard", self.statistics_service.get_dashboard_snapshot)
+
+    def get_sites_statistics(self):
+        return self.get_dashboard_snapshot()["site_stats"]
+
+    def get_image_quality_statistics(self):
+        return self.get_dashboard_snapshot()["image_stats"]
+
+    def get_global_statistics(self):
+        return self.get_dashboard_snapshot()["global_stats"]
+
+    def get_version(self):
+        """Data version cached entries are validated against."""
+        return self.data_version_service.get_version(
+            max_staleness=current_app.config.get("STATISTICS_CACHE_MAX_STALENESS", 0)
+        )
+
+    def get_served_version(self, key="dashboard"):
+        """
+        Data version of the entry a read of key would return right now,
+        which lags get_version() while a stale entry is being refreshed.
+        """
+        version = self.get_version()
+        if not self._background_refresh():
+            return version
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] != version:
+            self._schedule_refresh(current_app._get_current_object())
+            return entry[0]
+        return version
+
+    def _get(self, key, compute):
+        version = self.get_version()
+        background = self._background_refresh()
+        if background:
+            self.data_version_service.add_commit_listener(self._schedule_refresh)
+
+        with self._lock:
+            self._computations.setdefault(key, compute)
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            if entry and background:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+                entry = None
+
+        if entry:
+            self._schedule_refresh(current_app._get_current_object())
+            return entry[1]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def refresh(self):
+        """Recompute every cached entry that is behind the current data version."""
+        version = self.data_version_service.get_version()
+
+        with self._lock:
+            computations = list(self._computations.items())
+            entries = dict(self._entries)
+
+        for key, compute in computations:
+            entry = entries.get(key)
+            if entry and entry[0] == version:
+                continue
+            value = compute()
+            with self._lock:
+                self._entries[key] = (version, value)
+                self.refreshes += 1
+
+    def _background_refresh(self):
+        return current_app.config.get("STATISTICS_BACKGROUND_REFRESH", False)
+
+    def _schedule_refresh(self, app):
+        with self._lock:
+            self._refresh_app = app
+            if (
+                self._refresher is None
+                or self._refresher_pid != os.getpid()
+                or not self._refresher.is_alive()
+            ):
+                self._wake = threading.Event()
+                self._refresher = threading.Thread(
+                    target=self._run_refresher, name="statistics-refresher", daemon=True
+                )
+                self._refresher_pid = os.getpid()
+                self._refresher.start()
+            self._wake.set()
+
+    def _run_refresher(self):
+        wake = self._wake
+        while True:
+            wake.wait()
+            wake.clear()
+            app = self._refresh_app
+
+            # Wait for a burst of writes to settle so a bulk import triggers
+            # one recomputation, but never longer than ten debounce periods
+            debounce = app.config.get("STATISTICS_REFRESH_DEBOUNCE", 1.0)
+            deadline = time.monotonic() + debounce * 10
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not wake.wait(min(debounce, remaining)):
+                    break
+                wake.clear()
+
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing dashboard statistics: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_cache_statistics(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups > 0 else 0,
+                "refreshes": self.refreshes,
+                "entries": len(self._entries),
+            }
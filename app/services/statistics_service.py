@@ -1,41 +1,71 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, case
 from sqlalchemy.sql import func
 from app import db
-from app.models.image import AnatomyScore, EyeSide, Image, ImageQualityScore
-from app.models.patient import Patient
+from app.models.image import AnatomyScore, Image, ImageQualityScore
+from app.models.patient_site_readiness import PatientSiteReadiness
 from app.models.site import Site
 
 
-class StatisticsService:
-    def get_sites_statistics(self):
-        sites = Site.query.order_by(Site.name).all()
-        site_stats = []
+def empty_image_distribution():
+    """Zeroed image distribution in the shape the dashboard charts consume."""
+    return {
+        "total_images": 0,
+        "quality": {"HIGH": 0, "ACCEPTABLE": 0, "LOW": 0, "UNRATED": 0},
+        "anatomy": {"GOOD": 0, "ACCEPTABLE": 0, "POOR": 0, "UNRATED": 0},
+        "illumination": {"OVER_ILLUMINATED": 0, "NORMAL": 0},
+    }
 
-        for site in sites:
-            patients_with_images = (
-                db.session.query(Patient.id)
-                .distinct()
-                .join(Image, Patient.id == Image.patient_id)
-                .filter(Image.site_id == site.id)
-                .all()
-            )
 
-            patients_with_images = [p[0] for p in patients_with_images]
-            total_patients = len(patients_with_images)
+def dashboard_counters(snapshot):
+    """
+    Flatten a dashboard snapshot into "path": value counters, e.g.
+    "site.3.available_for_ai" or "quality.HIGH", so two snapshots can be
+    compared key by key and only the differences sent to a dashboard.
+    """
+    counters = {f"global.{key}": value for key, value in snapshot["global_stats"].items()}
+
+    for site in snapshot["site_stats"]:
+        for key, value in site.items():
+            if key != "id":
+                counters[f"site.{site['id']}.{key}"] = value
+
+    image_stats = snapshot["image_stats"]
+    counters["images.total_images"] = image_stats["total_images"]
+    for group in ("quality", "anatomy", "illumination"):
+        for key, count in image_stats[group].items():
+            counters[f"{group}.{key}"] = count
+
+    for entry in image_stats.get("breakdown", []):
+        site_key = entry["site_id"] if entry.get("site_id") is not None else "none"
+        for key, count in entry["quality"].items():
+            counters[f"site_quality.{site_key}.{key}"] = count
+
+    return counters
 
-            patients_available = 0
-            for patient_id in patients_with_images:
-                if self._is_patient_available(patient_id, site.id):
-                    patients_available += 1
 
+def counter_changes(previous, current):
+    """Counters that differ between two dashboard_counters results; removed ones map to None."""
+    changes = {key: value for key, value in current.items() if previous.get(key) != value}
+    changes.update({key: None for key in previous if key not in current})
+    return changes
+
+
+class StatisticsService:
+    def get_sites_statistics(self):
+        site_stats = []
+
+        for site_id, name, location, total_patients, patients_available in self._site_readiness_rows():
             availability_percentage = (
                 (patients_available / total_patients * 100) if total_patients > 0 else 0
             )
 
             site_stats.append(
                 {
-                    "id": site.id,
-                    "name": site.name,
-                    "location": site.location,
+                    "id": site_id,
+                    "name": name,
+                    "location": location,
                     "total_patients": total_patients,
                     "available_for_ai": patients_available,
                     "availability_percentage": round(availability_percentage, 1),
@@ -44,118 +74,142 @@ class StatisticsService:
 
         return site_stats
 
-    def _is_patient_available(self, patient_id, site_id):
-        good_quality = [ImageQualityScore.HIGH, ImageQualityScore.ACCEPTABLE]
-        good_anatomy = [AnatomyScore.GOOD, AnatomyScore.ACCEPTABLE]
-
-        left_eye_good = (
-            db.session.query(Image)
-            .filter(
-                Image.patient_id == patient_id,
-                Image.site_id == site_id,
-                Image.eye_side == EyeSide.LEFT,
-                Image.quality_score.in_(good_quality),
-                Image.anatomy_score.in_(good_anatomy),
-                Image.over_illuminated == False,
+    def _site_readiness_rows(self):
+        """
+        Read patient totals and AI-ready counts for every site from the
+        patient_site_readiness table, which the write paths keep current.
+
+        Returns:
+            list: (site_id, name, location, total_patients, available) tuples ordered by site name
+        """
+        per_site = (
+            db.session.query(
+                PatientSiteReadiness.site_id.label("site_id"),
+                func.count().label("total_patients"),
+                func.sum(
+                    case(
+                        (and_(PatientSiteReadiness.has_good_left, PatientSiteReadiness.has_good_right), 1),
+                        else_=0,
+                    )
+                ).label("available"),
             )
-            .first()
-            is not None
+            .group_by(PatientSiteReadiness.site_id)
+            .subquery()
         )
 
-        right_eye_good = (
-            db.session.query(Image)
-            .filter(
-                Image.patient_id == patient_id,
-                Image.site_id == site_id,
-                Image.eye_side == EyeSide.RIGHT,
-                Image.quality_score.in_(good_quality),
-                Image.anatomy_score.in_(good_anatomy),
-                Image.over_illuminated == False,
+        rows = (
+            db.session.query(
+                Site.id,
+                Site.name,
+                Site.location,
+                func.coalesce(per_site.c.total_patients, 0),
+                func.coalesce(per_site.c.available, 0),
             )
-            .first()
-            is not None
-        )
-
-        return left_eye_good and right_eye_good
-
-    def get_image_quality_statistics(self):
-        total_images = Image.query.count()
-
-        # Quality score distribution
-        quality_counts = (
-            db.session.query(Image.quality_score, func.count(Image.id))
-            .group_by(Image.quality_score)
+            .outerjoin(per_site, per_site.c.site_id == Site.id)
+            .order_by(Site.name)
             .all()
         )
 
-        quality_stats = {"HIGH": 0, "ACCEPTABLE": 0, "LOW": 0, "UNRATED": 0}
-
-        for quality, count in quality_counts:
-            if quality:
-                quality_stats[quality.value] = count
-            else:
-                quality_stats["UNRATED"] = count
-
-        # Anatomy score distribution
-        anatomy_counts = (
-            db.session.query(Image.anatomy_score, func.count(Image.id))
-            .group_by(Image.anatomy_score)
+        return [tuple(row) for row in rows]
+
+    def get_image_quality_statistics(self, by_site=False, by_eye_side=False):
+        """
+        Image quality, anatomy and illumination distributions computed in a
+        single scan of the images table with conditional aggregation.
+
+        Args:
+            by_site (bool): Also break the distributions down per site
+            by_eye_side (bool): Also break the distributions down per eye side
+
+        Returns:
+            dict: Overall distributions, plus a "breakdown" list with one entry
+                per site and/or eye side when either flag is set
+        """
+        group_columns = []
+        if by_site:
+            group_columns.append(Image.site_id)
+        if by_eye_side:
+            group_columns.append(Image.eye_side)
+
+        rows = (
+            db.session.query(*group_columns, *self._distribution_columns())
+            .group_by(*group_columns)
             .all()
         )
 
-        anatomy_stats = {"GOOD": 0, "ACCEPTABLE": 0, "POOR": 0, "UNRATED": 0}
-
-        for anatomy, count in anatomy_counts:
-            if anatomy:
-                anatomy_stats[anatomy.value] = count
-            else:
-                anatomy_stats["UNRATED"] = count
-
-        # Over-illumination statistics
-        illumination_counts = (
-            db.session.query(Image.over_illuminated, func.count(Image.id))
-            .group_by(Image.over_illuminated)
-            .all()
-        )
-
-        illumination_stats = {"OVER_ILLUMINATED": 0, "NORMAL": 0}
+        if not group_columns:
+            return self._distribution_from_row(rows[0]._mapping)
+
+        breakdown = []
+        for row in rows:
+            entry = {}
+            if by_site:
+                entry["site_id"] = row.site_id
+            if by_eye_side:
+                entry["eye_side"] = row.eye_side.value if row.eye_side else None
+            entry.update(self._distribution_from_row(row._mapping))
+            breakdown.append(entry)
+
+        image_stats = empty_image_distribution()
+        for entry in breakdown:
+            image_stats["total_images"] += entry["total_images"]
+            for group in ("quality", "anatomy", "illumination"):
+                for key, count in entry[group].items():
+                    image_stats[group][key] += count
+
+        image_stats["breakdown"] = breakdown
+        return image_stats
+
+    def _distribution_columns(self):
+        def count_where(condition, label):
+            return func.sum(case((condition, 1), else_=0)).label(label)
+
+        columns = [func.count(Image.id).label("total_images")]
+        for score in ImageQualityScore:
+            columns.append(count_where(Image.quality_score == score, f"quality_{score.value}"))
+        columns.append(count_where(Image.quality_score.is_(None), "quality_UNRATED"))
+        for score in AnatomyScore:
+            columns.append(count_where(Image.anatomy_score == score, f"anatomy_{score.value}"))
+        columns.append(count_where(Image.anatomy_score.is_(None), "anatomy_UNRATED"))
+        columns.append(count_where(Image.over_illuminated == True, "illumination_OVER_ILLUMINATED"))
+        return columns
+
+    def _distribution_from_row(self, row):
+        image_stats = empty_image_distribution()
+        image_stats["total_images"] = row["total_images"] or 0
+
+        for group in ("quality", "anatomy"):
+            for key in image_stats[group]:
+                image_stats[group][key] = row[f"{group}_{key}"] or 0
+
+        over_illuminated = row["illumination_OVER_ILLUMINATED"] or 0
+        image_stats["illumination"]["OVER_ILLUMINATED"] = over_illuminated
+        image_stats["illumination"]["NORMAL"] = image_stats["total_images"] - over_illuminated
+        return image_stats
+    
+    def get_global_statistics(self):
+        """Get global statistics across all sites."""
+        return self._global_statistics_from_sites(self.get_sites_statistics())
 
-        for illuminated, count in illumination_counts:
-            if illuminated:
-                illumination_stats["OVER_ILLUMINATED"] = count
-            else:
-                illumination_stats["NORMAL"] = count
+    def get_dashboard_snapshot(self):
+        """
+        Compute everything the dashboard shows in one pass: per-site
+        readiness, image distributions and global totals derived from the
+        per-site rows rather than queried again.
+        """
+        site_stats = self.get_sites_statistics()
 
         return {
-            "total_images": total_images,
-            "quality": quality_stats,
-            "anatomy": anatomy_stats,
-            "illumination": illumination_stats,
+            "site_stats": site_stats,
+            "image_stats": self.get_image_quality_statistics(by_site=True),
+            "global_stats": self._global_statistics_from_sites(site_stats),
+            "generated_at": datetime.now(timezone.utc),
         }
-    
-    def get_global_statistics(self):
-        """Get global statistics across all sites."""
-        total_patients = 0
-        available_patients = 0
-        
-        sites = Site.query.all()
-        total_sites = len(sites)
-
-        for site in sites:
-            patients_with_images = (
-                db.session.query(Patient.id)
-                .distinct()
-                .join(Image, Patient.id == Image.patient_id)
-                .filter(Image.site_id == site.id)
-                .all()
-            )
-            
-            site_patients = [p[0] for p in patients_with_images]
-            total_patients += len(site_patients)
-            
-            for patient_id in site_patients:
-                if self._is_patient_available(patient_id, site.id):
-                    available_patients += 1
+
+    def _global_statistics_from_sites(self, site_stats):
+        total_sites = len(site_stats)
+        total_patients = sum(site["total_patients"] for site in site_stats)
+        available_patients = sum(site["available_for_ai"] for site in site_stats)
         
         readiness_percentage = (available_patients / total_patients * 100) if total_patients > 0 else 0
         
@@ -0,0 +1,390 @@
+from collections import namedtuple
+import errno
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+from app.models.image import IMAGE_PATH_LENGTH
+
+BLOB_DIRECTORY = "blobs"
+EXTERNAL_DIRECTORY = "external"
+CHUNK_SIZE = 1024 * 1024
+
+BLOB_PATH_PATTERN = re.compile(rf"^{BLOB_DIRECTORY}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[^/]*)?$")
+
+# pending: a private copy of the content, kept until the reference to it
+# commits and then settled over path (see StorageService.settle)
+StoredBlob = namedtuple("StoredBlob", ["sha256", "path", "size", "details", "pending"], defaults=(None,))
+
+# ioctl request that clones a file's extents on copy-on-write filesystems
+# (btrfs, XFS with reflink, bcachefs)
+FICLONE = 0x40049409
+
+
+class StorageService:
+    """
+    Single on-disk home of uploaded images, rooted at UPLOAD_FOLDER.
+
+    Files are written once, named by their content hash, and served from
+    here by the images blueprint; nothing is duplicated into the static
+    folder.
+
+    Images registered in place in an archive listed in EXTERNAL_IMAGE_ROOTS
+    have paths of the form external/<root name>/<path in the root>, which
+    resolve into that archive; the rest of the application treats them like
+    any other image path.
+    """
+
+    def root(self):
+        return os.path.abspath(current_app.config["UPLOAD_FOLDER"])
+
+    def external_roots(self):
+        return {
+            name: os.path.abspath(path)
+            for name, path in current_app.config.get("EXTERNAL_IMAGE_ROOTS", {}).items()
+        }
+
+    def is_external(self, image_path):
+        return (image_path or "").startswith(f"{EXTERNAL_DIRECTORY}/")
+
+    def path_for(self, image_path):
+        """
+        Absolute path of a stored image.
+
+        Raises:
+            ValueError: If image_path would resolve outside the storage root,
+                or names an external root that is not configured
+        """
+        root, relative_path = self.root(), image_path
+        if self.is_external(image_path):
+            _, name, relative_path = (image_path.split("/", 2) + [""])[:3]
+            root = self.external_roots().get(name)
+            if root is None or not relative_path:
+                raise ValueError(f"Invalid image path: {image_path}")
+
+        path = safe_join(root, relative_path)
+        if path is None:
+            raise ValueError(f"Invalid image path: {image_path}")
+        return path
+
+    def image_path_for(self, path):
+        """
+        Image path of an absolute path under UPLOAD_FOLDER or an external
+        root; the inverse of path_for().
+
+        Raises:
+            ValueError: If path is under none of them
+        """
+        path = os.path.abspath(path)
+        roots = [(None, self.root())] + sorted(self.external_roots().items(), key=lambda root: -len(root[1]))
+        for name, root in roots:
+            if os.path.commonpath([root, path]) == root and path != root:
+                relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+                return relative_path if name is None else f"{EXTERNAL_DIRECTORY}/{name}/{relative_path}"
+        raise ValueError(f"{path} is not under UPLOAD_FOLDER or any EXTERNAL_IMAGE_ROOTS")
+
+    def is_stale(self, image_path, derived_path):
+        """
+        Whether a file derived from an image (a preview, a tile descriptor)
+        is older than the image. Stored files never change under their
+        path; only images in external roots, which are edited where they
+        live, can outdate what was derived from them.
+        """
+        if not self.is_external(image_path):
+            return False
+        try:
+            return os.stat(self.path_for(image_path)).st_mtime_ns > os.stat(derived_path).st_mtime_ns
+        except (OSError, ValueError):
+            return False
+
+    def register_in_place(self, path, inspect=None):
+        """
+        Reference a file in an external root where it is, without reading
+        or copying its content.
+
+        Args:
+            inspect (callable, optional): Called with the path, as for
+                store_blob(); may raise to reject it
+
+        Returns:
+            StoredBlob: No sha256, the external image path, size in bytes
+                and the result of inspect
+
+        Raises:
+            ValueError: If the file is not under an external root, or its
+                image path does not fit the images table
+        """
+        image_path = self.image_path_for(path)
+        if not self.is_external(image_path):
+            raise ValueError(f"{path} is not under any EXTERNAL_IMAGE_ROOTS")
+        if len(image_path) > IMAGE_PATH_LENGTH:
+            raise ValueError(f"Image path of {path} is longer than {IMAGE_PATH_LENGTH} characters")
+        size = os.stat(path).st_size
+        details = inspect(path) if inspect else None
+        return StoredBlob(None, image_path, size, details)
+
+    def blob_path(self, sha256, extension=""):
+        """Relative path of the content-addressed file for a SHA-256 digest."""
+        return f"{BLOB_DIRECTORY}/{sha256[:2]}/{sha256}{extension}"
+
+    def blob_digest(self, image_path):
+        """SHA-256 digest of a content-addressed image path, or None for other paths."""
+        match = BLOB_PATH_PATTERN.match(image_path or "")
+        return match.group(1) if match else None
+
+    def blob_directory(self):
+        return os.path.join(self.root(), BLOB_DIRECTORY)
+
+    def store_blob(self, image_file, extension="", max_size=None, inspect=None):
+        """
+        Store content under the name of its SHA-256 digest. Uploads parsed
+        by UploadRequest were hashed while the request body was written to
+        disk and are only linked; other streams are hashed while copied to
+        a temporary file in fixed-size chunks; local files are hashed in
+        place and then copied.
+
+        The content is linked under its name right away, and also kept in a
+        private temporary file (StoredBlob.pending) until settle() puts it
+        in place after the reference to it commits: a file that already
+        existed may be deleted with its last image before then.
+
+        Args:
+            max_size (int, optional): Largest accepted size in bytes
+            inspect (callable, optional): Called with the path of the
+                content before it is stored; may raise to reject it
+
+        Returns:
+            StoredBlob: sha256, image path, size in bytes, the result of
+                inspect and the pending copy
+
+        Raises:
+            ValueError: If the content is larger than max_size
+        """
+        blob_directory = self.blob_directory()
+        os.makedirs(blob_directory, exist_ok=True)
+
+        if isinstance(image_file, (str, os.PathLike)):
+            digest = hashlib.sha256()
+            size = 0
+            with open(image_file, "rb") as source:
+                while chunk := source.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    check_size(size, max_size)
+            temp_path = _unused_temp_path(blob_directory)
+            link_file(image_file, temp_path)
+        else:
+            stream = getattr(image_file, "stream", image_file)
+            if isinstance(stream, HashingFile) and os.path.dirname(stream.name) == blob_directory:
+                temp_path, digest, size = stream.claim()
+            else:
+                temp_path, digest, size = self._copy_to_temp(stream, blob_directory, max_size)
+
+        try:
+            details = inspect(temp_path) if inspect else None
+            image_path = self.blob_path(digest.hexdigest(), extension)
+            destination = self.path_for(image_path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            try:
+                os.link(temp_path, destination)
+            except FileExistsError:
+                # Identical bytes if stored before; settle() restores them if
+                # they are deleted before the reference commits
+                pass
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return StoredBlob(digest.hexdigest(), image_path, size, details, temp_path)
+
+    def settle(self, stored):
+        """
+        Put the pending copy of stored content in place under stored.path,
+        once the reference to it has committed, and drop the copy. Restores
+        the file if it was deleted with its last image meanwhile.
+        """
+        if not stored.pending:
+            return
+        destination = self.path_for(stored.path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(stored.pending, destination)
+        # rename() leaves both names when they are links to the same file
+        self.discard(stored)
+
+    def discard(self, stored):
+        """Drop the pending copy of stored content whose reference was rolled back."""
+        if stored.pending and os.path.exists(stored.pending):
+            os.remove(stored.pending)
+
+    def _copy_to_temp(self, stream, directory, max_size):
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                while chunk := stream.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+                    check_size(size, max_size)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest, size
+
+    def delete(self, image_path):
+        if not image_path:
+            return
+        if self.is_external(image_path) and current_app.config.get("EXTERNAL_IMAGE_ROOTS_READ_ONLY", True):
+            return
+        path = self.path_for(image_path)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def delete_unless(self, image_path, is_referenced):
+        """
+        delete() an image file unless is_referenced() holds once the file
+        is out of the way. The file is renamed to a tombstone first, so an
+        upload that shares it and commits before the check keeps it, and
+        one that commits after the check settles its own copy in place.
+
+        Returns:
+            bool: True if the file was deleted
+        """
+        if not image_path:
+            return False
+        if self.is_external(image_path) and current_app.config.get("EXTERNAL_IMAGE_ROOTS_READ_ONLY", True):
+            return False
+        path = self.path_for(image_path)
+        tombstone = f"{path}.deleted-{uuid.uuid4().hex}"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return False
+
+        if is_referenced():
+            os.replace(tombstone, path)
+            return False
+        os.remove(tombstone)
+        return True
+
+    def clear(self):
+        """Remove every stored file and directory."""
+        root = self.root()
+        if not os.path.exists(root):
+            return
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+
+
+class HashingFile:
+    """
+    Temporary file in the blob directory that hashes and counts the bytes
+    written to it, so an upload is digested in the same pass that writes
+    the request body to disk. Removed on close unless claimed for storage.
+    """
+
+    def __init__(self, directory, max_size=None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        self.file = os.fdopen(fd, "w+b")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+        self.claimed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise RequestEntityTooLarge()
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def claim(self):
+        """
+        Take ownership of the written file.
+
+        Returns:
+            tuple: (temporary path, SHA-256 digest, size in bytes)
+        """
+        self.file.close()
+        self.claimed = True
+        return self.name, self.digest, self.size
+
+    def close(self):
+        self.file.close()
+        if not self.claimed and os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    """Request that writes uploaded files into the blob directory while hashing them."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(
+            StorageService().blob_directory(), max_size=current_app.config.get("MAX_CONTENT_LENGTH")
+        )
+
+
+def check_size(size, max_size):
+    if max_size is not None and size > max_size:
+        raise ValueError(f"File is larger than the {max_size} byte limit")
+
+
+def _unused_temp_path(directory):
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def link_file(source, destination):
+    """
+    Give destination the contents of source as cheaply as the filesystem
+    allows: a reflink (copy-on-write clone), else a plain copy. Never a
+    hardlink: the blob would share the source's inode, so editing the
+    source in place would change the blob under its content hash.
+    """
+    try:
+        _reflink(source, destination)
+        return "reflink"
+    except OSError as e:
+        if e.errno == errno.EEXIST:
+            raise
+
+    with open(source, "rb") as src, open(destination, "xb") as dst:
+        try:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        except BaseException:
+            # Leave no partial file under the content hash
+            dst.close()
+            os.remove(destination)
+            raise
+    shutil.copystat(source, destination)
+    return "copy"
+
+
+def _reflink(source, destination):
+    with open(source, "rb") as src:
+        try:
+            with open(destination, "xb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError as e:
+            if e.errno != errno.EEXIST and os.path.exists(destination):
+                os.remove(destination)
+            raise
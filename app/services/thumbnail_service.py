@@ -0,0 +1,156 @@
+import logging
+import os
+import tempfile
+
+from flask import current_app
+from PIL import Image as PILImage, ImageOps
+from app.services.background_service import BackgroundService
+from app.services.storage_service import StorageService
+
+THUMBNAIL_DIRECTORY = "thumbnails"
+
+# Longest edge in pixels of each preview size
+THUMBNAIL_SIZES = {
+    "thumb": 256,
+    "medium": 1024,
+    "large": 2048,
+}
+
+# Delivery formats in order of preference: Pillow format, media type,
+# file extension and encoder options. JPEG is the fallback every browser
+# accepts; AVIF is only produced when Pillow has an AVIF encoder.
+THUMBNAIL_FORMATS = {
+    "avif": ("AVIF", "image/avif", ".avif", {"quality": 60}),
+    "webp": ("WEBP", "image/webp", ".webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+DEFAULT_THUMBNAIL_FORMAT = "jpeg"
+
+logger = logging.getLogger(__name__)
+
+
+def supported_formats():
+    """Delivery formats this Pillow build can encode, most preferred first."""
+    PILImage.init()
+    return [name for name, (pil_format, *_) in THUMBNAIL_FORMATS.items() if pil_format in PILImage.SAVE]
+
+
+def size_for_width(width):
+    """Smallest preview size at least width pixels wide, else the largest."""
+    for size, max_edge in sorted(THUMBNAIL_SIZES.items(), key=lambda item: item[1]):
+        if max_edge >= width:
+            return size
+    return max(THUMBNAIL_SIZES, key=THUMBNAIL_SIZES.get)
+
+
+class ThumbnailService:
+    """
+    Downscaled, web-encoded previews of stored images, cached on disk next
+    to them under UPLOAD_FOLDER/thumbnails/<size>/.
+
+    Previews are generated in the background after upload, on first
+    request, or by the backfill command. Stored files never change under the
+    same image path, so a cached preview never needs invalidating, only
+    removing with its image. Images in external roots can be edited in
+    place; their previews are regenerated once older than the image.
+    Originals are kept untouched for download.
+    """
+
+    def __init__(self):
+        self.storage_service = StorageService()
+        self.background_service = BackgroundService()
+
+    def thumbnail_path(self, image_path, size, format=DEFAULT_THUMBNAIL_FORMAT):
+        return f"{THUMBNAIL_DIRECTORY}/{size}/{image_path}{THUMBNAIL_FORMATS[format][2]}"
+
+    def media_type(self, format):
+        return THUMBNAIL_FORMATS[format][1]
+
+    def get_thumbnail(self, image_path, size, format=DEFAULT_THUMBNAIL_FORMAT):
+        """
+        Absolute path of the preview of image_path, generating it if needed.
+
+        Raises:
+            ValueError: If size or format is unknown or image_path is invalid
+            FileNotFoundError: If the source image does not exist
+        """
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Thumbnail size must be one of: {', '.join(THUMBNAIL_SIZES)}")
+        if format not in supported_formats():
+            raise ValueError(f"Thumbnail format must be one of: {', '.join(supported_formats())}")
+
+        destination = self.storage_service.path_for(self.thumbnail_path(image_path, size, format))
+        if not os.path.exists(destination) or self.storage_service.is_stale(image_path, destination):
+            self._generate(self.storage_service.path_for(image_path), THUMBNAIL_SIZES[size], {format: destination})
+        return destination
+
+    def generate_all(self, image_path):
+        """Generate every missing preview of an image, decoding it once per size."""
+        source = self.storage_service.path_for(image_path)
+        for size, max_edge in THUMBNAIL_SIZES.items():
+            destinations = {
+                format: self.storage_service.path_for(self.thumbnail_path(image_path, size, format))
+                for format in supported_formats()
+            }
+            missing = {
+                format: path for format, path in destinations.items()
+                if not os.path.exists(path) or self.storage_service.is_stale(image_path, path)
+            }
+            if missing:
+                self._generate(source, max_edge, missing)
+
+    def schedule(self, image_path):
+        """
+        Generate every preview of image_path on the background pool.
+
+        Returns:
+            bool: True if generation was queued
+        """
+        if not image_path or not current_app.config.get("IMAGE_VARIANT_GENERATION", False):
+            return False
+        return self.background_service.submit(f"thumbnails:{image_path}", self.generate_all, image_path)
+
+    def delete(self, image_path):
+        for size in THUMBNAIL_SIZES:
+            for format in THUMBNAIL_FORMATS:
+                self.storage_service.delete(self.thumbnail_path(image_path, size, format))
+
+    def _generate(self, source, max_edge, destinations):
+        with PILImage.open(source) as img:
+            # For JPEG, let libjpeg decode at 1/2, 1/4 or 1/8 scale instead
+            # of the full 12 MP, which is most of the cost
+            img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            for format, destination in destinations.items():
+                pil_format, _, _, options = THUMBNAIL_FORMATS[format]
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=".thumb-")
+                try:
+                    with os.fdopen(fd, "wb") as temp:
+                        img.save(temp, pil_format, **options)
+                    os.replace(temp_path, destination)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+
+    def backfill(self, image_paths):
+        """
+        Generate missing previews for many images.
+
+        Returns:
+            tuple: (number of images processed, number that failed)
+        """
+        processed = failed = 0
+        for image_path in image_paths:
+            try:
+                self.generate_all(image_path)
+                processed += 1
+            except Exception as e:
+                logger.warning(f"Could not generate thumbnails for {image_path}: {str(e)}")
+                failed += 1
+        return processed, failed
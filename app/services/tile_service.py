@@ -0,0 +1,183 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+from PIL import Image as PILImage, ImageOps
+from app.services.background_service import BackgroundService
+from app.services.storage_service import StorageService
+
+TILE_DIRECTORY = "tiles"
+TILE_SIZE = 256
+TILE_OVERLAP = 1
+TILE_FORMAT = "jpg"
+
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+logger = logging.getLogger(__name__)
+
+
+class TileService:
+    """
+    Deep Zoom image pyramids of stored images, for zooming into full
+    resolution detail without downloading the whole file.
+
+    Level L of an image W x H pixels is ceil(W / 2^(N - L)) x
+    ceil(H / 2^(N - L)) pixels, where N = ceil(log2(max(W, H))), cut into
+    TILE_SIZE tiles overlapping their neighbours by TILE_OVERLAP pixels:
+
+        UPLOAD_FOLDER/tiles/<image_path>.dzi
+        UPLOAD_FOLDER/tiles/<image_path>_files/<level>/<column>_<row>.jpg
+
+    The descriptor is written last, so its existence marks a complete
+    pyramid. The pyramid of an image in an external root is treated as
+    missing once its descriptor is older than the image.
+    """
+
+    def __init__(self):
+        self.storage_service = StorageService()
+        self.background_service = BackgroundService()
+
+    def descriptor_path(self, image_path):
+        return f"{TILE_DIRECTORY}/{image_path}.dzi"
+
+    def tile_path(self, image_path, level, column, row):
+        return f"{TILE_DIRECTORY}/{image_path}_files/{level}/{column}_{row}.{TILE_FORMAT}"
+
+    def has_pyramid(self, image_path):
+        if not image_path:
+            return False
+        try:
+            path = self.storage_service.path_for(self.descriptor_path(image_path))
+        except ValueError:
+            return False
+        return os.path.exists(path) and not self.storage_service.is_stale(image_path, path)
+
+    def get_descriptor(self, image_path):
+        """
+        Absolute path of the Deep Zoom descriptor of image_path.
+
+        Raises:
+            ValueError: If image_path is invalid
+            FileNotFoundError: If the pyramid has not been generated or is
+                out of date
+        """
+        path = self.storage_service.path_for(self.descriptor_path(image_path))
+        if not os.path.exists(path) or self.storage_service.is_stale(image_path, path):
+            raise FileNotFoundError(f"No tile pyramid for {image_path}")
+        return path
+
+    def get_tile(self, image_path, level, column, row):
+        """
+        Absolute path of one tile of image_path.
+
+        Raises:
+            ValueError: If image_path is invalid
+            FileNotFoundError: If the tile does not exist or is out of date
+        """
+        path = self.storage_service.path_for(self.tile_path(image_path, level, column, row))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No tile {level}/{column}_{row} for {image_path}")
+        if self.storage_service.is_external(image_path) and not self.has_pyramid(image_path):
+            raise FileNotFoundError(f"Tile pyramid of {image_path} is out of date")
+        return path
+
+    def generate(self, image_path):
+        """
+        Build the pyramid of a stored image, from full resolution down to a
+        single pixel, halving the previous level rather than resampling the
+        original for each one.
+
+        Returns:
+            tuple: (width, height) of the full resolution level
+        """
+        source = self.storage_service.path_for(image_path)
+        tile_directory = self.storage_service.path_for(f"{TILE_DIRECTORY}/{image_path}_files")
+
+        with PILImage.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            width, height = img.size
+            max_level = math.ceil(math.log2(max(width, height, 1)))
+
+            level_image = img
+            for level in range(max_level, -1, -1):
+                self._write_level(level_image, os.path.join(tile_directory, str(level)))
+                if level > 0:
+                    # Rounds odd sizes up, matching the Deep Zoom level sizes
+                    level_image = level_image.reduce(2)
+
+        self._write_descriptor(self.storage_service.path_for(self.descriptor_path(image_path)), width, height)
+        return width, height
+
+    def schedule(self, image_path):
+        """
+        Generate the pyramid of image_path on the background pool unless it
+        exists or is already queued.
+
+        Returns:
+            bool: True if generation was queued
+        """
+        if not image_path or not current_app.config.get("IMAGE_TILE_GENERATION", False):
+            return False
+        if self.has_pyramid(image_path):
+            return False
+        return self.background_service.submit(f"tiles:{image_path}", self.generate, image_path)
+
+    def delete(self, image_path):
+        if not image_path:
+            return
+        shutil.rmtree(self.storage_service.path_for(f"{TILE_DIRECTORY}/{image_path}_files"), ignore_errors=True)
+        self.storage_service.delete(self.descriptor_path(image_path))
+
+    def backfill(self, image_paths):
+        """
+        Generate missing pyramids for many images.
+
+        Returns:
+            tuple: (number of images processed, number that failed)
+        """
+        processed = failed = 0
+        for image_path in image_paths:
+            try:
+                if not self.has_pyramid(image_path):
+                    self.generate(image_path)
+                processed += 1
+            except Exception as e:
+                logger.warning(f"Could not generate tiles for {image_path}: {str(e)}")
+                failed += 1
+        return processed, failed
+
+    def _write_level(self, level_image, directory):
+        os.makedirs(directory, exist_ok=True)
+        width, height = level_image.size
+        for column in range(math.ceil(width / TILE_SIZE)):
+            for row in range(math.ceil(height / TILE_SIZE)):
+                box = (
+                    max(column * TILE_SIZE - TILE_OVERLAP, 0),
+                    max(row * TILE_SIZE - TILE_OVERLAP, 0),
+                    min((column + 1) * TILE_SIZE + TILE_OVERLAP, width),
+                    min((row + 1) * TILE_SIZE + TILE_OVERLAP, height),
+                )
+                tile = level_image.crop(box)
+                tile.save(os.path.join(directory, f"{column}_{row}.{TILE_FORMAT}"), "JPEG", quality=85)
+
+    def _write_descriptor(self, path, width, height):
+        descriptor = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<Image xmlns="{DZI_NAMESPACE}" Format="{TILE_FORMAT}" '
+            f'Overlap="{TILE_OVERLAP}" TileSize="{TILE_SIZE}">'
+            f'<Size Width="{width}" Height="{height}"/></Image>\n'
+        )
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".dzi-")
+        try:
+            with os.fdopen(fd, "w") as temp:
+                temp.write(descriptor)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
@@ -0,0 +1,76 @@
+"""add patient site readiness
+
+Revision ID: 3c9a5e1f7b24
+Revises: 51f179134db6
+Create Date: 2026-10-17 09:12:44.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a5e1f7b24'
+down_revision = '51f179134db6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('patient_site_readiness',
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=False),
+    sa.Column('has_good_left', sa.Boolean(), nullable=False),
+    sa.Column('has_good_right', sa.Boolean(), nullable=False),
+    sa.Column('modified_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.id'], ),
+    sa.ForeignKeyConstraint(['site_id'], ['sites.id'], ),
+    sa.PrimaryKeyConstraint('patient_id', 'site_id')
+    )
+    with op.batch_alter_table('patient_site_readiness', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_patient_site_readiness_site_id'), ['site_id'], unique=False)
+
+    # Backfill from existing images, mirroring ReadinessService.patient_readiness_query
+    images = sa.table('images',
+        sa.column('patient_id', sa.Integer),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+    )
+    patients = sa.table('patients', sa.column('id', sa.Integer))
+    readiness = sa.table('patient_site_readiness',
+        sa.column('patient_id', sa.Integer),
+        sa.column('site_id', sa.Integer),
+        sa.column('has_good_left', sa.Boolean),
+        sa.column('has_good_right', sa.Boolean),
+    )
+
+    def has_good(eye_side):
+        good = sa.and_(
+            images.c.eye_side == eye_side,
+            images.c.quality_score.in_(['HIGH', 'ACCEPTABLE']),
+            images.c.anatomy_score.in_(['GOOD', 'ACCEPTABLE']),
+            images.c.over_illuminated == sa.false(),
+        )
+        return sa.func.max(sa.case((good, 1), else_=0)) == 1
+
+    select = (
+        sa.select(images.c.patient_id, images.c.site_id, has_good('LEFT'), has_good('RIGHT'))
+        .select_from(images.join(patients, patients.c.id == images.c.patient_id))
+        .where(images.c.site_id.isnot(None))
+        .group_by(images.c.site_id, images.c.patient_id)
+    )
+    op.execute(
+        readiness.insert().from_select(
+            ['patient_id', 'site_id', 'has_good_left', 'has_good_right'], select
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('patient_site_readiness', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_patient_site_readiness_site_id'))
+
+    op.drop_table('patient_site_readiness')
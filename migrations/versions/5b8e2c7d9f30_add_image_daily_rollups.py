@@ -0,0 +1,93 @@
+"""add image daily rollups
+
+Revision ID: 5b8e2c7d9f30
+Revises: a47e3d9b2c61
+Create Date: 2026-10-17 14:05:37.512903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2c7d9f30'
+down_revision = 'a47e3d9b2c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_daily_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('site_id', sa.Integer(), nullable=True),
+    sa.Column('eye_side', sa.Enum('LEFT', 'RIGHT', name='eyeside'), nullable=False),
+    sa.Column('quality_score', sa.Enum('LOW', 'ACCEPTABLE', 'HIGH', name='imagequalityscore'), nullable=True),
+    sa.Column('anatomy_score', sa.Enum('POOR', 'ACCEPTABLE', 'GOOD', name='anatomyscore'), nullable=True),
+    sa.Column('over_illuminated', sa.Boolean(), nullable=False),
+    sa.Column('image_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['site_id'], ['sites.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_image_daily_rollups_day'), ['day'], unique=False)
+
+    # Backfill from existing images, mirroring RollupService.rebuild
+    images = sa.table('images',
+        sa.column('id', sa.Integer),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+        sa.column('acquisition_date', sa.DateTime),
+    )
+    rollups = sa.table('image_daily_rollups',
+        sa.column('day', sa.Date),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+        sa.column('image_count', sa.Integer),
+    )
+
+    if op.get_bind().dialect.name == 'sqlite':
+        day = sa.func.date(images.c.acquisition_date)
+    else:
+        day = sa.cast(images.c.acquisition_date, sa.Date)
+    over_illuminated = sa.func.coalesce(images.c.over_illuminated, sa.false())
+
+    select = (
+        sa.select(
+            day,
+            images.c.site_id,
+            images.c.eye_side,
+            images.c.quality_score,
+            images.c.anatomy_score,
+            over_illuminated,
+            sa.func.count(images.c.id),
+        )
+        .where(images.c.acquisition_date.isnot(None))
+        .group_by(
+            day,
+            images.c.site_id,
+            images.c.eye_side,
+            images.c.quality_score,
+            images.c.anatomy_score,
+            over_illuminated,
+        )
+    )
+    op.execute(
+        rollups.insert().from_select(
+            ['day', 'site_id', 'eye_side', 'quality_score', 'anatomy_score', 'over_illuminated', 'image_count'],
+            select
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_image_daily_rollups_day'))
+
+    op.drop_table('image_daily_rollups')
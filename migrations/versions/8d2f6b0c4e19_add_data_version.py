@@ -0,0 +1,31 @@
+"""add data version
+
+Revision ID: 8d2f6b0c4e19
+Revises: 3c9a5e1f7b24
+Create Date: 2026-10-17 11:05:27.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import time
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f6b0c4e19'
+down_revision = '3c9a5e1f7b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_versions = op.create_table('data_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('modified_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(data_versions, [{'id': 1, 'version': int(time.time() * 1000)}])
+
+
+def downgrade():
+    op.drop_table('data_versions')
@@ -0,0 +1,26 @@
+"""add image analysis status
+
+Revision ID: 9e4b7a2c5d18
+Revises: f3a8c1d5e7b2
+Create Date: 2026-10-17 20:03:27.915046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7a2c5d18'
+down_revision = 'f3a8c1d5e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_status', sa.Enum('PENDING', 'COMPLETE', 'FAILED', name='analysisstatus'), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('analysis_status')
@@ -0,0 +1,25 @@
+"""index images modified_at
+
+Revision ID: a47e3d9b2c61
+Revises: 8d2f6b0c4e19
+Create Date: 2026-10-17 13:48:02.571930
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a47e3d9b2c61'
+down_revision = '8d2f6b0c4e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_images_modified_at'), ['modified_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_images_modified_at'))
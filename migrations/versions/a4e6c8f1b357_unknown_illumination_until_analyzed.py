@@ -0,0 +1,81 @@
+"""unknown illumination until analyzed
+
+Revision ID: a4e6c8f1b357
+Revises: d8c3f2a6b914
+Create Date: 2026-10-18 10:26:51.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e6c8f1b357'
+down_revision = 'd8c3f2a6b914'
+branch_labels = None
+depends_on = None
+
+UNANALYZED = ['PENDING', 'FAILED']
+
+images = sa.table('images',
+    sa.column('patient_id', sa.Integer),
+    sa.column('site_id', sa.Integer),
+    sa.column('eye_side', sa.String),
+    sa.column('quality_score', sa.String),
+    sa.column('anatomy_score', sa.String),
+    sa.column('over_illuminated', sa.Boolean),
+    sa.column('analysis_status', sa.String),
+)
+
+
+def upgrade():
+    # Images were stored as not over-illuminated before their analysis ran,
+    # which counted them as AI-ready; their flag is unknown instead
+    op.execute(
+        images.update()
+        .where(images.c.analysis_status.in_(UNANALYZED))
+        .values(over_illuminated=None)
+    )
+    rebuild_readiness()
+
+
+def downgrade():
+    op.execute(
+        images.update()
+        .where(images.c.analysis_status.in_(UNANALYZED), images.c.over_illuminated.is_(None))
+        .values(over_illuminated=False)
+    )
+    rebuild_readiness()
+
+
+def rebuild_readiness():
+    # Mirrors ReadinessService.patient_readiness_query, as in 3c9a5e1f7b24
+    patients = sa.table('patients', sa.column('id', sa.Integer))
+    readiness = sa.table('patient_site_readiness',
+        sa.column('patient_id', sa.Integer),
+        sa.column('site_id', sa.Integer),
+        sa.column('has_good_left', sa.Boolean),
+        sa.column('has_good_right', sa.Boolean),
+    )
+
+    def has_good(eye_side):
+        good = sa.and_(
+            images.c.eye_side == eye_side,
+            images.c.quality_score.in_(['HIGH', 'ACCEPTABLE']),
+            images.c.anatomy_score.in_(['GOOD', 'ACCEPTABLE']),
+            images.c.over_illuminated == sa.false(),
+        )
+        return sa.func.max(sa.case((good, 1), else_=0)) == 1
+
+    select = (
+        sa.select(images.c.patient_id, images.c.site_id, has_good('LEFT'), has_good('RIGHT'))
+        .select_from(images.join(patients, patients.c.id == images.c.patient_id))
+        .where(images.c.site_id.isnot(None))
+        .group_by(images.c.site_id, images.c.patient_id)
+    )
+    op.execute(readiness.delete())
+    op.execute(
+        readiness.insert().from_select(
+            ['patient_id', 'site_id', 'has_good_left', 'has_good_right'], select
+        )
+    )
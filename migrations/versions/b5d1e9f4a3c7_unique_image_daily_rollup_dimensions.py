@@ -0,0 +1,78 @@
+"""unique image daily rollup dimensions
+
+Revision ID: b5d1e9f4a3c7
+Revises: 9e4b7a2c5d18
+Create Date: 2026-10-17 21:12:44.308915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1e9f4a3c7'
+down_revision = '9e4b7a2c5d18'
+branch_labels = None
+depends_on = None
+
+DIMENSIONS = ['day', 'site_id', 'eye_side', 'quality_score', 'anatomy_score', 'over_illuminated']
+
+
+def upgrade():
+    # Concurrent writers may have left duplicate or drifted rows; rebuild
+    # them from the images, mirroring RollupService.rebuild
+    images = sa.table('images',
+        sa.column('id', sa.Integer),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+        sa.column('acquisition_date', sa.DateTime),
+    )
+    rollups = sa.table('image_daily_rollups',
+        sa.column('day', sa.Date),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+        sa.column('image_count', sa.Integer),
+    )
+
+    if op.get_bind().dialect.name == 'sqlite':
+        day = sa.func.date(images.c.acquisition_date)
+    else:
+        day = sa.cast(images.c.acquisition_date, sa.Date)
+    over_illuminated = sa.func.coalesce(images.c.over_illuminated, sa.false())
+
+    select = (
+        sa.select(
+            day,
+            images.c.site_id,
+            images.c.eye_side,
+            images.c.quality_score,
+            images.c.anatomy_score,
+            over_illuminated,
+            sa.func.count(images.c.id),
+        )
+        .where(images.c.acquisition_date.isnot(None))
+        .group_by(
+            day,
+            images.c.site_id,
+            images.c.eye_side,
+            images.c.quality_score,
+            images.c.anatomy_score,
+            over_illuminated,
+        )
+    )
+    op.execute(rollups.delete())
+    op.execute(rollups.insert().from_select([*DIMENSIONS, 'image_count'], select))
+
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_image_daily_rollups_dimensions', DIMENSIONS)
+
+
+def downgrade():
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_image_daily_rollups_dimensions', type_='unique')
@@ -0,0 +1,70 @@
+"""coalesce image daily rollup dimensions
+
+Revision ID: d8c3f2a6b914
+Revises: b5d1e9f4a3c7
+Create Date: 2026-10-17 23:41:09.527184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8c3f2a6b914'
+down_revision = 'b5d1e9f4a3c7'
+branch_labels = None
+depends_on = None
+
+DIMENSIONS = ['day', 'site_id', 'eye_side', 'quality_score', 'anatomy_score', 'over_illuminated']
+
+# NULLs never collide in a unique constraint, so rows without a site or
+# scores were not protected from duplicates; coalesce them in the index
+INDEX_EXPRESSIONS = [
+    'day',
+    'coalesce(site_id, 0)',
+    'eye_side',
+    "coalesce(CAST(quality_score AS VARCHAR), '')",
+    "coalesce(CAST(anatomy_score AS VARCHAR), '')",
+    'over_illuminated',
+]
+
+
+def upgrade():
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_image_daily_rollups_dimensions', type_='unique')
+
+    # Merge rows duplicated on NULL dimensions before the index is created
+    rollups = sa.table('image_daily_rollups',
+        sa.column('id', sa.Integer),
+        sa.column('day', sa.Date),
+        sa.column('site_id', sa.Integer),
+        sa.column('eye_side', sa.String),
+        sa.column('quality_score', sa.String),
+        sa.column('anatomy_score', sa.String),
+        sa.column('over_illuminated', sa.Boolean),
+        sa.column('image_count', sa.Integer),
+    )
+    connection = op.get_bind()
+    merged = connection.execute(
+        sa.select(*[rollups.c[name] for name in DIMENSIONS], sa.func.sum(rollups.c.image_count))
+        .group_by(*[rollups.c[name] for name in DIMENSIONS])
+        .having(sa.func.count(rollups.c.id) > 1)
+    ).all()
+    for row in merged:
+        condition = [
+            rollups.c[name].is_(None) if value is None else rollups.c[name] == value
+            for name, value in zip(DIMENSIONS, row)
+        ]
+        connection.execute(rollups.delete().where(*condition))
+        connection.execute(rollups.insert().values(**dict(zip(DIMENSIONS, row)), image_count=row[-1]))
+
+    op.create_index(
+        'uq_image_daily_rollups_dimensions', 'image_daily_rollups',
+        [sa.text(expression) for expression in INDEX_EXPRESSIONS], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_image_daily_rollups_dimensions', table_name='image_daily_rollups')
+    with op.batch_alter_table('image_daily_rollups', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_image_daily_rollups_dimensions', DIMENSIONS)
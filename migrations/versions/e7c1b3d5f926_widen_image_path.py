@@ -0,0 +1,32 @@
+"""widen image path
+
+Revision ID: e7c1b3d5f926
+Revises: a4e6c8f1b357
+Create Date: 2026-10-18 11:04:37.215640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c1b3d5f926'
+down_revision = 'a4e6c8f1b357'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.alter_column('image_path',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=1024),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.alter_column('image_path',
+               existing_type=sa.String(length=1024),
+               type_=sa.String(length=255),
+               existing_nullable=False)
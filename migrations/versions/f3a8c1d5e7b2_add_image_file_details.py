@@ -0,0 +1,34 @@
+"""add image file details
+
+Revision ID: f3a8c1d5e7b2
+Revises: c2d4a6e8f013
+Create Date: 2026-10-17 19:12:44.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d5e7b2'
+down_revision = 'c2d4a6e8f013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_size', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('color_mode', sa.String(length=16), nullable=True))
+        batch_op.add_column(sa.Column('image_format', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('image_format')
+        batch_op.drop_column('color_mode')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+        batch_op.drop_column('file_size')
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark the over-illumination detector against the original
+implementation on synthetic fundus photographs.
+
+For each resolution a JPEG is generated with a dark retina, a bright optic
+disc just below the threshold and, in the "spot" scene, a small specular
+reflection near the bottom edge that only a full-resolution scan finds.
+Each detector is timed (best of --repeat runs) and its peak Python/NumPy
+allocation measured with tracemalloc; Pillow's decode buffer is the same
+for every detector and not included.
+
+Usage:
+    python scripts/benchmark_over_illumination.py
+    python scripts/benchmark_over_illumination.py --sizes 2048x1536,4000x3000 --repeat 5
+"""
+import os
+import sys
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+# Add the parent directory to the Python path so we can import the app package
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from app.services.image_service import is_over_illuminated
+
+DEFAULT_SIZES = "2048x1536,2592x1944,3888x2592,4000x3000,5184x3456"
+
+
+def original_is_over_illuminated(image_path, threshold=0.9):
+    """The detector as first written, kept here as the baseline."""
+    img = Image.open(image_path)
+    img_array = np.array(img)
+    luminance = (
+        0.2126 * img_array[:, :, 0]
+        + 0.7152 * img_array[:, :, 1]
+        + 0.0722 * img_array[:, :, 2]
+    ) / 255.0
+    return np.sum(luminance > threshold) > 0
+
+
+def make_fundus(path, width, height, spot):
+    img = Image.new("RGB", (width, height), (0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    radius = min(width, height) * 0.48
+    cx, cy = width / 2, height / 2
+    draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), fill=(150, 60, 25))
+    disc = radius * 0.12
+    dx = cx + radius * 0.35
+    # Luminance of the disc is about 0.85, below the default threshold
+    draw.ellipse((dx - disc, cy - disc, dx + disc, cy + disc), fill=(250, 215, 170))
+    img = img.filter(ImageFilter.GaussianBlur(radius=3))
+    if spot:
+        size = 3
+        x, y = int(cx), int(cy + radius * 0.9)
+        ImageDraw.Draw(img).rectangle((x, y, x + size, y + size), fill=(255, 255, 255))
+    img.save(path, "JPEG", quality=95)
+
+
+def measure(detector, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = detector(path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    detector(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return bool(result), best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the over-illumination detector")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated WIDTHxHEIGHT resolutions")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per detector, best is reported")
+    parser.add_argument("--max-edge", type=int, default=1024, help="Longest edge for the downsampled mode")
+    args = parser.parse_args()
+
+    detectors = [
+        ("original", original_is_over_illuminated),
+        ("integer", is_over_illuminated),
+        (f"max_edge={args.max_edge}", lambda path: is_over_illuminated(path, max_edge=args.max_edge)),
+    ]
+
+    print(f"{'resolution':>11} {'scene':>6} {'detector':>14} {'result':>7} {'time ms':>9} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes.split(","):
+            width, height = (int(value) for value in size.split("x"))
+            for scene in ("clean", "spot"):
+                path = os.path.join(directory, f"{size}-{scene}.jpg")
+                make_fundus(path, width, height, spot=scene == "spot")
+                for name, detector in detectors:
+                    result, seconds, peak = measure(detector, path, args.repeat)
+                    print(
+                        f"{size:>11} {scene:>6} {name:>14} {str(result):>7} "
+                        f"{seconds * 1000:>9.1f} {peak / 1024 / 1024:>8.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
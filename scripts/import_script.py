@@ -3,10 +3,12 @@ import os
 import sys
 import csv
 import argparse
+import fnmatch
 import logging
 import random
+import time
 from datetime import datetime, timedelta
-from collections import defaultdict
+from itertools import chain, islice
 
 # Add the parent directory to the Python path so we can import the app package
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,25 +16,29 @@ project_root = os.path.dirname(script_dir)
 sys.path.insert(0, project_root)
 
 # Now we can import from the app package
+from sqlalchemy import func, select
 from app import create_app, db
 from app.models.patient import Patient, Sex
 from app.models.image import Image, EyeSide, ImageQualityScore, AnatomyScore
 from app.models.site import Site
 from app.services.patient_service import PatientService
 from app.services.image_service import ImageService
+from app.services.import_manifest import ImportManifest
+from app.services.ingest_service import IngestService
 from app.services.site_service import SiteService
+from app.services.storage_service import StorageService
+from app.services.statistics_service import StatisticsService
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("import.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Rows written per transaction when importing or generating patients
+DEFAULT_BATCH_SIZE = 1000
+
+# File extensions the scanner picks up, and how many scanned files are kept
+# as the pool images for generated patients are drawn from
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IMAGE_POOL_SIZE = 10000
+
 # Default locations for site generation
 DEFAULT_LOCATIONS = [
     "New York, NY", "Los Angeles, CA", "Chicago, IL", "Houston, TX", "Phoenix, AZ",
@@ -75,7 +81,7 @@ def parse_args():
                       help='Path to the CSV file with patient data (default: %(default)s)')
     parser.add_argument('--images-folder', 
                       default='scripts/test_data/images',
-                      help='Path to the folder containing images (default: %(default)s)')
+                      help='Folder scanned recursively for images (default: %(default)s)')
     parser.add_argument('--randomize',
                       action='store_true',
                       help='Randomize image quality, anatomy scores, and site values')
@@ -91,6 +97,26 @@ def parse_args():
                       type=int,
                       default=4,
                       help='Maximum number of images per patient for generated data (default: %(default)s)')
+    parser.add_argument('--batch-size',
+                      type=int,
+                      default=DEFAULT_BATCH_SIZE,
+                      help='Patients or images written per transaction (default: %(default)s)')
+    parser.add_argument('--workers',
+                      type=int,
+                      default=None,
+                      help='Threads storing image files (default: number of CPUs + 4, at most 32)')
+    parser.add_argument('--manifest',
+                      default='import-manifest.sqlite',
+                      help='Ledger of imported rows and files, for --resume (default: %(default)s)')
+    parser.add_argument('--resume',
+                      action='store_true',
+                      help='Skip rows and files the manifest records as imported by an earlier run')
+    parser.add_argument('--pattern',
+                      default=None,
+                      help='Only import files whose name matches this pattern, e.g. "RS-*_left.jpg"')
+    parser.add_argument('--in-place',
+                      action='store_true',
+                      help='Register images where they are in an EXTERNAL_IMAGE_ROOTS archive instead of copying them')
     return parser.parse_args()
 
 def map_sex_value(sex_str):
@@ -213,361 +239,359 @@ def generate_sites(num_sites, site_service):
     # Return the combined list of existing and new sites
     return existing_sites + created_sites
 
-def generate_random_patients(num_patients, patient_service):
-    """Generate random patients if needed."""
-    existing_count = len(patient_service.get_all_patients())
+def generate_random_patients(num_patients, patient_service, batch_size=DEFAULT_BATCH_SIZE):
+    """Generate random patients if needed, returning the IDs of those created."""
+    existing_count = db.session.query(func.count(Patient.id)).scalar()
     
     if existing_count >= num_patients:
         logger.info(f"Already have {existing_count} patients, no need to generate more")
-        return 0
+        return []
     
     patients_to_create = num_patients - existing_count
     logger.info(f"Generating {patients_to_create} additional patients")
     
     created_count = 0
     error_count = 0
-    generated_patients = []
+    generated_ids = []
     
-    # Get the highest existing patient ID
-    highest_id = 1
-    try:
-        # This is a simplified approach - in a real DB you might use a MAX query
-        existing_patients = patient_service.get_all_patients()
-        if existing_patients:
-            highest_id = max(patient.id for patient in existing_patients) + 1
-    except Exception as e:
-        logger.error(f"Error finding highest patient ID: {str(e)}")
+    # New IDs continue after the highest existing one
+    highest_id = (db.session.query(func.max(Patient.id)).scalar() or 0) + 1
     
     # Generate new patients
-    for i in range(patients_to_create):
-        try:
+    for start in range(0, patients_to_create, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, patients_to_create)):
             # Generate random birth date between 1950 and 2010
             year = random.randint(1950, 2010)
             month = random.randint(1, 12)
             day = random.randint(1, 28)  # Keeping it simple by avoiding edge cases with day ranges
-            birth_date = datetime(year, month, day).date()
-            
-            # Randomly select sex
-            sex = random.choice(list(Sex))
-            
-            # Create patient
-            patient = Patient(
-                id=highest_id + i,
-                birth_date=birth_date,
-                sex=sex
-            )
-            db.session.add(patient)
-            db.session.commit()
-            
-            logger.info(f"Generated patient: ID={patient.id}, DOB={birth_date}, Sex={sex.value}")
-            created_count += 1
-            generated_patients.append(patient)
-            
+            batch.append({
+                'id': highest_id + i,
+                'birth_date': datetime(year, month, day).date(),
+                'sex': random.choice(list(Sex)),
+            })
+
+        try:
+            created, _ = patient_service.upsert_patients(batch)
+            created_count += created
+            generated_ids.extend(patient['id'] for patient in batch)
         except Exception as e:
-            logger.error(f"Error generating patient: {str(e)}")
-            error_count += 1
+            db.session.rollback()
+            logger.error(f"Error generating {len(batch)} patients: {str(e)}")
+            error_count += len(batch)
     
     logger.info(f"Patient generation completed: {created_count} created, {error_count} errors")
-    return generated_patients
+    return generated_ids
 
-def get_image_files(images_folder):
-    """Get all valid image files from a folder."""
-    images = []
-    
-    if os.path.exists(images_folder):
-        for filename in os.listdir(images_folder):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                images.append(os.path.join(images_folder, filename))
-    
-    return images
+def scan_image_files(images_folder, extensions=IMAGE_EXTENSIONS, pattern=None):
+    """
+    Yield image files under a folder and all its subfolders as they are
+    found, so the import starts at once and memory does not grow with the
+    number of files. Directories are read with os.scandir, whose entries
+    carry their type, so no file is stat'ed just to be skipped.
+    Symlinked directories are not followed; unreadable ones are logged and
+    skipped.
+
+    Args:
+        extensions (tuple): Lower case file extensions to include
+        pattern (str, optional): fnmatch pattern the file name must match
+    """
+    directories = [images_folder]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif (
+                        entry.name.lower().endswith(extensions)
+                        and (pattern is None or fnmatch.fnmatch(entry.name, pattern))
+                        and entry.is_file()
+                    ):
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Skipping folder {directory}: {str(e)}")
+
+def reservoir_sample(items, pool, size):
+    """
+    Pass items through while keeping a uniform random sample of at most
+    size of them in pool (Algorithm R), in constant memory.
+    """
+    for seen, item in enumerate(items):
+        if seen < size:
+            pool.append(item)
+        else:
+            index = random.randint(0, seen)
+            if index < size:
+                pool[index] = item
+        yield item
 
-def import_patients(csv_file, patient_service):
-    """Import patients from CSV file."""
+def parse_patient_row(row):
+    """Map a CSV row to the id, birth_date and sex of a patient."""
+    # Extract patient ID (remove RS- prefix and convert to int)
+    patient_code = row['subject_id']
+    if patient_code.startswith('RS-'):
+        patient_id = int(patient_code[3:])
+    else:
+        patient_id = int(patient_code)
+
+    return {
+        'id': patient_id,
+        'birth_date': datetime.strptime(row['date_of_birth'], '%Y-%m-%d').date(),
+        'sex': map_sex_value(row['sex']),
+    }
+
+def is_in_external_root(folder):
+    """Whether folder is inside an archive listed in EXTERNAL_IMAGE_ROOTS."""
+    storage_service = StorageService()
+    try:
+        return storage_service.is_external(storage_service.image_path_for(folder))
+    except ValueError:
+        # The root itself has no image path
+        return os.path.abspath(folder) in storage_service.external_roots().values()
+
+def import_patients(csv_file, patient_service, batch_size=DEFAULT_BATCH_SIZE, manifest=None):
+    """
+    Import patients from CSV file, batch_size rows per transaction.
+
+    Each batch looks up its existing IDs in one query and is written with
+    one bulk insert and one bulk update, so the import runs at thousands of
+    rows per second rather than one commit per row. A batch that fails is
+    written again one row at a time, so only the rows that fail themselves
+    are counted as errors. With a manifest, the
+    number of rows done is checkpointed after each batch and rows already
+    done in an earlier run of the same file are skipped.
+    """
     updated_count = 0
     created_count = 0
     error_count = 0
+    skipped_count = 0
+    started = time.monotonic()
     
     try:
+        checkpoint = f"csv:{ImportManifest.file_key(csv_file)}"
         with open(csv_file, 'r') as f:
             reader = csv.DictReader(f)
+            if manifest:
+                skipped_count = sum(1 for _ in islice(reader, manifest.get_checkpoint(checkpoint, 0)))
             
-            for row in reader:
+            while True:
+                rows = list(islice(reader, batch_size))
+                if not rows:
+                    break
+
+                batch = []
+                for row in rows:
+                    try:
+                        batch.append(parse_patient_row(row))
+                    except Exception as e:
+                        logger.error(f"Error processing patient {row.get('subject_id', 'unknown')}: {str(e)}")
+                        error_count += 1
+
                 try:
-                    # Extract patient ID (remove RS- prefix and convert to int)
-                    patient_code = row['subject_id']
-                    if patient_code.startswith('RS-'):
-                        patient_id = int(patient_code[3:])
-                    else:
-                        patient_id = int(patient_code)
-                    
-                    # Parse date of birth
-                    dob = datetime.strptime(row['date_of_birth'], '%Y-%m-%d').date()
-                    
-                    # Map sex value
-                    sex = map_sex_value(row['sex'])
-                    
-                    # Prepare patient data
-                    patient_data = {
-                        'birth_date': dob,
-                        'sex': sex
-                    }
-                    
-                    # Check if patient exists
-                    existing_patient = patient_service.get_patient_by_id(patient_id)
-                    
-                    if existing_patient:
-                        # Update existing patient
-                        patient_service.update_patient(patient_id, patient_data)
-                        logger.info(f"Updated patient: ID={patient_id}, DOB={dob}, Sex={sex.value}")
-                        updated_count += 1
-                    else:
-                        # Create new patient with specified ID
-                        # This requires a custom method since the service doesn't allow setting ID
-                        patient = Patient(id=patient_id, birth_date=dob, sex=sex)
-                        db.session.add(patient)
-                        db.session.commit()
-                        logger.info(f"Created patient: ID={patient_id}, DOB={dob}, Sex={sex.value}")
-                        created_count += 1
-                        
+                    created, updated = patient_service.upsert_patients(batch)
+                    created_count += created
+                    updated_count += updated
                 except Exception as e:
-                    logger.error(f"Error processing patient {row.get('subject_id', 'unknown')}: {str(e)}")
-                    error_count += 1
+                    db.session.rollback()
+                    logger.warning(
+                        f"Error writing {len(batch)} patients ending at line {reader.line_num}, "
+                        f"retrying one at a time: {str(e)}"
+                    )
+                    try:
+                        created, updated, failed = patient_service.upsert_patients_each(batch)
+                        created_count += created
+                        updated_count += updated
+                        error_count += len(failed)
+                        for patient, error in failed:
+                            logger.error(f"Error writing patient {patient['id']}: {str(error)}")
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Error writing {len(batch)} patients ending at line {reader.line_num}: {str(e)}")
+                        error_count += len(batch)
+                if manifest:
+                    manifest.set_checkpoint(checkpoint, skipped_count + created_count + updated_count + error_count)
+
+                elapsed = time.monotonic() - started
+                logger.info(
+                    f"Patients: {created_count} created, {updated_count} updated, {error_count} errors "
+                    f"({(created_count + updated_count + error_count) / elapsed:.0f} rows/sec)"
+                )
     
     except Exception as e:
         logger.error(f"Error opening or reading CSV file: {str(e)}")
-        return 0, 0, 0
+        return 0, 0, 0, 0
     
-    return created_count, updated_count, error_count
+    return created_count, updated_count, error_count, skipped_count
+
+def random_image_data(patient_id, eye_side, site):
+    """Image metadata drawn from the quality profile of the patient's site."""
+    profile = getattr(site, 'quality_profile', SITE_QUALITY_PROFILES['medium_quality'])
+    return {
+        'patient_id': patient_id,
+        'eye_side': eye_side,
+        'quality_score': get_score_based_on_profile(profile, 'quality_score'),
+        'anatomy_score': get_score_based_on_profile(profile, 'anatomy_score'),
+        'site_id': site.id,
+        'over_illuminated': random.random() < profile['over_illuminated'],
+        'acquisition_date': datetime.now() - timedelta(days=random.randint(0, 365))
+    }
+
+def import_images_with_randomization(images_folder, patient_service, image_service, site_service, num_patients=0, num_sites=5, max_images_per_patient=4, batch_size=DEFAULT_BATCH_SIZE, workers=None, manifest=None, in_place=False, pattern=None):
+    """
+    Import images with randomized metadata and consistent site assignment per patient.
 
-def import_images_with_randomization(images_folder, patient_service, image_service, site_service, num_patients=0, num_sites=5, max_images_per_patient=4):
-    """Import images with randomized metadata and consistent site assignment per patient."""
+    Files are fed to IngestService as the folder tree is scanned: they are
+    stored on worker threads while this thread writes the rows in batches.
+    Images for generated patients are drawn from a random sample of
+    IMAGE_POOL_SIZE scanned files, so memory stays flat. With a
+    manifest, each source file and each generated image slot is recorded
+    once imported, and the generated patients and the files chosen for each
+    patient given generated images are checkpointed, so a resumed run skips
+    what is done and carries on with the same plan. With in_place, files are registered
+    where they are in an EXTERNAL_IMAGE_ROOTS archive instead of copied.
+
+    Returns:
+        tuple: (number of images imported, number skipped, number of errors)
+    """
     # Generate sites if randomizing
     sites = generate_sites(num_sites, site_service)
     if not sites:
         logger.error("No sites available for randomization")
-        return 0, 0
-    
-    # Get all existing patients
-    existing_patients = patient_service.get_all_patients()
-    
-    # Generate additional patients if needed
-    generated_patients = []
-    if num_patients > 0:
-        generated_patients = generate_random_patients(num_patients, patient_service)
+        return 0, 0, 0
     
-    # Get all patients (existing + newly generated)
-    all_patients = patient_service.get_all_patients()
-    if not all_patients:
+    # Generate additional patients if needed, unless an earlier run did
+    generated_patients = manifest.get_checkpoint("generated_patients") if manifest else None
+    if generated_patients is None:
+        generated_patients = []
+        if num_patients > 0:
+            generated_patients = generate_random_patients(num_patients, patient_service, batch_size=batch_size)
+        if manifest:
+            manifest.set_checkpoint("generated_patients", generated_patients)
+    
+    # IDs of all patients (existing + newly generated)
+    patient_ids = set(db.session.scalars(select(Patient.id)))
+    if not patient_ids:
         logger.error("No patients available")
-        return 0, 0
+        return 0, 0, 0
     
-    # Get all image files
-    image_files = get_image_files(images_folder)
-    if not image_files:
-        logger.error(f"No images found in {images_folder}")
-        return 0, 0
+    if not os.path.isdir(images_folder):
+        logger.error(f"Images folder not found: {images_folder}")
+        return 0, 0, 0
     
-    # Process original images first (those with extractable patient IDs)
-    processed_count = 0
-    error_count = 0
+    image_pool = []  # Sample of scanned files for generated patients
     patient_sites = {}  # Track which site a patient is assigned to
-    patient_images = defaultdict(list)  # Track how many images each patient has
-    
-    # First pass: process images with original patient IDs
-    for file_path in image_files:
-        filename = os.path.basename(file_path)
-        patient_id, eye_side = extract_id_from_filename(filename)
-        
-        if patient_id and eye_side:
-            # Get or find patient
-            patient = patient_service.get_patient_by_id(patient_id)
-            if not patient:
-                continue  # Skip if patient doesn't exist
+    patients_with_images = set()  # Patients given images in the first pass
+    
+    # Patients that already have images keep their site
+    sites_by_id = {site.id: site for site in sites}
+    for patient_id, site_id in db.session.execute(
+        select(Image.patient_id, func.min(Image.site_id)).group_by(Image.patient_id)
+    ):
+        if site_id in sites_by_id:
+            patient_sites[patient_id] = sites_by_id[site_id]
+    
+    def original_images():
+        """First pass: images with original patient IDs."""
+        image_files = scan_image_files(images_folder, pattern=pattern)
+        for file_path in reservoir_sample(image_files, image_pool, IMAGE_POOL_SIZE):
+            filename = os.path.basename(file_path)
+            patient_id, eye_side = extract_id_from_filename(filename)
+            
+            if not (patient_id and eye_side) or patient_id not in patient_ids:
+                continue  # Skip unrecognized names and unknown patients
             
             # Get or assign a site to this patient
             if patient_id not in patient_sites:
                 patient_sites[patient_id] = random.choice(sites)
                 logger.info(f"Assigned patient {patient_id} to site: {patient_sites[patient_id].name}")
             
-            site = patient_sites[patient_id]
-            
-            try:
-                # Get quality scores based on site profile
-                profile = getattr(site, 'quality_profile', SITE_QUALITY_PROFILES['medium_quality'])
-                quality_score = get_score_based_on_profile(profile, 'quality_score')
-                anatomy_score = get_score_based_on_profile(profile, 'anatomy_score')
-                is_over_illuminated = random.random() < profile['over_illuminated']
-                
-                # Prepare image data
-                image_data = {
-                    'patient_id': patient_id,
-                    'eye_side': eye_side,
-                    'quality_score': quality_score,
-                    'anatomy_score': anatomy_score,
-                    'site_id': site.id,
-                    'over_illuminated': is_over_illuminated,
-                    'acquisition_date': datetime.now() - timedelta(days=random.randint(0, 365))
-                }
-                
-                # Create image file object
-                from werkzeug.datastructures import FileStorage
-                with open(file_path, 'rb') as img_file:
-                    file = FileStorage(
-                        stream=img_file,
-                        filename=filename,
-                        content_type='image/jpeg' if filename.lower().endswith(('.jpg', '.jpeg')) else 'image/png'
-                    )
-                    
-                    # Create the image
-                    image = image_service.create_image(image_data, file)
-                    
-                    # Log the details
-                    logger.info(
-                        f"Imported image: {filename} for patient ID={patient_id}, "
-                        f"Eye={eye_side.value}, "
-                        f"Quality={quality_score.value}, "
-                        f"Anatomy={anatomy_score.value}, "
-                        f"Site={site.name}, "
-                        f"Over-illuminated={is_over_illuminated}"
-                    )
-                    processed_count += 1
-                    patient_images[patient_id].append((eye_side, file_path))
-                    
-            except Exception as e:
-                logger.error(f"Error importing image {filename}: {str(e)}")
-                error_count += 1
-    
-    # Second pass: Assign remaining images to generated patients
-    if generated_patients:
+            image_data = random_image_data(patient_id, eye_side, patient_sites[patient_id])
+            patients_with_images.add(patient_id)
+            yield ImportManifest.file_key(file_path) if manifest else None, image_data, file_path
+    
+    def generated_images():
+        """Second pass: assign images from the pool to generated patients."""
+        if not image_pool:
+            logger.error(f"No images found in {images_folder}")
+            return
+        if not generated_patients:
+            return
         logger.info(f"Processing {len(generated_patients)} generated patients for image assignment")
         
         # Assign sites to generated patients
-        for patient in generated_patients:
-            if patient.id not in patient_sites:
-                patient_sites[patient.id] = random.choice(sites)
-        
-        # Get a list of all patients who don't have any images yet
-        patients_without_images = [p.id for p in all_patients if p.id not in patient_images]
-        
-        # Decide how many of these patients will have images (not all should have images)
-        percentage_with_images = 0.7  # 70% of patients will have images
-        patients_to_get_images = random.sample(
-            patients_without_images, 
-            k=min(len(patients_without_images), int(len(patients_without_images) * percentage_with_images))
-        )
-        
-        logger.info(f"{len(patients_to_get_images)} patients without images will be assigned some")
+        for patient_id in generated_patients:
+            if patient_id not in patient_sites:
+                patient_sites[patient_id] = random.choice(sites)
         
-        # For each patient that should get images, assign 1-max_images_per_patient images
-        for patient_id in patients_to_get_images:
-            site = patient_sites[patient_id]
-            profile = getattr(site, 'quality_profile', SITE_QUALITY_PROFILES['medium_quality'])
+        # The whole plan is checkpointed, so a resumed run yields the same slots
+        assignments = manifest.get_checkpoint("image_assignments") if manifest else None
+        if assignments is None:
+            # Get a list of all patients who don't have any images yet
+            patients_without_images = [patient_id for patient_id in patient_ids if patient_id not in patients_with_images]
             
-            # Decide how many images this patient will have (1 to max_images_per_patient)
-            num_images = random.randint(1, max_images_per_patient)
+            # Decide how many of these patients will have images (not all should have images)
+            percentage_with_images = 0.7  # 70% of patients will have images
+            patients_to_get_images = random.sample(
+                patients_without_images, 
+                k=min(len(patients_without_images), int(len(patients_without_images) * percentage_with_images))
+            )
             
-            # Randomly select images from the pool
-            for _ in range(num_images):
-                file_path = random.choice(image_files)
-                filename = os.path.basename(file_path)
-                eye_side = random.choice(list(EyeSide))
-                
-                try:
-                    quality_score = get_score_based_on_profile(profile, 'quality_score')
-                    anatomy_score = get_score_based_on_profile(profile, 'anatomy_score')
-                    is_over_illuminated = random.random() < profile['over_illuminated']
-                    
-                    # Prepare image data
-                    image_data = {
-                        'patient_id': patient_id,
-                        'eye_side': eye_side,
-                        'quality_score': quality_score,
-                        'anatomy_score': anatomy_score,
-                        'site_id': site.id,
-                        'over_illuminated': is_over_illuminated,
-                        'acquisition_date': datetime.now() - timedelta(days=random.randint(0, 365))
-                    }
-                    
-                    # Create image file object
-                    from werkzeug.datastructures import FileStorage
-                    with open(file_path, 'rb') as img_file:
-                        file = FileStorage(
-                            stream=img_file,
-                            filename=f"generated_{patient_id}_{eye_side.value.lower()}_{random.randint(1000, 9999)}.jpg",
-                            content_type='image/jpeg' if filename.lower().endswith(('.jpg', '.jpeg')) else 'image/png'
-                        )
-                        
-                        # Create the image
-                        image = image_service.create_image(image_data, file)
-                        
-                        # Log the details
-                        logger.info(
-                            f"Generated image for patient ID={patient_id}, "
-                            f"Eye={eye_side.value}, "
-                            f"Quality={quality_score.value}, "
-                            f"Anatomy={anatomy_score.value}, "
-                            f"Site={site.name}, "
-                            f"Over-illuminated={is_over_illuminated}"
-                        )
-                        processed_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error generating image for patient {patient_id}: {str(e)}")
-                    error_count += 1
+            # Give each 1 to max_images_per_patient images randomly selected from the pool
+            assignments = [
+                [patient_id, [random.choice(image_pool) for _ in range(random.randint(1, max_images_per_patient))]]
+                for patient_id in patients_to_get_images
+            ]
+            if manifest:
+                manifest.set_checkpoint("image_assignments", assignments)
+        
+        logger.info(f"{len(assignments)} patients without images will be assigned some")
+        
+        for patient_id, file_paths in assignments:
+            site = patient_sites.setdefault(patient_id, random.choice(sites))
+            for slot, file_path in enumerate(file_paths):
+                yield (
+                    f"generated:{patient_id}:{slot}",
+                    random_image_data(patient_id, random.choice(list(EyeSide)), site),
+                    file_path
+                )
+    
+    def report(summary):
+        logger.info(
+            f"Images: {summary['imported']} imported, {summary['failed']} errors "
+            f"({summary['images_per_second']} images/sec)"
+        )
+    
+    # The second pass starts once the first has scanned the whole tree
+    summary = IngestService().ingest(
+        chain(original_images(), generated_images()),
+        workers=workers,
+        batch_size=batch_size,
+        progress=report,
+        manifest=manifest,
+        in_place=in_place
+    )
     
     # Generate statistics for future dashboard
     generate_site_statistics(sites, patient_service, image_service)
     
-    return processed_count, error_count
+    return summary['imported'], summary['skipped'], summary['failed']
 
 def generate_site_statistics(sites, patient_service, image_service):
     """Generate statistics about site quality for future dashboard use."""
     stats = {}
+    site_ids = {site.id for site in sites}
     
-    for site in sites:
-        site_id = site.id
-        site_name = site.name
-        
-        # Get all patients with images from this site
-        patients_with_images = db.session.query(Patient.id).distinct(). \
-            join(Image, Patient.id == Image.patient_id). \
-            filter(Image.site_id == site_id).all()
+    # Readiness for every site is computed in a single grouped query
+    for site_stats in StatisticsService().get_sites_statistics():
+        if site_stats['id'] not in site_ids:
+            continue
         
-        patients_with_images = [p[0] for p in patients_with_images]
-        total_patients = len(patients_with_images)
-        
-        # Count patients available for AI (those with high quality images for both eyes)
-        patients_available_for_ai = 0
-        
-        for patient_id in patients_with_images:
-            # Get all images for this patient at this site
-            images = db.session.query(Image). \
-                filter(Image.patient_id == patient_id, Image.site_id == site_id).all()
-            
-            # Check if patient has at least one good image for each eye
-            left_eye_good = False
-            right_eye_good = False
-            
-            for img in images:
-                # Check if this image meets quality criteria
-                is_good_quality = (
-                    img.quality_score in [ImageQualityScore.HIGH, ImageQualityScore.ACCEPTABLE] and
-                    img.anatomy_score in [AnatomyScore.GOOD, AnatomyScore.ACCEPTABLE] and
-                    not img.over_illuminated
-                )
-                
-                if is_good_quality:
-                    if img.eye_side == EyeSide.LEFT:
-                        left_eye_good = True
-                    elif img.eye_side == EyeSide.RIGHT:
-                        right_eye_good = True
-            
-            # Patient is available for AI if both eyes have good images
-            if left_eye_good and right_eye_good:
-                patients_available_for_ai += 1
-        
-        # Calculate availability percentage
-        availability_percentage = (patients_available_for_ai / total_patients * 100) if total_patients > 0 else 0
+        site_name = site_stats['name']
+        total_patients = site_stats['total_patients']
+        patients_available_for_ai = site_stats['available_for_ai']
+        availability_percentage = site_stats['availability_percentage']
         
         # Store stats
         stats[site_name] = {
@@ -584,6 +608,16 @@ def main():
     """Main function to run the import script."""
     args = parse_args()
     
+    # Set up logging here rather than on import, so tests can import the script
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("import.log"),
+            logging.StreamHandler()
+        ]
+    )
+    
     # Initialize Flask app
     app = create_app()
     
@@ -593,6 +627,13 @@ def main():
         print(f"Error: CSV file not found: {args.csv_file}")
         return
     
+    # Record progress for a later --resume; a fresh import starts a fresh ledger
+    manifest = ImportManifest(args.manifest)
+    if args.resume:
+        logger.info(f"Resuming with {manifest.done_count()} images recorded in {args.manifest}")
+    else:
+        manifest.clear()
+    
     with app.app_context():
         patient_service = PatientService()
         image_service = ImageService()
@@ -600,12 +641,23 @@ def main():
         
         # Import patients
         logger.info(f"Starting patient import from {args.csv_file}")
-        created, updated, errors = import_patients(args.csv_file, patient_service)
-        logger.info(f"Patient import completed: {created} created, {updated} updated, {errors} errors")
-        print(f"Patient import completed: {created} created, {updated} updated, {errors} errors")
+        started = time.monotonic()
+        created, updated, errors, skipped = import_patients(
+            args.csv_file, patient_service, batch_size=args.batch_size, manifest=manifest
+        )
+        rate = (created + updated + errors) / max(time.monotonic() - started, 1e-9)
+        summary = (
+            f"Patient import completed: {created} created, {updated} updated, {errors} errors, "
+            f"{skipped} skipped as already imported ({rate:.0f} rows/sec)"
+        )
+        logger.info(summary)
+        print(summary)
         
         # Import images if folder provided
-        if args.images_folder:
+        if args.images_folder and args.in_place and not is_in_external_root(args.images_folder):
+            logger.error(f"--in-place needs {args.images_folder} to be inside one of EXTERNAL_IMAGE_ROOTS")
+            print(f"Error: --in-place needs {args.images_folder} to be inside one of EXTERNAL_IMAGE_ROOTS")
+        elif args.images_folder:
             logger.info(f"Starting image import from {args.images_folder}")
             
             if args.randomize:
@@ -613,29 +665,40 @@ def main():
                 print(f"Randomizing image metadata with {args.num_sites} sites")
                 
                 # Import with randomization
-                processed, errors = import_images_with_randomization(
+                processed, skipped, errors = import_images_with_randomization(
                     args.images_folder,
                     patient_service,
                     image_service,
                     site_service,
                     num_patients=args.num_patients,
                     num_sites=args.num_sites,
-                    max_images_per_patient=args.max_images_per_patient
+                    max_images_per_patient=args.max_images_per_patient,
+                    batch_size=args.batch_size,
+                    workers=args.workers,
+                    manifest=manifest,
+                    in_place=args.in_place,
+                    pattern=args.pattern
                 )
             else:
                 logger.info("Not randomizing metadata (use --randomize for this feature)")
                 print("Not randomizing metadata (use --randomize for this feature)")
                 
                 # Regular import without metadata
-                processed, errors = 0, 0
+                processed, skipped, errors = 0, 0, 0
                 
-            logger.info(f"Image import completed: {processed} processed, {errors} errors")
-            print(f"Image import completed: {processed} processed, {errors} errors")
+            summary = (
+                f"Image import completed: {processed} processed, {errors} errors, "
+                f"{skipped} skipped as already imported"
+            )
+            logger.info(summary)
+            print(summary)
         else:
             logger.info("No images folder specified, skipping image import")
         
         logger.info("Import process completed")
         print("Import process completed")
+    
+    manifest.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,6 +5,8 @@ from app.config import Config
 from datetime import datetime, timezone, date
 from app.models.patient import Patient, Sex
 from app.models.image import Image, EyeSide, ImageQualityScore, AnatomyScore
+from app.services.blob_service import ImageDetails
+from app.services.storage_service import StoredBlob
 
 
 class TestConfig(Config):
@@ -13,6 +15,10 @@ class TestConfig(Config):
     WTF_CSRF_ENABLED = False
     UPLOAD_FOLDER = 'tests/uploads'
     SECRET_KEY = '0b2920f184a7a210c914bff56e52fcb1'
+    STATISTICS_BACKGROUND_REFRESH = False
+    IMAGE_TILE_GENERATION = False
+    IMAGE_VARIANT_GENERATION = False
+    IMAGE_ANALYSIS_AT_UPLOAD = False
 
 
 @pytest.fixture
@@ -83,4 +89,106 @@ def runner(app):
 @pytest.fixture
 def app_context(app):
     with app.app_context():
-        yield
\ No newline at end of file
+        yield
+
+@pytest.fixture
+def mock_readiness_service():
+    """
+    Records readiness maintenance calls for service tests that run against a
+    mocked db session.
+    """
+    class MockReadinessService:
+        def __init__(self):
+            self.refreshed = []
+            self.removed_patients = []
+            self.removed_sites = []
+
+        def refresh(self, patient_id, site_id):
+            self.refreshed.append((patient_id, site_id))
+
+        def remove_patient(self, patient_id):
+            self.removed_patients.append(patient_id)
+
+        def remove_site(self, site_id):
+            self.removed_sites.append(site_id)
+
+    return MockReadinessService()
+
+
+@pytest.fixture
+def mock_data_version_service():
+    """Counts data version bumps for service tests with a mocked db session."""
+    class MockDataVersionService:
+        def __init__(self):
+            self.version = 0
+            self.listeners = []
+
+        def get_version(self, max_staleness=0):
+            return self.version
+
+        def bump(self):
+            self.version += 1
+
+        def add_commit_listener(self, callback):
+            self.listeners.append(callback)
+
+    return MockDataVersionService()
+
+
+@pytest.fixture
+def mock_rollup_service():
+    """Records daily rollup maintenance for service tests with a mocked db session."""
+    from app.services.rollup_service import RollupService
+
+    class MockRollupService:
+        def __init__(self):
+            self.recorded = []
+
+        def key_for(self, image):
+            return RollupService.key_for(self, image)
+
+        def record(self, key, delta):
+            if key is not None:
+                self.recorded.append((key, delta))
+
+        def add_image(self, image):
+            self.record(self.key_for(image), 1)
+
+        def remove_image(self, image):
+            self.record(self.key_for(image), -1)
+
+        def update_image(self, previous_key, image):
+            key = self.key_for(image)
+            if key != previous_key:
+                self.record(previous_key, -1)
+                self.record(key, 1)
+
+    return MockRollupService()
+
+
+@pytest.fixture
+def mock_blob_service():
+    """Records blob references for service tests with a mocked db session."""
+    class MockBlobService:
+        def __init__(self):
+            self.stored = []
+            self.released = []
+            self.removed = []
+
+        def store(self, image_file, filename):
+            image_path = f"blobs/{filename}"
+            self.stored.append((image_file, image_path))
+            return StoredBlob("0" * 64, image_path, 4, ImageDetails(8, 8, "RGB", "JPEG"))
+
+        def release(self, image_path):
+            if image_path:
+                self.released.append(image_path)
+                return image_path
+            return None
+
+        def remove_if_unreferenced(self, image_path):
+            if image_path:
+                self.removed.append(image_path)
+            return bool(image_path)
+
+    return MockBlobService()
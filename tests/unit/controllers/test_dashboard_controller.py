@@ -0,0 +1,289 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from flask import url_for
+
+
+class TestDashboardController:
+    @pytest.fixture
+    def mock_statistics(self, monkeypatch):
+        """
+        Mock the statistics cache to avoid database interactions
+        """
+        class MockStatisticsCache:
+            def __init__(self):
+                self.version = 7
+                self.snapshots = 0
+                self.ready = 3
+
+            def get_version(self):
+                return self.version
+
+            def get_served_version(self):
+                return self.version
+
+            def get_dashboard_snapshot(self):
+                self.snapshots += 1
+                return {
+                    'site_stats': [{
+                        'id': 1,
+                        'name': 'Main Clinic',
+                        'location': 'New York, NY',
+                        'total_patients': 4,
+                        'available_for_ai': self.ready,
+                        'availability_percentage': self.ready / 4 * 100,
+                    }],
+                    'image_stats': {
+                        'total_images': 8,
+                        'quality': {'HIGH': 4, 'ACCEPTABLE': 2, 'LOW': 1, 'UNRATED': 1},
+                        'anatomy': {'GOOD': 5, 'ACCEPTABLE': 1, 'POOR': 1, 'UNRATED': 1},
+                        'illumination': {'OVER_ILLUMINATED': 2, 'NORMAL': 6},
+                    },
+                    'global_stats': {
+                        'total_sites': 1,
+                        'total_patients': 4,
+                        'available_patients': 3,
+                        'readiness_percentage': 75.0,
+                    },
+                    'generated_at': datetime.now(timezone.utc) - timedelta(seconds=3),
+                }
+
+            def get_cache_statistics(self):
+                return {'hits': 3, 'misses': 1, 'hit_ratio': 0.75, 'entries': 1}
+
+        mock_cache = MockStatisticsCache()
+        monkeypatch.setattr('app.controllers.web.dashboard_controller.statistics_cache', mock_cache)
+        return mock_cache
+
+    def test_index(self, client, mock_statistics):
+        """Test GET request to the dashboard."""
+        response = client.get(url_for('dashboard.index'))
+
+        assert response.status_code == 200
+        assert b'AI Readiness Dashboard' in response.data
+        assert b'Main Clinic' in response.data
+        assert b'75.0%' in response.data
+
+    def test_site_statistics_api(self, client, mock_statistics):
+        """Test the site statistics JSON endpoint."""
+        response = client.get(url_for('dashboard.site_statistics_api'))
+
+        assert response.status_code == 200
+        assert response.json['status'] == 'success'
+        assert response.json['data'][0]['available_for_ai'] == 3
+        assert 'generated_at' in response.json
+        assert int(response.headers['Age']) >= 3
+
+    def test_image_statistics_api(self, client, mock_statistics):
+        """Test the image statistics JSON endpoint."""
+        response = client.get(url_for('dashboard.image_statistics_api'))
+
+        assert response.status_code == 200
+        assert response.json['data']['quality']['HIGH'] == 4
+
+    def test_statistics_api_etag(self, client, mock_statistics):
+        """Test that a matching If-None-Match is answered without computing statistics."""
+        response = client.get(url_for('dashboard.site_statistics_api'))
+        etag = response.headers['ETag']
+
+        assert etag == '"site-statistics-7"'
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert mock_statistics.snapshots == 1
+
+        response = client.get(url_for('dashboard.site_statistics_api'), headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.data == b''
+        assert mock_statistics.snapshots == 1
+
+    def test_statistics_api_etag_changes_with_version(self, client, mock_statistics):
+        """Test that a data version bump invalidates the previous ETag."""
+        etag = client.get(url_for('dashboard.image_statistics_api')).headers['ETag']
+
+        mock_statistics.version += 1
+        response = client.get(url_for('dashboard.image_statistics_api'), headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"image-statistics-8"'
+        assert response.json['data']['quality']['HIGH'] == 4
+
+    def test_counters_api_revalidates(self, client, mock_statistics):
+        """Test that polled counters are answered with a 304 until the data version changes."""
+        response = client.get(url_for('dashboard.counters_api'))
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"counters-7"'
+        assert response.json['data']['site.1.available_for_ai'] == 3
+
+        response = client.get(url_for('dashboard.counters_api'), headers={'If-None-Match': '"counters-7"'})
+        assert response.status_code == 304
+        assert mock_statistics.snapshots == 1
+
+        mock_statistics.version = 8
+        response = client.get(url_for('dashboard.counters_api'), headers={'If-None-Match': '"counters-7"'})
+        assert response.status_code == 200
+
+    def test_stream_api_disabled_by_default(self, client, mock_statistics):
+        """Test that the event stream, which holds a worker thread, is opt-in."""
+        assert client.get(url_for('dashboard.stream_api')).status_code == 404
+
+    @pytest.fixture
+    def short_stream(self, app):
+        app.config.update(
+            DASHBOARD_LIVE_UPDATES='stream', DASHBOARD_STREAM_INTERVAL=0.01, DASHBOARD_STREAM_DURATION=0.2
+        )
+
+    def stream_events(self, response):
+        import json
+
+        events = []
+        for message in response.get_data(as_text=True).split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+            if 'event' in fields:
+                events.append((fields['event'], fields['id'], json.loads(fields['data'])))
+        return events
+
+    def test_stream_api_pushes_changed_counters(self, client, mock_statistics, short_stream):
+        """Test that the stream sends a snapshot, then only counters that changed."""
+        calls = []
+
+        def get_served_version():
+            calls.append(1)
+            if len(calls) == 3:
+                mock_statistics.version = 8
+                mock_statistics.ready = 4
+            return mock_statistics.version
+
+        mock_statistics.get_served_version = get_served_version
+        response = client.get(url_for('dashboard.stream_api'))
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        events = self.stream_events(response)
+        assert [(event, event_id) for event, event_id, _ in events] == [('snapshot', '7'), ('delta', '8')]
+        assert events[0][2]['site.1.available_for_ai'] == 3
+        assert events[0][2]['quality.HIGH'] == 4
+        assert events[1][2] == {
+            'site.1.available_for_ai': 4,
+            'site.1.availability_percentage': 100.0,
+        }
+
+    def test_stream_api_skips_snapshot_for_current_client(self, client, mock_statistics, short_stream):
+        """Test that a client already at the current version only gets changes."""
+        response = client.get(url_for('dashboard.stream_api'), headers={'Last-Event-ID': '7'})
+
+        assert response.get_data(as_text=True).startswith('retry: 10')
+        assert self.stream_events(response) == []
+
+    def test_cache_statistics_api(self, client, mock_statistics):
+        """Test the cache statistics JSON endpoint."""
+        response = client.get(url_for('dashboard.cache_statistics_api'))
+
+        assert response.status_code == 200
+        assert response.json['data'] == {'hits': 3, 'misses': 1, 'hit_ratio': 0.75, 'entries': 1}
+
+    @pytest.fixture
+    def mock_snapshot_service(self, monkeypatch):
+        """
+        Mock the image snapshot service and record the criteria it receives
+        """
+        class MockImageSnapshotService:
+            def __init__(self):
+                self.criteria = None
+
+            def evaluate_readiness(self, quality=None, anatomy=None, ignore_illumination=False):
+                self.criteria = (quality, anatomy, ignore_illumination)
+                return {
+                    'image_count': 8,
+                    'site_stats': [],
+                    'global_stats': {'total_sites': 0},
+                }
+
+        mock_service = MockImageSnapshotService()
+        monkeypatch.setattr('app.controllers.web.dashboard_controller.image_snapshot_service', mock_service)
+        return mock_service
+
+    def test_readiness_what_if_api(self, client, mock_snapshot_service):
+        """Test the what-if readiness endpoint with custom criteria."""
+        from app.models.image import ImageQualityScore
+
+        response = client.get(url_for(
+            'dashboard.readiness_what_if_api',
+            quality='high,acceptable,LOW',
+            ignore_illumination='true'
+        ))
+
+        assert response.status_code == 200
+        assert response.json['data']['criteria'] == {
+            'quality': ['HIGH', 'ACCEPTABLE', 'LOW'],
+            'anatomy': None,
+            'ignore_illumination': True,
+        }
+        assert 'elapsed_ms' in response.json['data']
+        assert mock_snapshot_service.criteria == (
+            [ImageQualityScore.HIGH, ImageQualityScore.ACCEPTABLE, ImageQualityScore.LOW],
+            None,
+            True
+        )
+
+    def test_readiness_what_if_api_invalid(self, client, mock_snapshot_service):
+        """Test the what-if readiness endpoint with an unknown score."""
+        response = client.get(url_for('dashboard.readiness_what_if_api', anatomy='EXCELLENT'))
+
+        assert response.status_code == 400
+        assert response.json['status'] == 'error'
+        assert 'EXCELLENT' in response.json['message']
+
+    @pytest.fixture
+    def mock_rollup_service(self, monkeypatch):
+        """
+        Mock the rollup service and record the window it is asked for
+        """
+        class MockRollupService:
+            def __init__(self):
+                self.window = None
+
+            def get_image_counts(self, start=None, end=None, site_id=None):
+                self.window = (start, end, site_id)
+                return {'total_images': 5}
+
+            def get_trends(self, granularity='week', start=None, end=None, site_id=None):
+                self.window = (granularity, start, end, site_id)
+                return [{'period': '2024-01-01', 'total_images': 5}]
+
+        mock_service = MockRollupService()
+        monkeypatch.setattr('app.controllers.web.dashboard_controller.rollup_service', mock_service)
+        return mock_service
+
+    def test_image_counts_api(self, client, mock_statistics, mock_rollup_service):
+        """Test the date-windowed image counts endpoint."""
+        from datetime import date
+
+        response = client.get(url_for(
+            'dashboard.image_counts_api', start='2024-01-01', end='2024-03-31', site_id=1
+        ))
+
+        assert response.status_code == 200
+        assert response.json['data'] == {'total_images': 5}
+        assert mock_rollup_service.window == (date(2024, 1, 1), date(2024, 3, 31), 1)
+
+    def test_image_counts_api_invalid_date(self, client, mock_rollup_service):
+        """Test the image counts endpoint with a malformed date."""
+        response = client.get(url_for('dashboard.image_counts_api', start='01/02/2024'))
+
+        assert response.status_code == 400
+        assert response.json['status'] == 'error'
+
+    def test_trends_api(self, client, mock_statistics, mock_rollup_service):
+        """Test the trends endpoint."""
+        response = client.get(url_for('dashboard.trends_api', granularity='month'))
+
+        assert response.status_code == 200
+        assert response.json['data'][0]['period'] == '2024-01-01'
+        assert mock_rollup_service.window == ('month', None, None, None)
+
+    def test_trends_api_invalid_granularity(self, client, mock_rollup_service):
+        """Test the trends endpoint with an unknown granularity."""
+        response = client.get(url_for('dashboard.trends_api', granularity='year'))
+
+        assert response.status_code == 400
+        assert 'Granularity' in response.json['message']
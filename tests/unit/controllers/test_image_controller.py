@@ -167,6 +167,27 @@ class TestImageController:
         assert response.status_code == 302  # Redirect
         assert response.headers.get('Location').endswith('/patients/1')
     
+    def test_upload_rejected_file(self, client, mock_services, monkeypatch):
+        """Test that files the service rejects as too large or not images are a 400."""
+        import io
+
+        def reject(image_data, image_file=None):
+            raise ValueError("File is not a supported image")
+
+        monkeypatch.setattr('app.controllers.web.image_controller.image_service.create_image', reject)
+
+        response = client.post(
+            url_for('images.upload', patient_id=1),
+            data={
+                'eye_side': 'LEFT',
+                'image_file': (io.BytesIO(b"not an image"), 'eye.jpg'),
+            },
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 400
+        assert b"File is not a supported image" in response.data
+
     def test_upload_invalid_data(self, client, mock_services, monkeypatch):
         """Test POST request to upload with invalid data."""
         import io
@@ -215,6 +236,7 @@ class TestImageController:
         assert response.status_code == 200
         assert b'Image Details' in response.data
         assert b'LEFT' in response.data
+        assert b'/images/files/' in response.data
     
     def test_show_invalid(self, client, mock_services):
         """Test GET request to show with invalid image ID."""
@@ -311,4 +333,196 @@ class TestImageController:
         
         # Assertions
         assert response.status_code == 302  # Redirect
-        assert response.headers.get('Location').endswith('/patients/')
\ No newline at end of file
+        assert response.headers.get('Location').endswith('/patients/')
+
+    def test_image_file(self, app, client, tmp_path):
+        """Test that stored image files are served from the upload folder."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        (tmp_path / "stored.jpg").write_bytes(b"image-bytes")
+
+        response = client.get(url_for('images.image_file', filename='stored.jpg'))
+
+        assert response.status_code == 200
+        assert response.data == b"image-bytes"
+        assert response.mimetype == 'image/jpeg'
+        response.close()
+
+    def test_image_file_in_external_root(self, app, client, tmp_path):
+        """Test that images registered in place are served from their archive."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(tmp_path / "archive")}
+        (tmp_path / "archive" / "site1").mkdir(parents=True)
+        (tmp_path / "archive" / "site1" / "eye.jpg").write_bytes(b"image-bytes")
+        url = url_for('images.image_file', filename='external/archive/site1/eye.jpg')
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data == b"image-bytes"
+        response.close()
+
+        app.config['IMAGE_ACCEL_REDIRECT_PREFIX'] = '/protected-images/'
+        response = client.get(url)
+        assert response.headers['X-Accel-Redirect'] == '/protected-images/external/archive/site1/eye.jpg'
+        assert client.get('/images/files/external/unknown/site1/eye.jpg').status_code == 404
+
+    def test_image_file_not_found(self, app, client, tmp_path):
+        """Test that missing files and paths outside the upload folder are 404s."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        (tmp_path / "secret.txt").write_text("secret")
+
+        assert client.get(url_for('images.image_file', filename='missing.jpg')).status_code == 404
+        assert client.get('/images/files/../secret.txt').status_code == 404
+
+    def test_thumbnail(self, app, client, tmp_path):
+        """Test that thumbnails are generated on request and cached by browsers."""
+        from PIL import Image as PILImage
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        PILImage.new("RGB", (1200, 800), "red").save(tmp_path / "stored.jpg")
+
+        response = client.get(url_for('images.thumbnail', size='thumb', filename='stored.jpg'))
+
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.cache_control.public
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        response.close()
+
+    def test_thumbnail_of_external_image_revalidates(self, app, client, tmp_path):
+        """Test that previews of images that can be edited in their archive are not cached as immutable."""
+        from PIL import Image as PILImage
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(tmp_path / "archive")}
+        (tmp_path / "archive").mkdir()
+        PILImage.new("RGB", (1200, 800), "red").save(tmp_path / "archive" / "eye.jpg")
+
+        response = client.get(url_for('images.thumbnail', size='thumb', filename='external/archive/eye.jpg'))
+
+        assert response.status_code == 200
+        assert response.cache_control.no_cache
+        assert not response.cache_control.immutable
+        assert response.headers['ETag']
+        response.close()
+
+    def test_thumbnail_not_found(self, app, client, tmp_path):
+        """Test that unknown sizes and missing images are 404s."""
+        from PIL import Image as PILImage
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        PILImage.new("RGB", (10, 10)).save(tmp_path / "stored.jpg")
+
+        assert client.get(url_for('images.thumbnail', size='huge', filename='stored.jpg')).status_code == 404
+        assert client.get(url_for('images.thumbnail', size='thumb', filename='missing.jpg')).status_code == 404
+
+    def test_tiles(self, app, client, tmp_path):
+        """Test that the Deep Zoom descriptor and tiles of a stored image are served."""
+        from PIL import Image as PILImage
+        from app.services.tile_service import TileService
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        (tmp_path / "blobs").mkdir()
+        PILImage.new("RGB", (600, 300), "red").save(tmp_path / "blobs" / "stored.jpg")
+
+        descriptor_url = url_for('images.tile_descriptor', filename='blobs/stored.jpg')
+        tile_url = url_for('images.tile', filename='blobs/stored.jpg', level=10, column=1, row=0)
+        assert descriptor_url == '/images/tiles/blobs/stored.jpg.dzi'
+        assert tile_url == '/images/tiles/blobs/stored.jpg_files/10/1_0.jpg'
+        assert client.get(descriptor_url).status_code == 404
+
+        TileService().generate('blobs/stored.jpg')
+
+        response = client.get(descriptor_url)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/xml'
+        response.close()
+
+        response = client.get(tile_url)
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.cache_control.immutable
+        response.close()
+
+        assert client.get('/images/tiles/blobs/stored.jpg_files/10/9_9.jpg').status_code == 404
+
+    def test_image_file_blob_validators(self, app, client, tmp_path):
+        """Test that content-addressed files are immutable, revalidate by hash and support ranges."""
+        sha256 = "ab" * 32
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        (tmp_path / "blobs" / "ab").mkdir(parents=True)
+        (tmp_path / "blobs" / "ab" / f"{sha256}.jpg").write_bytes(b"image-bytes")
+        url = url_for('images.image_file', filename=f'blobs/ab/{sha256}.jpg')
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['ETag'] == f'"{sha256}"'
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        response.close()
+
+        response = client.get(url, headers={'If-None-Match': f'"{sha256}"'})
+        assert response.status_code == 304
+        assert response.data == b""
+
+        response = client.get(url, headers={'Range': 'bytes=6-10'})
+        assert response.status_code == 206
+        assert response.data == b"bytes"
+        assert response.headers['Content-Range'] == 'bytes 6-10/11'
+        response.close()
+
+    def test_image_file_other_paths_revalidate(self, app, client, tmp_path):
+        """Test that files outside the blob store are revalidated on every use."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        (tmp_path / "stored.jpg").write_bytes(b"image-bytes")
+        url = url_for('images.image_file', filename='stored.jpg')
+
+        response = client.get(url)
+        etag = response.headers['ETag']
+        assert response.cache_control.no_cache
+        assert not response.cache_control.immutable
+        response.close()
+
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    def test_image_file_accel_redirect(self, app, client, tmp_path):
+        """Test that nginx is asked to send the file when an internal location is configured."""
+        sha256 = "cd" * 32
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        app.config['IMAGE_ACCEL_REDIRECT_PREFIX'] = '/protected-images/'
+        (tmp_path / "blobs" / "cd").mkdir(parents=True)
+        (tmp_path / "blobs" / "cd" / f"{sha256}.jpg").write_bytes(b"image-bytes")
+        url = url_for('images.image_file', filename=f'blobs/cd/{sha256}.jpg')
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['X-Accel-Redirect'] == f'/protected-images/blobs/cd/{sha256}.jpg'
+        assert response.mimetype == 'image/jpeg'
+        assert response.data == b""
+        assert response.headers['ETag'] == f'"{sha256}"'
+        assert response.cache_control.immutable
+
+        assert client.get(url, headers={'If-None-Match': f'"{sha256}"'}).status_code == 304
+
+    def test_thumbnail_negotiates_format_and_width(self, app, client, tmp_path):
+        """Test that thumbnails use the best format the browser names and the requested width."""
+        from PIL import Image as PILImage
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        PILImage.new("RGB", (1200, 800), "red").save(tmp_path / "stored.jpg")
+
+        response = client.get(
+            url_for('images.thumbnail', size='thumb', filename='stored.jpg'),
+            headers={'Accept': 'image/webp,image/*,*/*;q=0.8'}
+        )
+        assert response.mimetype == 'image/webp'
+        assert 'Accept' in response.vary
+        response.close()
+
+        # Wildcards alone get the JPEG every browser decodes
+        response = client.get(
+            url_for('images.thumbnail', size='thumb', filename='stored.jpg'),
+            headers={'Accept': 'image/*,*/*;q=0.8'}
+        )
+        assert response.mimetype == 'image/jpeg'
+        response.close()
+
+        response = client.get(url_for('images.thumbnail', size='800', filename='stored.jpg'))
+        assert response.status_code == 200
+        assert (tmp_path / "thumbnails" / "medium" / "stored.jpg.jpg").exists()
+        response.close()
@@ -0,0 +1,33 @@
+import pytest
+from datetime import date
+from app.models.image import EyeSide, ImageQualityScore
+from app.models.image_daily_rollup import ImageDailyRollup
+
+
+class TestImageDailyRollupModel:
+    @pytest.fixture
+    def sample_rollup(self):
+        """Create a sample rollup row for testing."""
+        return ImageDailyRollup(
+            day=date(2024, 3, 4),
+            site_id=1,
+            eye_side=EyeSide.LEFT,
+            quality_score=ImageQualityScore.HIGH,
+            anatomy_score=None,
+            over_illuminated=False,
+            image_count=7
+        )
+
+    def test_rollup_repr(self, sample_rollup):
+        """Test the string representation of a rollup row."""
+        assert repr(sample_rollup) == "<ImageDailyRollup 2024-03-04 site=1: 7>"
+
+    def test_rollup_to_dict(self, sample_rollup):
+        """Test the to_dict method."""
+        rollup_dict = sample_rollup.to_dict()
+
+        assert rollup_dict["day"] == "2024-03-04"
+        assert rollup_dict["eye_side"] == "LEFT"
+        assert rollup_dict["quality_score"] == "HIGH"
+        assert rollup_dict["anatomy_score"] is None
+        assert rollup_dict["image_count"] == 7
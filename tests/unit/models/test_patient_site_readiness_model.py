@@ -0,0 +1,35 @@
+import pytest
+from app.models.patient_site_readiness import PatientSiteReadiness
+
+
+class TestPatientSiteReadinessModel:
+    @pytest.fixture
+    def sample_readiness(self):
+        """Create a sample readiness row for testing."""
+        return PatientSiteReadiness(
+            patient_id=1,
+            site_id=2,
+            has_good_left=True,
+            has_good_right=False
+        )
+
+    def test_readiness_repr(self, sample_readiness):
+        """Test the string representation of a readiness row."""
+        assert repr(sample_readiness) == "<PatientSiteReadiness patient=1 site=2>"
+
+    def test_is_available(self, sample_readiness):
+        """Test that both eyes need a good image."""
+        assert sample_readiness.is_available is False
+
+        sample_readiness.has_good_right = True
+        assert sample_readiness.is_available is True
+
+    def test_readiness_to_dict(self, sample_readiness):
+        """Test the to_dict method."""
+        readiness_dict = sample_readiness.to_dict()
+
+        assert readiness_dict["patient_id"] == 1
+        assert readiness_dict["site_id"] == 2
+        assert readiness_dict["has_good_left"] is True
+        assert readiness_dict["has_good_right"] is False
+        assert readiness_dict["is_available"] is False
@@ -0,0 +1,119 @@
+import importlib.util
+import inspect
+import os
+import random
+
+import pytest
+from PIL import Image as PILImage
+from app.models.image import Image
+from app.models.patient import Patient
+from app.services.image_service import ImageService
+from app.services.import_manifest import ImportManifest
+from app.services.patient_service import PatientService
+from app.services.site_service import SiteService
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts", "import_script.py")
+spec = importlib.util.spec_from_file_location("import_script", SCRIPT)
+import_script = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_script)
+
+
+@pytest.mark.usefixtures('app_context')
+class TestImportImages:
+    @pytest.fixture
+    def images_folder(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        folder = tmp_path / "images"
+        folder.mkdir()
+        for name, color in (("RS-001_left.png", "red"), ("RS-002_right.png", "blue"), ("other.png", "green")):
+            PILImage.new("RGB", (8, 8), color).save(folder / name)
+        return str(folder)
+
+    def run_import(self, images_folder, manifest):
+        return import_script.import_images_with_randomization(
+            images_folder, PatientService(), ImageService(), SiteService(),
+            num_patients=8, num_sites=2, workers=2, manifest=manifest
+        )
+
+    def test_resume_after_completed_run_imports_nothing(self, images_folder, tmp_path):
+        manifest = ImportManifest(str(tmp_path / "manifest.sqlite"))
+        random.seed(1)
+        imported, skipped, failed = self.run_import(images_folder, manifest)
+        count = Image.query.count()
+        assert imported > 2 and (skipped, failed) == (0, 0)
+
+        # Another seed draws other slot counts and files unless the plan is reused
+        random.seed(2)
+        assert self.run_import(images_folder, manifest) == (0, imported, 0)
+        assert Image.query.count() == count
+
+
+@pytest.mark.usefixtures('app_context')
+class TestImportPatients:
+    def test_only_failing_rows_are_errors(self, tmp_path):
+        csv_file = tmp_path / "patients.csv"
+        csv_file.write_text(
+            "subject_id,date_of_birth,sex\n"
+            "RS-010,1990-01-01,Male\n"
+            # Parses, but does not fit the id column
+            f"RS-{2 ** 64},1990-01-01,Female\n"
+            "RS-011,1991-01-01,Female\n"
+            "RS-001,1980-01-01,Other\n"
+        )
+
+        result = import_script.import_patients(str(csv_file), PatientService(), batch_size=10)
+
+        assert result == (2, 1, 1, 0)
+        assert Patient.query.filter(Patient.id.in_([10, 11])).count() == 2
+
+
+class TestScanImageFiles:
+    @pytest.fixture
+    def tree(self, tmp_path):
+        for path in ("a.jpg", "b.PNG", "notes.txt", "site1/c.jpeg", "site1/2024/RS-001_left.jpg", "site2/d.gif"):
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_bytes(b"")
+        return tmp_path
+
+    def scan(self, folder, **kwargs):
+        return sorted(os.path.relpath(path, folder) for path in import_script.scan_image_files(str(folder), **kwargs))
+
+    def test_scans_subfolders_for_image_extensions(self, tree):
+        assert self.scan(tree) == ["a.jpg", "b.PNG", "site1/2024/RS-001_left.jpg", "site1/c.jpeg"]
+
+    def test_filters_by_extension_and_pattern(self, tree):
+        assert self.scan(tree, extensions=(".jpg",)) == ["a.jpg", "site1/2024/RS-001_left.jpg"]
+        assert self.scan(tree, pattern="RS-*_left.jpg") == ["site1/2024/RS-001_left.jpg"]
+
+    def test_yields_lazily(self, tree):
+        files = import_script.scan_image_files(str(tree))
+
+        assert inspect.isgenerator(files)
+        assert next(files)
+
+    def test_does_not_follow_symlinked_folders(self, tree):
+        os.symlink(tree, tree / "site1" / "loop")
+
+        assert self.scan(tree) == ["a.jpg", "b.PNG", "site1/2024/RS-001_left.jpg", "site1/c.jpeg"]
+
+    def test_missing_folder_yields_nothing(self, tmp_path):
+        assert self.scan(tmp_path / "missing") == []
+
+
+def test_reservoir_sample_is_bounded():
+    pool = []
+
+    passed = list(import_script.reservoir_sample(range(1000), pool, 10))
+
+    assert passed == list(range(1000))
+    assert len(pool) == 10
+    assert len(set(pool)) == 10
+    assert set(pool) <= set(range(1000))
+
+
+def test_reservoir_sample_keeps_all_of_a_small_input():
+    pool = []
+
+    list(import_script.reservoir_sample(range(3), pool, 10))
+
+    assert pool == [0, 1, 2]
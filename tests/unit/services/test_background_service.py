@@ -0,0 +1,39 @@
+import threading
+import time
+import pytest
+from app.services.background_service import BackgroundService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestBackgroundService:
+    @pytest.fixture
+    def service(self):
+        return BackgroundService()
+
+    def test_runs_task(self, service):
+        done = threading.Event()
+
+        assert service.submit("task", done.set)
+        assert done.wait(5)
+
+    def test_same_key_queued_once(self, service):
+        release = threading.Event()
+
+        assert service.submit("blocked", release.wait, 5)
+        assert not service.submit("blocked", release.wait, 5)
+        release.set()
+
+    def test_queue_is_bounded(self, app, service):
+        app.config['IMAGE_WORKER_QUEUE_SIZE'] = 2
+        release = threading.Event()
+
+        assert service.submit("first", release.wait, 5)
+        assert service.submit("second", release.wait, 5)
+        assert not service.submit("third", release.wait, 5)
+        assert not service.is_pending("third")
+
+        release.set()
+        for key in ("first", "second"):
+            while service.is_pending(key):
+                time.sleep(0.01)
+        assert service.submit("third", release.wait, 5)
@@ -0,0 +1,198 @@
+import io
+import os
+
+import pytest
+from PIL import Image as PILImage
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models.image import EyeSide
+from app.models.image_blob import ImageBlob
+from app.services.image_service import ImageService
+from app.services.patient_service import PatientService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestBlobService:
+    @pytest.fixture
+    def image_service(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        return ImageService()
+
+    def png(self, color, filename="eye.jpg"):
+        content = io.BytesIO()
+        PILImage.new("RGB", (8, 8), color).save(content, "PNG")
+        content.seek(0)
+        return FileStorage(stream=content, filename=filename)
+
+    def upload(self, image_service, color, filename="eye.jpg", patient_id=1):
+        return image_service.create_image(
+            {'patient_id': patient_id, 'eye_side': EyeSide.LEFT}, self.png(color, filename)
+        )
+
+    def stored_files(self, tmp_path):
+        return sorted(
+            name for _, _, names in os.walk(tmp_path / "uploads" / "blobs")
+            for name in names
+        )
+
+    def test_duplicate_uploads_share_one_blob(self, image_service, tmp_path):
+        first = self.upload(image_service, "red")
+        second = self.upload(image_service, "red", filename="copy.jpg")
+        other = self.upload(image_service, "blue")
+
+        assert first.image_path == second.image_path != other.image_path
+        assert len(self.stored_files(tmp_path)) == 2
+        assert db.session.get(ImageBlob, first.image_path.split('/')[-1][:-4]).ref_count == 2
+
+    def test_same_content_with_other_extension_is_shared(self, image_service, tmp_path):
+        first = self.upload(image_service, "red", filename="eye.jpg")
+        second = self.upload(image_service, "red", filename="eye.jpeg")
+
+        assert second.image_path == first.image_path
+        assert len(self.stored_files(tmp_path)) == 1
+
+    def test_concurrent_upload_of_same_content_shares_blob(self, image_service, tmp_path, monkeypatch):
+        first = self.upload(image_service, "red")
+        # The update misses the blob, as if the other upload committed just after it
+        blob_service = image_service.blob_service
+        add_reference = blob_service._add_reference
+        misses = [True]
+        monkeypatch.setattr(
+            blob_service, '_add_reference',
+            lambda sha256: False if misses and misses.pop() else add_reference(sha256)
+        )
+
+        second = self.upload(image_service, "red", filename="copy.jpg")
+
+        assert second.image_path == first.image_path
+        assert ImageBlob.query.one().ref_count == 2
+
+    def test_batch_reference_conflicting_with_concurrent_insert(self, image_service, tmp_path, monkeypatch):
+        first = self.upload(image_service, "red")
+        stored = [image_service.blob_service.store_file(self.png(color), "eye.jpg") for color in ("red", "red", "blue")]
+        # The lookup misses the blob, as if the other upload committed just after it
+        blob_service = image_service.blob_service
+        blob_paths = blob_service._blob_paths
+        misses = [True]
+        monkeypatch.setattr(
+            blob_service, '_blob_paths',
+            lambda sha256s: {} if misses and misses.pop() else blob_paths(sha256s)
+        )
+
+        image_ids = image_service.create_images(
+            [({'patient_id': 1, 'eye_side': EyeSide.LEFT}, entry) for entry in stored], schedule_processing=False
+        )
+
+        assert len(image_ids) == 3
+        blobs = {blob.path: blob.ref_count for blob in ImageBlob.query.all()}
+        assert blobs == {first.image_path: 3, stored[2].path: 1}
+        assert len(self.stored_files(tmp_path)) == 2
+
+    def test_blob_removed_with_last_reference(self, image_service, tmp_path):
+        first = self.upload(image_service, "red")
+        second = self.upload(image_service, "red")
+        stored = tmp_path / "uploads" / first.image_path
+
+        image_service.delete_image(first.id)
+        assert stored.exists()
+        assert ImageBlob.query.one().ref_count == 1
+
+        image_service.delete_image(second.id)
+        assert not stored.exists()
+        assert ImageBlob.query.count() == 0
+
+    def test_file_deleted_before_sharing_upload_commits_is_restored(self, image_service, tmp_path):
+        first = self.upload(image_service, "red")
+        # Stored while the file exists, then its last image is deleted
+        stored = image_service.blob_service.store_file(self.png("red"), "copy.jpg")
+        image_service.delete_image(first.id)
+        assert not (tmp_path / "uploads" / first.image_path).exists()
+
+        image_service.create_images(
+            [({'patient_id': 1, 'eye_side': EyeSide.LEFT}, stored)], schedule_processing=False
+        )
+
+        assert (tmp_path / "uploads" / stored.path).exists()
+        assert self.stored_files(tmp_path) == [stored.path.split("/")[-1]]
+        assert ImageBlob.query.one().ref_count == 1
+
+    def test_delete_keeps_file_shared_by_upload_committed_after_check(self, image_service, tmp_path, monkeypatch):
+        first = self.upload(image_service, "red")
+        stored = image_service.blob_service.store_file(self.png("red"), "copy.jpg")
+        # The sharing upload commits after the deletion found no references
+        storage_service = image_service.blob_service.storage_service
+        delete_unless = storage_service.delete_unless
+
+        def commit_upload_first(image_path, is_referenced):
+            image_service.create_images(
+                [({'patient_id': 1, 'eye_side': EyeSide.LEFT}, stored)], schedule_processing=False
+            )
+            return delete_unless(image_path, is_referenced)
+
+        monkeypatch.setattr(storage_service, 'delete_unless', commit_upload_first)
+
+        image_service.delete_image(first.id)
+
+        assert (tmp_path / "uploads" / first.image_path).exists()
+        assert self.stored_files(tmp_path) == [first.image_path.split("/")[-1]]
+        assert ImageBlob.query.one().ref_count == 1
+
+    def test_delete_patient_releases_blobs(self, image_service, tmp_path):
+        image = self.upload(image_service, "red", patient_id=3)
+        kept = self.upload(image_service, "red", patient_id=2)
+
+        PatientService().delete_patient(3)
+
+        assert (tmp_path / "uploads" / kept.image_path).exists()
+        assert ImageBlob.query.one().ref_count == 1
+
+        PatientService().delete_patient(2)
+        assert not (tmp_path / "uploads" / image.image_path).exists()
+
+    def test_upload_records_file_details(self, app, image_service, tmp_path):
+        content = io.BytesIO()
+        PILImage.new("L", (40, 30)).save(content, "PNG")
+        size = content.tell()
+        content.seek(0)
+
+        # Parsed by UploadRequest, so hashed while the body is written to disk
+        with app.test_request_context(
+            method="POST", data={"image_file": (content, "eye.png")}, content_type="multipart/form-data"
+        ):
+            from flask import request
+            image = image_service.create_image(
+                {'patient_id': 1, 'eye_side': EyeSide.LEFT}, request.files["image_file"]
+            )
+
+        assert (image.file_size, image.width, image.height) == (size, 40, 30)
+        assert (image.color_mode, image.image_format) == ("L", "PNG")
+        assert self.stored_files(tmp_path) == [image.image_path.split("/")[-1]]
+
+    def test_upload_rejects_non_images(self, image_service, tmp_path):
+        with pytest.raises(ValueError, match="not a supported image"):
+            image_service.create_image(
+                {'patient_id': 1, 'eye_side': EyeSide.LEFT},
+                FileStorage(stream=io.BytesIO(b"not an image"), filename="eye.jpg")
+            )
+
+        assert ImageBlob.query.count() == 0
+        assert self.stored_files(tmp_path) == []
+
+    def test_upload_rejects_files_over_max_content_length(self, app, image_service):
+        app.config['MAX_CONTENT_LENGTH'] = 10
+
+        with pytest.raises(ValueError, match="10 byte limit"):
+            self.upload(image_service, "red")
+
+    def test_backfill_file_details(self, image_service, tmp_path):
+        image = self.upload(image_service, "red")
+        image.width = None
+        db.session.commit()
+        modified_at = image.modified_at
+
+        # The sample images from the fixture have no files on disk
+        assert image_service.backfill_file_details() == (1, 2)
+
+        db.session.refresh(image)
+        assert (image.width, image.height, image.image_format) == (8, 8, "PNG")
+        assert image.modified_at == modified_at
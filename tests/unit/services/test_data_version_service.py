@@ -0,0 +1,83 @@
+import pytest
+from datetime import date
+from sqlalchemy import update
+from app import db
+from app.models.data_version import DataVersion
+from app.models.patient import Sex
+from app.services.data_version_service import DataVersionService
+from app.services.patient_service import PatientService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestDataVersionService:
+    @pytest.fixture
+    def data_version_service(self):
+        return DataVersionService()
+
+    def test_version_is_seeded(self, data_version_service):
+        assert DataVersion.query.count() == 1
+        assert data_version_service.get_version() > 0
+
+    def test_bump_is_visible_after_commit(self, data_version_service):
+        version = data_version_service.get_version(max_staleness=60)
+
+        data_version_service.bump()
+        db.session.commit()
+
+        assert data_version_service.get_version(max_staleness=60) == version + 1
+
+    def test_rollback_discards_bump(self, data_version_service):
+        version = data_version_service.get_version()
+
+        data_version_service.bump()
+        db.session.rollback()
+
+        assert data_version_service.get_version() == version
+
+    def test_service_writes_bump_version(self, data_version_service):
+        version = data_version_service.get_version(max_staleness=60)
+
+        patient = PatientService().create_patient({'birth_date': date(2000, 1, 1), 'sex': Sex.FEMALE})
+        assert data_version_service.get_version(max_staleness=60) == version + 1
+
+        PatientService().delete_patient(patient.id)
+        assert data_version_service.get_version(max_staleness=60) == version + 2
+
+    def test_read_overtaken_by_own_commit_is_not_memoized(self, data_version_service, monkeypatch):
+        version = data_version_service.get_version()
+        read_version = data_version_service._read_version
+
+        def read_then_commit():
+            # The read returns, then a commit in this process lands before it is stored
+            fetched = read_version()
+            data_version_service.bump()
+            db.session.commit()
+            return fetched
+
+        monkeypatch.setattr(data_version_service, '_read_version', read_then_commit)
+        assert data_version_service.get_version() == version
+        monkeypatch.undo()
+
+        assert data_version_service.get_version(max_staleness=60) == version + 1
+
+    def test_max_staleness_bounds_external_writes(self, data_version_service):
+        version = data_version_service.get_version(max_staleness=60)
+
+        # Simulate a write committed by another worker process
+        db.session.execute(update(DataVersion).values(version=DataVersion.version + 5))
+        db.session.commit()
+
+        assert data_version_service.get_version(max_staleness=60) == version
+        assert data_version_service.get_version(max_staleness=0) == version + 5
+
+    def test_commit_listeners_run_after_bumping_commits(self, app, data_version_service):
+        calls = []
+        data_version_service.add_commit_listener(calls.append)
+        data_version_service.add_commit_listener(calls.append)
+
+        db.session.commit()
+        assert calls == []
+
+        data_version_service.bump()
+        db.session.commit()
+        assert calls == [app]
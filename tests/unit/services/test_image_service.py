@@ -1,15 +1,27 @@
+import io
 import pytest
 import os
 from datetime import datetime, timezone
-from app.models.image import Image, EyeSide, ImageQualityScore, AnatomyScore
-from app.services.image_service import ImageService
+import numpy as np
+from PIL import Image as PILImage
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models.image import AnalysisStatus, Image, EyeSide, ImageQualityScore, AnatomyScore
+from app.models.patient_site_readiness import PatientSiteReadiness
+from app.services.image_service import ImageService, is_over_illuminated
 
 
 @pytest.mark.usefixtures('app_context')
 class TestImageService:
     @pytest.fixture
-    def image_service(self):
-        return ImageService()
+    def image_service(self, mock_readiness_service, mock_data_version_service, mock_rollup_service,
+                      mock_blob_service):
+        service = ImageService()
+        service.readiness_service = mock_readiness_service
+        service.rollup_service = mock_rollup_service
+        service.data_version_service = mock_data_version_service
+        service.blob_service = mock_blob_service
+        return service
     
     @pytest.fixture
     def db_session(self, monkeypatch):
@@ -60,14 +72,6 @@ class TestImageService:
         upload_folder = tmp_path / "uploads"
         upload_folder.mkdir()
         
-        # Create a test static folder
-        static_folder_path = tmp_path / "static"
-        static_folder_path.mkdir()
-        
-        # Make sure the static/uploads/images directory exists
-        static_uploads = static_folder_path / "uploads" / "images"
-        static_uploads.mkdir(parents=True, exist_ok=True)
-        
         # Mock the current_app.config
         class MockConfig:
             def __getitem__(self, key):
@@ -77,9 +81,8 @@ class TestImageService:
         
         class MockApp:
             config = MockConfig()
-            static_folder = str(static_folder_path)  # Add the static_folder attribute
         
-        monkeypatch.setattr('app.services.image_service.current_app', MockApp())
+        monkeypatch.setattr('app.services.storage_service.current_app', MockApp())
         
         # Mock the is_over_illuminated function since we can't test with real images
         monkeypatch.setattr('app.services.image_service.is_over_illuminated', lambda path, threshold=0.9: False)
@@ -147,7 +150,7 @@ class TestImageService:
         image = image_service.get_image_by_id(999)
         assert image is None
     
-    def test_create_image_without_file(self, image_service, db_session, monkeypatch):
+    def test_create_image_without_file(self, image_service, db_session, mock_data_version_service, monkeypatch):
         # Mock data
         image_data = {
             'patient_id': 1,
@@ -184,8 +187,9 @@ class TestImageService:
         # Check if session methods were called
         assert len(db_session.added) == 1
         assert db_session.committed is True
+        assert mock_data_version_service.version == 1
     
-    def test_create_image_with_file(self, image_service, db_session, mock_image_file, monkeypatch):
+    def test_create_image_with_file(self, image_service, db_session, mock_image_file, mock_blob_service, monkeypatch):
         # Mock data
         image_data = {
             'patient_id': 1,
@@ -226,12 +230,11 @@ class TestImageService:
         assert image.eye_side == EyeSide.LEFT
         assert image.quality_score == ImageQualityScore.HIGH
         
-        # Check if file was saved
-        assert mock_image_file.saved_path is not None
-        assert "20250301120000_test_image.jpg" in mock_image_file.saved_path
+        # Check if file was stored
+        assert mock_blob_service.stored == [(mock_image_file, "blobs/test_image.jpg")]
         
         # Check if image path was set correctly
-        assert image.image_path == "20250301120000_test_image.jpg"
+        assert image.image_path == "blobs/test_image.jpg"
         
         # Check if over_illuminated was set correctly
         assert image.over_illuminated is False  # Since we mocked is_over_illuminated to return False
@@ -240,7 +243,7 @@ class TestImageService:
         assert len(db_session.added) == 1
         assert db_session.committed is True
     
-    def test_update_image(self, image_service, db_session, monkeypatch):
+    def test_update_image(self, image_service, db_session, mock_readiness_service, monkeypatch):
         # Mock data
         mock_image = Image(
             id=1, 
@@ -279,6 +282,9 @@ class TestImageService:
         assert updated_image.over_illuminated is True
         assert db_session.committed is True
         
+        # Readiness is refreshed for the new site and the site it moved from
+        assert mock_readiness_service.refreshed == [(1, 2), (1, None)]
+        
         # Test updating non-existent image
         with pytest.raises(ValueError, match="Image with ID 999 not found"):
             image_service.update_image(999, update_data)
@@ -311,14 +317,7 @@ class TestImageService:
         with pytest.raises(ValueError, match="Image with ID 999 not found"):
             image_service.delete_image(999)
     
-    def test_delete_image_with_file(self, image_service, db_session, monkeypatch, tmp_path):
-        # Create a test file
-        upload_folder = tmp_path / "uploads"
-        upload_folder.mkdir()
-        test_file_path = upload_folder / "test_image.jpg"
-        with open(test_file_path, 'w') as f:
-            f.write("test")
-        
+    def test_delete_image_with_file(self, image_service, db_session, mock_blob_service, monkeypatch):
         # Mock data
         mock_image = Image(
             id=1, 
@@ -334,19 +333,6 @@ class TestImageService:
             lambda id: mock_image if id == 1 else None
         )
         
-        # Mock the current_app.config
-        class MockConfig:
-            def __getitem__(self, key):
-                if key == 'UPLOAD_FOLDER':
-                    return str(upload_folder)
-                return None
-        
-        class MockApp:
-            config = MockConfig()
-            static_folder = 
-        
-        monkeypatch.setattr('app.services.image_service.current_app', MockApp())
-        
         # Test
         result = image_service.delete_image(1)
         
@@ -355,5 +341,154 @@ class TestImageService:
         assert len(db_session.deleted) == 1
         assert db_session.committed is True
         
-        # Check if file was deleted
-        assert not os.path.exists(test_file_path)
\ No newline at end of file
+        # Check if the file reference was released and the file removed after commit
+        assert mock_blob_service.released == ["test_image.jpg"]
+        assert mock_blob_service.removed == ["test_image.jpg"]
+
+class TestIsOverIlluminated:
+    def original(self, path, threshold=0.9):
+        img_array = np.array(PILImage.open(path)).astype(np.float64)
+        luminance = (
+            0.2126 * img_array[:, :, 0] + 0.7152 * img_array[:, :, 1] + 0.0722 * img_array[:, :, 2]
+        ) / 255.0
+        return bool(np.any(luminance > threshold))
+
+    def save(self, tmp_path, array, mode=None, name="eye.png"):
+        path = tmp_path / name
+        PILImage.fromarray(array, mode).save(path)
+        return str(path)
+
+    def test_matches_original_on_colour_images(self, tmp_path):
+        rng = np.random.default_rng(7)
+        for seed in range(5):
+            array = rng.integers(0, 256, size=(300, 200, 3), dtype=np.uint8)
+            # Keep most images below the brightest luminance so both answers occur
+            array = (array * rng.uniform(0.6, 1.0)).astype(np.uint8)
+            path = self.save(tmp_path, array, name=f"eye{seed}.png")
+            for threshold in (0.5, 0.8, 0.9, 0.95):
+                assert is_over_illuminated(path, threshold) == self.original(path, threshold)
+
+    def test_single_bright_pixel_in_last_strip(self, tmp_path):
+        array = np.full((1000, 300, 3), 40, dtype=np.uint8)
+        array[-1, -1] = (250, 250, 250)
+
+        assert is_over_illuminated(self.save(tmp_path, array)) is True
+        array[-1, -1] = (255, 0, 0)  # Pure red is dark in luminance
+        assert is_over_illuminated(self.save(tmp_path, array)) is False
+
+    def test_grayscale_and_sixteen_bit_images(self, tmp_path):
+        gray = np.full((50, 50), 200, dtype=np.uint8)
+        assert is_over_illuminated(self.save(tmp_path, gray)) is False
+        gray[10, 10] = 240
+        assert is_over_illuminated(self.save(tmp_path, gray)) is True
+        assert is_over_illuminated(self.save(tmp_path, np.dstack([gray, gray]), "LA")) is True
+
+        deep = np.full((50, 50), 58000, dtype=np.uint16)
+        assert is_over_illuminated(self.save(tmp_path, deep, "I;16")) is False
+        deep[0, 0] = 60000
+        assert is_over_illuminated(self.save(tmp_path, deep, "I;16")) is True
+
+    def test_alpha_and_palette_images(self, tmp_path):
+        rgba = np.zeros((50, 50, 4), dtype=np.uint8)
+        rgba[..., 3] = 255
+        assert is_over_illuminated(self.save(tmp_path, rgba, "RGBA")) is False
+        rgba[5, 5, :3] = 255
+        assert is_over_illuminated(self.save(tmp_path, rgba, "RGBA")) is True
+
+        palette = PILImage.fromarray(rgba[..., :3]).convert("P")
+        palette.save(tmp_path / "palette.png")
+        assert is_over_illuminated(str(tmp_path / "palette.png")) is True
+
+    def test_downsampling_can_only_miss_small_spots(self, tmp_path):
+        array = np.full((2000, 2000, 3), 60, dtype=np.uint8)
+        array[1000, 1000] = 255
+        path = self.save(tmp_path, array)
+
+        assert is_over_illuminated(path) is True
+        assert is_over_illuminated(path, max_edge=500) is False
+
+        array[:100, :100] = 255
+        path = self.save(tmp_path, array)
+        assert is_over_illuminated(path, max_edge=500) is True
+
+
+@pytest.mark.usefixtures('app_context')
+class TestImageAnalysis:
+    @pytest.fixture
+    def image_service(self, app, tmp_path, monkeypatch):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        app.config['IMAGE_ANALYSIS_AT_UPLOAD'] = True
+        service = ImageService()
+        service.scheduled = []
+        monkeypatch.setattr(service, 'schedule_analysis', service.scheduled.append)
+        return service
+
+    def upload(self, image_service, brightness, **image_data):
+        content = io.BytesIO()
+        PILImage.new("RGB", (32, 32), (brightness,) * 3).save(content, "PNG")
+        content.seek(0)
+        return image_service.create_image(
+            {'patient_id': 1, 'eye_side': EyeSide.LEFT, **image_data},
+            FileStorage(stream=content, filename="eye.png")
+        )
+
+    def test_upload_is_pending_until_analyzed(self, image_service):
+        image = self.upload(image_service, 250)
+
+        assert image.analysis_status == AnalysisStatus.PENDING
+        assert image.over_illuminated is None
+        assert image_service.scheduled == [image.id]
+
+        assert image_service.analyze_image(image.id) is True
+
+        image = db.session.get(Image, image.id)
+        assert image.analysis_status == AnalysisStatus.COMPLETE
+        assert image.over_illuminated is True
+        # Analyzing again is a no-op once the result is recorded
+        assert image_service.analyze_image(image.id) is None
+
+    def test_pending_image_is_not_ready_until_analyzed(self, image_service):
+        # Patient 1 has a good left image at site 1 and an over-illuminated right one
+        image = self.upload(
+            image_service, 20, eye_side=EyeSide.RIGHT, site_id=1,
+            quality_score=ImageQualityScore.HIGH, anatomy_score=AnatomyScore.GOOD
+        )
+
+        readiness = db.session.get(PatientSiteReadiness, (1, 1))
+        assert (readiness.has_good_left, readiness.has_good_right) == (True, False)
+
+        assert image_service.analyze_image(image.id) is False
+
+        db.session.refresh(readiness)
+        assert (readiness.has_good_left, readiness.has_good_right) == (True, True)
+
+    def test_upload_with_flag_is_not_analyzed(self, image_service):
+        image = self.upload(image_service, 250, over_illuminated=False)
+
+        assert image.analysis_status is None
+        assert image_service.scheduled == []
+
+    def test_flag_set_by_hand_wins_over_pending_analysis(self, image_service):
+        image = self.upload(image_service, 250)
+        image_service.update_image(image.id, {'over_illuminated': False})
+
+        assert image_service.analyze_image(image.id) is None
+        image = db.session.get(Image, image.id)
+        assert image.analysis_status is None
+        assert image.over_illuminated is False
+
+    def test_unreadable_file_fails_analysis(self, image_service, tmp_path):
+        image = self.upload(image_service, 100)
+        os.remove(tmp_path / "uploads" / image.image_path)
+
+        assert image_service.analyze_image(image.id) is None
+        assert db.session.get(Image, image.id).analysis_status == AnalysisStatus.FAILED
+
+    def test_analyze_pending(self, image_service):
+        bright = self.upload(image_service, 250)
+        dark = self.upload(image_service, 20)
+
+        assert image_service.analyze_pending() == (2, 0)
+        assert db.session.get(Image, bright.id).over_illuminated is True
+        assert db.session.get(Image, dark.id).over_illuminated is False
+        assert image_service.analyze_pending() == (0, 0)
@@ -0,0 +1,104 @@
+import pytest
+from app import db
+from app.models.image import EyeSide, ImageQualityScore, AnatomyScore
+from app.models.site import Site
+from app.services.image_service import ImageService
+from app.services.image_snapshot_service import ImageSnapshotService
+from app.services.readiness_service import ReadinessService
+from app.services.statistics_service import StatisticsService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestImageSnapshotService:
+    @pytest.fixture
+    def snapshot_service(self):
+        return ImageSnapshotService()
+
+    @pytest.fixture
+    def image_service(self):
+        return ImageService()
+
+    @pytest.fixture
+    def sample_images(self, image_service):
+        """
+        Patient 2 at site 1 has a LOW quality right eye, patient 3 at site 2 an
+        over-illuminated right eye. The conftest images add patient 1 at site 1.
+        """
+        db.session.add_all([Site(id=1, name="Main Clinic"), Site(id=2, name="Eye Center")])
+        db.session.commit()
+
+        images = []
+        for patient_id, site_id, eye_side, overrides in [
+            (2, 1, EyeSide.LEFT, {}),
+            (2, 1, EyeSide.RIGHT, {'quality_score': ImageQualityScore.LOW}),
+            (3, 2, EyeSide.LEFT, {}),
+            (3, 2, EyeSide.RIGHT, {'over_illuminated': True}),
+        ]:
+            image_data = {
+                'patient_id': patient_id,
+                'site_id': site_id,
+                'eye_side': eye_side,
+                'quality_score': ImageQualityScore.HIGH,
+                'anatomy_score': AnatomyScore.GOOD,
+                'over_illuminated': False,
+                'image_path': f"{patient_id}_{eye_side.value}.jpg",
+            }
+            image_data.update(overrides)
+            images.append(image_service.create_image(image_data))
+
+        ReadinessService().backfill()
+        return images
+
+    def available(self, readiness):
+        return {site['id']: site['available_for_ai'] for site in readiness['site_stats']}
+
+    def test_default_criteria_match_statistics(self, snapshot_service, sample_images):
+        readiness = snapshot_service.evaluate_readiness()
+
+        assert readiness['image_count'] == 6
+        assert readiness['site_stats'] == StatisticsService().get_sites_statistics()
+        assert readiness['global_stats'] == StatisticsService().get_global_statistics()
+
+    def test_what_if_criteria(self, snapshot_service, sample_images):
+        low_quality_ok = snapshot_service.evaluate_readiness(
+            quality=list(ImageQualityScore)
+        )
+        assert self.available(low_quality_ok) == {1: 1, 2: 0}
+
+        illumination_ignored = snapshot_service.evaluate_readiness(ignore_illumination=True)
+        assert self.available(illumination_ignored) == {1: 1, 2: 1}
+        assert illumination_ignored['global_stats']['available_patients'] == 2
+
+        strict = snapshot_service.evaluate_readiness(
+            quality=[ImageQualityScore.HIGH],
+            anatomy=[AnatomyScore.GOOD],
+            ignore_illumination=True
+        )
+        assert self.available(strict) == {1: 0, 2: 1}
+
+    def test_incremental_refresh(self, snapshot_service, image_service, sample_images):
+        assert self.available(snapshot_service.evaluate_readiness()) == {1: 0, 2: 0}
+
+        # Update: the LOW right eye is re-graded
+        image_service.update_image(sample_images[1].id, {'quality_score': ImageQualityScore.ACCEPTABLE})
+        assert self.available(snapshot_service.evaluate_readiness()) == {1: 1, 2: 0}
+
+        # Insert: a usable right eye for patient 3
+        image_service.create_image({
+            'patient_id': 3,
+            'site_id': 2,
+            'eye_side': EyeSide.RIGHT,
+            'quality_score': ImageQualityScore.ACCEPTABLE,
+            'anatomy_score': AnatomyScore.ACCEPTABLE,
+            'image_path': "3_RIGHT_retake.jpg",
+        })
+        readiness = snapshot_service.evaluate_readiness()
+        assert readiness['image_count'] == 7
+        assert self.available(readiness) == {1: 1, 2: 1}
+
+        # Delete: patient 2 loses the left eye
+        image_service.delete_image(sample_images[0].id)
+        readiness = snapshot_service.evaluate_readiness()
+        assert readiness['image_count'] == 6
+        assert self.available(readiness) == {1: 0, 2: 1}
+        assert readiness['site_stats'] == StatisticsService().get_sites_statistics()
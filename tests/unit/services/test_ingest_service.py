@@ -0,0 +1,184 @@
+import os
+
+import pytest
+from PIL import Image as PILImage
+from app import db
+from app.models.image import AnalysisStatus, EyeSide, Image
+from app.models.image_blob import ImageBlob
+from app.models.image_daily_rollup import ImageDailyRollup
+from app.models.patient_site_readiness import PatientSiteReadiness
+from app.services.background_service import BackgroundService
+from app.services.import_manifest import ImportManifest
+from app.services.ingest_service import IngestService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestIngestService:
+    @pytest.fixture
+    def ingest_service(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        return IngestService()
+
+    @pytest.fixture
+    def files(self, tmp_path):
+        source = tmp_path / "source"
+        source.mkdir()
+        paths = []
+        for name, color in (("a.png", "red"), ("b.png", "blue"), ("c.jpg", "red")):
+            PILImage.new("RGB", (8, 8), color).save(source / name, "PNG")
+            paths.append(str(source / name))
+        return paths
+
+    def entries(self, paths, patient_id=2):
+        for index, path in enumerate(paths):
+            image_data = {'patient_id': patient_id, 'eye_side': EyeSide.LEFT, 'site_id': 1, 'over_illuminated': False}
+            yield f"entry:{index}", image_data, path
+
+    def test_imports_in_batches(self, ingest_service, files):
+        progress = []
+
+        summary = ingest_service.ingest(
+            self.entries(files * 3), workers=2, batch_size=4, max_pending=2, progress=progress.append
+        )
+
+        assert (summary['imported'], summary['failed']) == (9, 0)
+        assert [entry['imported'] for entry in progress] == [4, 8, 9]
+        images = Image.query.filter_by(patient_id=2).all()
+        assert len(images) == 9
+        assert all(image.width == 8 and image.file_size for image in images)
+
+        # Same content under another extension shares the first file
+        blobs = {blob.path: blob.ref_count for blob in ImageBlob.query.all()}
+        assert sorted(blobs.values()) == [3, 6]
+        assert {image.image_path for image in images} == set(blobs)
+        assert db.session.get(PatientSiteReadiness, (2, 1)) is not None
+        assert db.session.query(db.func.sum(ImageDailyRollup.image_count)).scalar() == 9
+
+    def test_derived_work_is_not_queued(self, app, ingest_service, files, monkeypatch):
+        app.config.update(IMAGE_ANALYSIS_AT_UPLOAD=True, IMAGE_TILE_GENERATION=True, IMAGE_VARIANT_GENERATION=True)
+        queued = []
+        monkeypatch.setattr(BackgroundService, 'submit', lambda self, key, *args: queued.append(key))
+        entries = [
+            (key, {**image_data, 'over_illuminated': None}, path)
+            for key, image_data, path in self.entries(files)
+        ]
+
+        summary = ingest_service.ingest(entries)
+
+        assert summary['imported'] == 3
+        assert queued == []
+        # Left pending for analyze-pending
+        assert Image.query.filter_by(patient_id=2, analysis_status=AnalysisStatus.PENDING).count() == 3
+
+    def test_in_place_registration(self, app, ingest_service, files, tmp_path):
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(tmp_path / "source")}
+        app.config.update(IMAGE_TILE_GENERATION=True, IMAGE_VARIANT_GENERATION=True)
+
+        summary = ingest_service.ingest(self.entries(files * 2), in_place=True)
+
+        assert (summary['imported'], summary['failed']) == (6, 0)
+        images = Image.query.filter_by(patient_id=2).all()
+        assert {image.image_path for image in images} == {
+            "external/archive/a.png", "external/archive/b.png", "external/archive/c.jpg"
+        }
+        assert all(image.width == 8 and image.file_size for image in images)
+        assert ImageBlob.query.count() == 0
+        # Only headers are read: nothing is copied or derived into UPLOAD_FOLDER
+        assert not os.path.exists(tmp_path / "uploads" / "blobs")
+        assert not os.path.exists(tmp_path / "uploads" / "thumbnails")
+        assert not os.path.exists(tmp_path / "uploads" / "tiles")
+
+        # Files outside every external root are rejected, not copied
+        summary = ingest_service.ingest(self.entries([str(tmp_path / "uploads.png")]), in_place=True)
+        assert summary['failed'] == 1
+
+    def test_unreadable_files_are_counted(self, ingest_service, files, tmp_path):
+        broken = tmp_path / "source" / "broken.jpg"
+        broken.write_bytes(b"not an image")
+
+        summary = ingest_service.ingest(self.entries([files[0], str(broken), str(tmp_path / "missing.png")]))
+
+        assert (summary['imported'], summary['failed']) == (1, 2)
+        assert Image.query.filter_by(patient_id=2).count() == 1
+
+    def test_failed_batch_is_rolled_back(self, ingest_service, files, tmp_path, monkeypatch):
+        kept = ingest_service.ingest(self.entries(files[:1]))
+        assert kept['imported'] == 1
+
+        def fail(entries, schedule_processing=True):
+            db.session.add(Image(patient_id=2, eye_side=EyeSide.LEFT))
+            raise RuntimeError("database is locked")
+        monkeypatch.setattr(ingest_service.image_service, 'create_images', fail)
+
+        summary = ingest_service.ingest(self.entries(files), batch_size=2)
+
+        assert (summary['imported'], summary['failed']) == (0, 3)
+        assert Image.query.filter_by(patient_id=2).count() == 1
+        # Only the file of the image imported before is left
+        stored = [name for _, _, names in os.walk(tmp_path / "uploads" / "blobs") for name in names]
+        assert stored == [Image.query.filter_by(patient_id=2).one().image_path.split("/")[-1]]
+
+    def test_input_is_read_lazily(self, ingest_service, files):
+        read = []
+
+        def entries():
+            for entry in self.entries(files * 4):
+                read.append(entry)
+                yield entry
+
+        consumed = []
+        ingest_service.ingest(entries(), workers=1, batch_size=2, max_pending=1,
+                              progress=lambda summary: consumed.append(len(read)))
+
+        # One file in flight and one batch buffered at most
+        assert consumed[0] <= 3
+
+    def test_manifest_skips_imported_entries(self, ingest_service, files, tmp_path):
+        manifest = ImportManifest(str(tmp_path / "manifest.sqlite"))
+        manifest.record([("entry:1", 99)])
+
+        summary = ingest_service.ingest(self.entries(files), batch_size=2, manifest=manifest)
+
+        assert (summary['imported'], summary['skipped'], summary['failed']) == (2, 1, 0)
+        assert manifest.done_count() == 3
+        assert manifest.is_done("entry:0") and manifest.is_done("entry:2")
+
+        # Running again imports nothing
+        summary = ingest_service.ingest(self.entries(files), manifest=manifest)
+        assert (summary['imported'], summary['skipped']) == (0, 3)
+        assert Image.query.filter_by(patient_id=2).count() == 2
+
+    def test_failed_entries_are_not_recorded(self, ingest_service, files, tmp_path):
+        manifest = ImportManifest(str(tmp_path / "manifest.sqlite"))
+
+        ingest_service.ingest(self.entries([files[0], str(tmp_path / "missing.png")]), manifest=manifest)
+
+        assert manifest.is_done("entry:0")
+        assert not manifest.is_done("entry:1")
+
+
+class TestImportManifest:
+    def test_checkpoints_persist(self, tmp_path):
+        path = str(tmp_path / "state" / "manifest.sqlite")
+        manifest = ImportManifest(path)
+        manifest.set_checkpoint("csv:patients", 1000)
+        manifest.record([("a", 1), ("b", 2)])
+        manifest.close()
+
+        manifest = ImportManifest(path)
+        assert manifest.get_checkpoint("csv:patients") == 1000
+        assert manifest.get_checkpoint("missing", []) == []
+        assert manifest.done_count() == 2
+
+        manifest.clear()
+        assert manifest.done_count() == 0
+        assert manifest.get_checkpoint("csv:patients") is None
+
+    def test_file_key_changes_with_the_file(self, tmp_path):
+        source = tmp_path / "eye.jpg"
+        source.write_bytes(b"one")
+        key = ImportManifest.file_key(str(source))
+
+        assert key == ImportManifest.file_key(str(source))
+        source.write_bytes(b"other")
+        assert key != ImportManifest.file_key(str(source))
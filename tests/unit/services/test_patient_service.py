@@ -1,5 +1,6 @@
 import pytest
 from datetime import date
+from app import db
 from app.models.patient import Patient, Sex
 from app.services.patient_service import PatientService
 
@@ -7,8 +8,14 @@ from app.services.patient_service import PatientService
 @pytest.mark.usefixtures('app_context')
 class TestPatientService:
     @pytest.fixture
-    def patient_service(self):
-        return PatientService()
+    def patient_service(self, mock_readiness_service, mock_data_version_service, mock_rollup_service,
+                        mock_blob_service):
+        service = PatientService()
+        service.readiness_service = mock_readiness_service
+        service.rollup_service = mock_rollup_service
+        service.data_version_service = mock_data_version_service
+        service.blob_service = mock_blob_service
+        return service
     
     @pytest.fixture
     def db_session(self, monkeypatch):
@@ -151,7 +158,7 @@ class TestPatientService:
         with pytest.raises(ValueError, match="Patient with ID None not found"):
             patient_service.update_patient(999, update_data)
     
-    def test_delete_patient(self, patient_service, db_session, monkeypatch):
+    def test_delete_patient(self, patient_service, db_session, mock_readiness_service, monkeypatch):
         # Mock data
         mock_patient = Patient(id=1, birth_date=date(1990, 1, 15), sex=Sex.MALE)
         
@@ -169,7 +176,40 @@ class TestPatientService:
         assert result is True
         assert len(db_session.deleted) == 1
         assert db_session.committed is True
+        assert mock_readiness_service.removed_patients == [1]
         
         # Test deleting non-existent patient
         with pytest.raises(ValueError, match="Patient with ID 999 not found"):
-            patient_service.delete_patient(999)
\ No newline at end of file
+            patient_service.delete_patient(999)
+    def test_upsert_patients(self, patient_service, mock_data_version_service):
+        created, updated = patient_service.upsert_patients([
+            {'id': 1, 'birth_date': date(1991, 2, 3), 'sex': Sex.OTHER},
+            {'id': 10, 'birth_date': date(2000, 1, 1), 'sex': Sex.MALE},
+            {'id': 10, 'birth_date': date(2001, 1, 1), 'sex': Sex.FEMALE},
+        ])
+
+        assert (created, updated) == (1, 1)
+        assert mock_data_version_service.version == 1
+        db.session.expire_all()
+        assert db.session.get(Patient, 1).birth_date == date(1991, 2, 3)
+        assert db.session.get(Patient, 1).sex == Sex.OTHER
+        # The last entry for an ID wins
+        assert db.session.get(Patient, 10).birth_date == date(2001, 1, 1)
+        assert db.session.get(Patient, 10).created_at is not None
+
+        assert patient_service.upsert_patients([]) == (0, 0)
+
+    def test_upsert_patients_each_skips_failing_patients(self, patient_service, mock_data_version_service):
+        created, updated, failed = patient_service.upsert_patients_each([
+            {'id': 1, 'birth_date': date(1991, 2, 3), 'sex': Sex.OTHER},
+            {'id': 10, 'birth_date': None, 'sex': Sex.MALE},
+            {'id': 11, 'birth_date': date(2000, 1, 1), 'sex': Sex.FEMALE},
+        ])
+
+        assert (created, updated) == (1, 1)
+        assert [patient['id'] for patient, _ in failed] == [10]
+        assert mock_data_version_service.version == 1
+        db.session.expire_all()
+        assert db.session.get(Patient, 1).birth_date == date(1991, 2, 3)
+        assert db.session.get(Patient, 10) is None
+        assert db.session.get(Patient, 11) is not None
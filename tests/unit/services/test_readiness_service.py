@@ -0,0 +1,116 @@
+import pytest
+from app import db
+from app.models.image import EyeSide, ImageQualityScore, AnatomyScore
+from app.models.patient_site_readiness import PatientSiteReadiness
+from app.models.site import Site
+from app.services.image_service import ImageService
+from app.services.patient_service import PatientService
+from app.services.readiness_service import ReadinessService
+from app.services.site_service import SiteService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestReadinessService:
+    @pytest.fixture
+    def readiness_service(self):
+        return ReadinessService()
+
+    @pytest.fixture
+    def image_service(self):
+        return ImageService()
+
+    @pytest.fixture
+    def sites(self):
+        sites = [Site(id=1, name="Main Clinic"), Site(id=2, name="Eye Center")]
+        db.session.add_all(sites)
+        db.session.commit()
+        return sites
+
+    def good_image(self, patient_id, site_id, eye_side, **kwargs):
+        image_data = {
+            'patient_id': patient_id,
+            'site_id': site_id,
+            'eye_side': eye_side,
+            'quality_score': ImageQualityScore.HIGH,
+            'anatomy_score': AnatomyScore.GOOD,
+            'over_illuminated': False,
+            'image_path': f"{patient_id}_{site_id}_{eye_side.value}.jpg",
+        }
+        image_data.update(kwargs)
+        return image_data
+
+    def readiness(self, patient_id, site_id):
+        return db.session.get(PatientSiteReadiness, (patient_id, site_id))
+
+    def test_create_image_updates_readiness(self, image_service, sites):
+        image_service.create_image(self.good_image(2, 1, EyeSide.LEFT))
+
+        row = self.readiness(2, 1)
+        assert row.has_good_left is True
+        assert row.has_good_right is False
+        assert row.is_available is False
+
+        image_service.create_image(self.good_image(2, 1, EyeSide.RIGHT))
+
+        assert self.readiness(2, 1).is_available is True
+
+    def test_create_image_without_site(self, image_service, sites):
+        image_service.create_image(self.good_image(2, None, EyeSide.LEFT))
+
+        assert PatientSiteReadiness.query.count() == 0
+
+    def test_update_image_moves_readiness(self, image_service, sites):
+        left = image_service.create_image(self.good_image(2, 1, EyeSide.LEFT))
+        image_service.create_image(self.good_image(2, 1, EyeSide.RIGHT))
+
+        image_service.update_image(left.id, {'quality_score': ImageQualityScore.LOW})
+        assert self.readiness(2, 1).is_available is False
+
+        image_service.update_image(left.id, {'quality_score': ImageQualityScore.HIGH, 'site_id': 2})
+        assert self.readiness(2, 1).has_good_left is False
+        assert self.readiness(2, 1).has_good_right is True
+        assert self.readiness(2, 2).has_good_left is True
+
+    def test_delete_image_removes_empty_pair(self, image_service, sites):
+        left = image_service.create_image(self.good_image(2, 1, EyeSide.LEFT))
+        right = image_service.create_image(self.good_image(2, 1, EyeSide.RIGHT))
+
+        image_service.delete_image(right.id)
+        assert self.readiness(2, 1).has_good_right is False
+
+        image_service.delete_image(left.id)
+        assert self.readiness(2, 1) is None
+
+    def test_delete_patient_and_site(self, image_service, sites):
+        image_service.create_image(self.good_image(2, 1, EyeSide.LEFT))
+        image_service.create_image(self.good_image(3, 1, EyeSide.LEFT))
+        image_service.create_image(self.good_image(3, 2, EyeSide.LEFT))
+
+        PatientService().delete_patient(2)
+        assert self.readiness(2, 1) is None
+        assert self.readiness(3, 1) is not None
+
+        SiteService().delete_site(1)
+        assert self.readiness(3, 1) is None
+        assert self.readiness(3, 2) is not None
+
+    def test_backfill_matches_incremental_maintenance(self, readiness_service, image_service, sites):
+        image_service.create_image(self.good_image(2, 1, EyeSide.LEFT))
+        image_service.create_image(self.good_image(2, 1, EyeSide.RIGHT, over_illuminated=True))
+        image_service.create_image(self.good_image(3, 2, EyeSide.LEFT))
+        image_service.create_image(self.good_image(3, 2, EyeSide.RIGHT, anatomy_score=AnatomyScore.ACCEPTABLE))
+
+        incremental = sorted(
+            (row.patient_id, row.site_id, row.has_good_left, row.has_good_right)
+            for row in PatientSiteReadiness.query.all()
+        )
+
+        # The conftest images reference site 1 directly, so the backfill
+        # also picks up patient 1 there
+        assert readiness_service.backfill() == 3
+
+        backfilled = sorted(
+            (row.patient_id, row.site_id, row.has_good_left, row.has_good_right)
+            for row in PatientSiteReadiness.query.all()
+        )
+        assert backfilled == sorted(incremental + [(1, 1, True, False)])
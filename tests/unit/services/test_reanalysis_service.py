@@ -0,0 +1,127 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from PIL import Image as PILImage
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models.image import AnalysisStatus, Image, EyeSide
+from app.services import reanalysis_service
+from app.services.image_service import ImageService
+from app.services.reanalysis_service import ReanalysisService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestReanalysisService:
+    @pytest.fixture
+    def service(self, app, tmp_path, monkeypatch):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        # Worker processes are covered by one test; the rest run the same
+        # worker function on threads to keep the suite fast
+        monkeypatch.setattr(
+            reanalysis_service, 'ProcessPoolExecutor',
+            lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)
+        )
+        return ReanalysisService()
+
+    def upload(self, brightness, over_illuminated):
+        content = io.BytesIO()
+        PILImage.new("RGB", (32, 32), (brightness,) * 3).save(content, "PNG")
+        content.seek(0)
+        return ImageService().create_image(
+            {'patient_id': 2, 'eye_side': EyeSide.LEFT, 'over_illuminated': over_illuminated},
+            FileStorage(stream=content, filename="eye.png")
+        )
+
+    def test_records_results_in_batches(self, service):
+        bright = self.upload(250, over_illuminated=False)
+        dark = self.upload(20, over_illuminated=False)
+        modified_at = db.session.get(Image, dark.id).modified_at
+        progress = []
+
+        summary = service.reanalyze(0.9, workers=2, batch_size=2, progress=progress.append)
+
+        # The two conftest images have no files
+        assert (summary['processed'], summary['changed'], summary['failed']) == (4, 1, 2)
+        assert [entry['processed'] for entry in progress] == [2, 4]
+        assert summary['images_per_second'] > 0
+
+        db.session.expire_all()
+        assert db.session.get(Image, bright.id).over_illuminated is True
+        assert db.session.get(Image, bright.id).analysis_status == AnalysisStatus.COMPLETE
+        dark = db.session.get(Image, dark.id)
+        assert dark.analysis_status == AnalysisStatus.COMPLETE
+        assert dark.modified_at == modified_at
+        assert db.session.get(Image, 1).analysis_status == AnalysisStatus.FAILED
+
+    def test_unresolvable_path_fails_only_that_image(self, service):
+        bright = self.upload(250, over_illuminated=False)
+        db.session.get(Image, 1).image_path = "external/retired/eye.jpg"
+        db.session.commit()
+
+        summary = service.reanalyze(0.9, workers=1)
+
+        assert (summary['processed'], summary['changed'], summary['failed']) == (3, 1, 2)
+        db.session.expire_all()
+        assert db.session.get(Image, 1).analysis_status == AnalysisStatus.FAILED
+        assert db.session.get(Image, bright.id).over_illuminated is True
+
+    def test_changed_flag_updates_readiness_and_rollups(self, service, monkeypatch):
+        bright = self.upload(250, over_illuminated=False)
+        refreshed, updated = [], []
+        monkeypatch.setattr(service.readiness_service, 'refresh', lambda *key: refreshed.append(key))
+        monkeypatch.setattr(service.rollup_service, 'update_image', lambda key, image: updated.append(image.id))
+
+        service.reanalyze(0.9, workers=1)
+
+        assert refreshed == [(2, bright.site_id)]
+        assert updated == [bright.id]
+
+    def test_resumes_from_checkpoint(self, service, tmp_path):
+        self.upload(250, over_illuminated=False)
+        checkpoint = tmp_path / "checkpoint.json"
+        checkpoint.write_text(json.dumps({"threshold": 0.9, "max_edge": None, "last_id": 2}))
+
+        summary = service.reanalyze(0.9, workers=1, checkpoint_path=str(checkpoint))
+
+        assert summary['resumed_from'] == 2
+        assert (summary['processed'], summary['failed']) == (1, 0)
+        assert db.session.get(Image, 1).analysis_status is None
+        assert not checkpoint.exists()
+
+    def test_checkpoint_with_other_settings_is_ignored(self, service, tmp_path):
+        checkpoint = tmp_path / "checkpoint.json"
+        checkpoint.write_text(json.dumps({"threshold": 0.5, "max_edge": None, "last_id": 2}))
+
+        assert service.reanalyze(0.9, workers=1, checkpoint_path=str(checkpoint))['processed'] == 2
+        checkpoint.write_text(json.dumps({"threshold": 0.9, "max_edge": None, "last_id": 2}))
+        assert service.reanalyze(0.9, workers=1, checkpoint_path=str(checkpoint), restart=True)['processed'] == 2
+
+    def test_checkpoint_written_after_each_batch(self, service, tmp_path, monkeypatch):
+        checkpoint = tmp_path / "checkpoint.json"
+        saved = []
+        save = service._save_checkpoint
+        monkeypatch.setattr(service, '_save_checkpoint', lambda path, data: (saved.append(data), save(path, data)))
+
+        service.reanalyze(0.9, workers=1, batch_size=1, checkpoint_path=str(checkpoint))
+
+        assert [entry['last_id'] for entry in saved] == [1, 2]
+        assert not checkpoint.exists()
+
+
+@pytest.mark.usefixtures('app_context')
+def test_reanalyze_on_worker_processes(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+    content = io.BytesIO()
+    PILImage.new("RGB", (32, 32), (250,) * 3).save(content, "PNG")
+    content.seek(0)
+    image = ImageService().create_image(
+        {'patient_id': 2, 'eye_side': EyeSide.LEFT, 'over_illuminated': False},
+        FileStorage(stream=content, filename="eye.png")
+    )
+
+    summary = ReanalysisService().reanalyze(0.9, workers=1)
+
+    assert (summary['processed'], summary['changed'], summary['failed']) == (3, 1, 2)
+    db.session.expire_all()
+    assert db.session.get(Image, image.id).over_illuminated is True
@@ -0,0 +1,184 @@
+import pytest
+from datetime import date, datetime
+from app import db
+from app.models.image import EyeSide, ImageQualityScore, AnatomyScore
+from app.models.image_daily_rollup import ImageDailyRollup
+from app.models.site import Site
+from app.services.image_service import ImageService
+from app.services.patient_service import PatientService
+from app.services.rollup_service import RollupService
+from app.services.site_service import SiteService
+from app.services.statistics_service import StatisticsService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestRollupService:
+    @pytest.fixture
+    def rollup_service(self):
+        return RollupService()
+
+    @pytest.fixture
+    def image_service(self):
+        return ImageService()
+
+    @pytest.fixture
+    def sites(self):
+        sites = [Site(id=1, name="Main Clinic"), Site(id=2, name="Eye Center")]
+        db.session.add_all(sites)
+        db.session.commit()
+        return sites
+
+    def image_data(self, acquisition_date, **kwargs):
+        image_data = {
+            'patient_id': 2,
+            'site_id': 1,
+            'eye_side': EyeSide.LEFT,
+            'quality_score': ImageQualityScore.HIGH,
+            'anatomy_score': AnatomyScore.GOOD,
+            'over_illuminated': False,
+            'image_path': "rollup.jpg",
+            'acquisition_date': acquisition_date,
+        }
+        image_data.update(kwargs)
+        return image_data
+
+    def rollup_counts(self):
+        return sorted(
+            ((row.day, row.site_id, row.quality_score, row.image_count)
+             for row in ImageDailyRollup.query.all()),
+            key=repr
+        )
+
+    def test_create_image_updates_rollups(self, image_service, sites):
+        image_service.create_image(self.image_data(datetime(2024, 3, 4, 9, 30)))
+        image_service.create_image(self.image_data(datetime(2024, 3, 4, 15, 0)))
+        image_service.create_image(self.image_data(datetime(2024, 3, 5), quality_score=ImageQualityScore.LOW))
+
+        assert self.rollup_counts() == [
+            (date(2024, 3, 4), 1, ImageQualityScore.HIGH, 2),
+            (date(2024, 3, 5), 1, ImageQualityScore.LOW, 1),
+        ]
+
+    def test_update_and_delete_image_move_counts(self, image_service, sites):
+        image = image_service.create_image(self.image_data(datetime(2024, 3, 4)))
+
+        image_service.update_image(image.id, {'site_id': 2, 'acquisition_date': datetime(2024, 3, 6)})
+        assert self.rollup_counts() == [(date(2024, 3, 6), 2, ImageQualityScore.HIGH, 1)]
+
+        image_service.delete_image(image.id)
+        assert self.rollup_counts() == []
+
+    def test_delete_site_moves_counts_to_no_site(self, image_service, sites):
+        image_service.create_image(self.image_data(datetime(2024, 3, 4), site_id=2))
+
+        SiteService().delete_site(2)
+
+        assert self.rollup_counts() == [(date(2024, 3, 4), None, ImageQualityScore.HIGH, 1)]
+
+    def test_delete_patient_removes_counts(self, image_service, sites):
+        image_service.create_image(self.image_data(datetime(2024, 3, 4), patient_id=3))
+
+        PatientService().delete_patient(3)
+
+        assert self.rollup_counts() == []
+
+    def test_record_increments_in_place(self, rollup_service, sites):
+        key = (date(2024, 3, 4), 1, EyeSide.LEFT, ImageQualityScore.HIGH, AnatomyScore.GOOD, False)
+        rollup_service.record(key, 2)
+        rollup_service.record(key, 3)
+        rollup_service.record(key, -1)
+        db.session.commit()
+
+        assert self.rollup_counts() == [(date(2024, 3, 4), 1, ImageQualityScore.HIGH, 4)]
+
+        rollup_service.record(key, -4)
+        db.session.commit()
+        assert self.rollup_counts() == []
+
+    def test_record_adds_to_row_inserted_by_another_writer(self, rollup_service, sites, monkeypatch):
+        key = (date(2024, 3, 4), 1, EyeSide.LEFT, ImageQualityScore.HIGH, AnatomyScore.GOOD, False)
+        rollup_service.record(key, 1)
+        db.session.commit()
+        # The first update finds no row, as if the other writer committed just after it
+        increment = rollup_service._increment
+        misses = [True]
+        monkeypatch.setattr(
+            rollup_service, '_increment',
+            lambda condition, delta: False if misses and misses.pop() else increment(condition, delta)
+        )
+
+        rollup_service.record(key, 2)
+        db.session.commit()
+
+        assert self.rollup_counts() == [(date(2024, 3, 4), 1, ImageQualityScore.HIGH, 3)]
+
+    def test_rows_with_null_dimensions_are_not_duplicated(self, rollup_service, sites, monkeypatch):
+        key = (date(2024, 3, 4), None, EyeSide.LEFT, None, None, False)
+        rollup_service.record(key, 1)
+        db.session.commit()
+        # The first update finds no row, as if the other writer committed just after it
+        increment = rollup_service._increment
+        misses = [True]
+        monkeypatch.setattr(
+            rollup_service, '_increment',
+            lambda condition, delta: False if misses and misses.pop() else increment(condition, delta)
+        )
+
+        rollup_service.record(key, 1)
+        rollup_service.record(key, 1)
+        db.session.commit()
+
+        assert self.rollup_counts() == [(date(2024, 3, 4), None, None, 3)]
+        assert rollup_service.get_image_counts(start=date(2024, 3, 4), end=date(2024, 3, 4))['total_images'] == 3
+
+    def test_rebuild_matches_incremental_rollups(self, rollup_service, image_service, sites):
+        rollup_service.rebuild()
+        image_service.create_image(self.image_data(datetime(2024, 3, 4), over_illuminated=True))
+        image_service.create_image(self.image_data(datetime(2024, 3, 4, 23, 59), site_id=None))
+        image_service.create_image(self.image_data(datetime(2024, 4, 1), anatomy_score=None))
+        incremental = self.rollup_counts()
+
+        rows = rollup_service.rebuild()
+
+        assert rows == len(incremental)
+        assert self.rollup_counts() == incremental
+
+    def test_image_counts_match_statistics(self, rollup_service, sites):
+        rollup_service.rebuild()
+
+        assert rollup_service.get_image_counts() == StatisticsService().get_image_quality_statistics()
+
+    def test_image_counts_window(self, rollup_service, image_service, sites):
+        image_service.create_image(self.image_data(datetime(2030, 1, 1)))
+        image_service.create_image(self.image_data(datetime(2030, 1, 9), site_id=2, over_illuminated=True))
+        image_service.create_image(self.image_data(datetime(2030, 2, 1)))
+
+        counts = rollup_service.get_image_counts(start=date(2030, 1, 1), end=date(2030, 1, 31))
+        assert counts['total_images'] == 2
+        assert counts['illumination'] == {'OVER_ILLUMINATED': 1, 'NORMAL': 1}
+
+        counts = rollup_service.get_image_counts(start=date(2030, 1, 1), site_id=1)
+        assert counts['total_images'] == 2
+        assert counts['quality']['HIGH'] == 2
+
+    def test_trends(self, rollup_service, image_service, sites):
+        # 2030-01-07 is a Monday
+        image_service.create_image(self.image_data(datetime(2030, 1, 7)))
+        image_service.create_image(self.image_data(datetime(2030, 1, 13)))
+        image_service.create_image(self.image_data(datetime(2030, 1, 14), quality_score=ImageQualityScore.LOW))
+        image_service.create_image(self.image_data(datetime(2030, 2, 3)))
+
+        weekly = rollup_service.get_trends('week', start=date(2030, 1, 1))
+        assert [(period['period'], period['total_images']) for period in weekly] == [
+            ('2030-01-07', 2), ('2030-01-14', 1), ('2030-01-28', 1)
+        ]
+        assert weekly[1]['quality']['LOW'] == 1
+
+        monthly = rollup_service.get_trends('month', start=date(2030, 1, 1))
+        assert [(period['period'], period['total_images']) for period in monthly] == [
+            ('2030-01-01', 3), ('2030-02-01', 1)
+        ]
+
+    def test_trends_invalid_granularity(self, rollup_service):
+        with pytest.raises(ValueError):
+            rollup_service.get_trends('year')
@@ -6,8 +6,12 @@ from app.services.site_service import SiteService
 @pytest.mark.usefixtures('app_context')
 class TestSiteService:
     @pytest.fixture
-    def site_service(self):
-        return SiteService()
+    def site_service(self, mock_readiness_service, mock_data_version_service, mock_rollup_service):
+        service = SiteService()
+        service.readiness_service = mock_readiness_service
+        service.rollup_service = mock_rollup_service
+        service.data_version_service = mock_data_version_service
+        return service
     
     @pytest.fixture
     def db_session(self, monkeypatch):
@@ -172,7 +176,7 @@ class TestSiteService:
         with pytest.raises(ValueError, match="Site with ID 999 not found"):
             site_service.update_site(999, update_data)
     
-    def test_delete_site(self, site_service, db_session, monkeypatch):
+    def test_delete_site(self, site_service, db_session, mock_readiness_service, monkeypatch):
         # Mock data
         mock_site = Site(id=1, name="Main Clinic", location="New York, NY")
         
@@ -190,6 +194,7 @@ class TestSiteService:
         assert result is True
         assert len(db_session.deleted) == 1
         assert db_session.committed is True
+        assert mock_readiness_service.removed_sites == [1]
         
         # Test deleting non-existent site
         with pytest.raises(ValueError, match="Site with ID 999 not found"):
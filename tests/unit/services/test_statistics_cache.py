@@ -0,0 +1,137 @@
+import time
+
+import pytest
+from app.services.statistics_cache import StatisticsCache
+
+
+@pytest.mark.usefixtures('app_context')
+class TestStatisticsCache:
+    @pytest.fixture
+    def statistics_service(self):
+        """
+        Stub StatisticsService that counts how often the snapshot is computed
+        """
+        class MockStatisticsService:
+            def __init__(self):
+                self.snapshots = 0
+
+            def get_dashboard_snapshot(self):
+                self.snapshots += 1
+                return {
+                    'site_stats': [{'id': 1, 'name': 'Main Clinic', 'total_patients': self.snapshots}],
+                    'image_stats': {'total_images': self.snapshots},
+                    'global_stats': {'total_sites': 1},
+                }
+
+        return MockStatisticsService()
+
+    @pytest.fixture
+    def statistics_cache(self, statistics_service, mock_data_version_service):
+        return StatisticsCache(statistics_service, mock_data_version_service)
+
+    def test_reads_between_writes_are_cached(self, statistics_cache, statistics_service):
+        first = statistics_cache.get_dashboard_snapshot()
+        second = statistics_cache.get_dashboard_snapshot()
+
+        assert first is second
+        assert statistics_service.snapshots == 1
+        assert statistics_cache.get_cache_statistics()['hits'] == 1
+        assert statistics_cache.get_cache_statistics()['misses'] == 1
+
+    def test_parts_share_one_snapshot(self, statistics_cache, statistics_service):
+        assert statistics_cache.get_sites_statistics()[0]['total_patients'] == 1
+        assert statistics_cache.get_image_quality_statistics() == {'total_images': 1}
+        assert statistics_cache.get_global_statistics() == {'total_sites': 1}
+        assert statistics_service.snapshots == 1
+
+    def test_version_bump_invalidates(self, statistics_cache, statistics_service, mock_data_version_service):
+        statistics_cache.get_dashboard_snapshot()
+
+        mock_data_version_service.bump()
+
+        assert statistics_cache.get_image_quality_statistics() == {'total_images': 2}
+        assert statistics_service.snapshots == 2
+
+    def test_get_cache_statistics(self, statistics_cache):
+        assert statistics_cache.get_cache_statistics() == {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'hit_ratio': 0,
+            'refreshes': 0,
+            'entries': 0,
+        }
+
+        statistics_cache.get_dashboard_snapshot()
+        statistics_cache.get_dashboard_snapshot()
+        statistics_cache.get_dashboard_snapshot()
+        statistics_cache.get_global_statistics()
+
+        assert statistics_cache.get_cache_statistics() == {
+            'hits': 3,
+            'stale_hits': 0,
+            'misses': 1,
+            'hit_ratio': 0.75,
+            'refreshes': 0,
+            'entries': 1,
+        }
+
+        statistics_cache.clear()
+        assert statistics_cache.get_cache_statistics()['entries'] == 0
+
+    def test_get_version(self, statistics_cache, mock_data_version_service):
+        assert statistics_cache.get_version() == 0
+
+        mock_data_version_service.bump()
+
+        assert statistics_cache.get_version() == 1
+
+    @pytest.fixture
+    def background_refresh(self, app):
+        app.config['STATISTICS_BACKGROUND_REFRESH'] = True
+        app.config['STATISTICS_REFRESH_DEBOUNCE'] = 0.05
+        yield
+        app.config['STATISTICS_BACKGROUND_REFRESH'] = False
+
+    def wait_for_refreshes(self, statistics_cache, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while statistics_cache.get_cache_statistics()['refreshes'] < count:
+            assert time.monotonic() < deadline, "background refresh did not run"
+            time.sleep(0.01)
+
+    def test_stale_entry_served_while_refreshing(self, statistics_cache, statistics_service,
+                                                 mock_data_version_service, background_refresh):
+        statistics_cache.get_dashboard_snapshot()
+        mock_data_version_service.bump()
+
+        assert statistics_cache.get_served_version() == 0
+        assert statistics_cache.get_image_quality_statistics() == {'total_images': 1}
+        assert statistics_cache.get_cache_statistics()['stale_hits'] == 1
+
+        self.wait_for_refreshes(statistics_cache, 1)
+
+        assert statistics_cache.get_image_quality_statistics() == {'total_images': 2}
+        assert statistics_cache.get_served_version() == 1
+
+    def test_burst_of_writes_triggers_one_refresh(self, app, statistics_cache, statistics_service,
+                                                  mock_data_version_service, background_refresh):
+        statistics_cache.get_dashboard_snapshot()
+        assert mock_data_version_service.listeners
+
+        for _ in range(5):
+            mock_data_version_service.bump()
+            for listener in mock_data_version_service.listeners:
+                listener(app)
+
+        self.wait_for_refreshes(statistics_cache, 1)
+        time.sleep(0.2)
+
+        assert statistics_cache.get_cache_statistics()['refreshes'] == 1
+        assert statistics_service.snapshots == 2
+
+    def test_refresh_skips_current_entries(self, statistics_cache, statistics_service):
+        statistics_cache.get_dashboard_snapshot()
+
+        statistics_cache.refresh()
+
+        assert statistics_service.snapshots == 1
@@ -0,0 +1,182 @@
+import pytest
+from datetime import datetime, timezone
+from app import db
+from app.models.image import Image, EyeSide, ImageQualityScore, AnatomyScore
+from app.models.site import Site
+from app.services.image_service import ImageService
+from app.services.readiness_service import ReadinessService
+from app.services.statistics_service import StatisticsService, counter_changes, dashboard_counters
+
+
+@pytest.mark.usefixtures('app_context')
+class TestStatisticsService:
+    @pytest.fixture
+    def statistics_service(self):
+        return StatisticsService()
+
+    @pytest.fixture
+    def sample_sites(self):
+        """
+        Sites on top of the conftest data, where patient 1 already has a good
+        LEFT image and an over-illuminated RIGHT image at site 1.
+        """
+        sites = [
+            Site(id=1, name="Alpha Clinic", location="Boston, MA"),
+            Site(id=2, name="Beta Hospital", location="Denver, CO"),
+            Site(id=3, name="Gamma Center", location=None),
+        ]
+        db.session.add_all(sites)
+
+        def make_image(patient_id, site_id, eye_side, **kwargs):
+            values = {
+                'quality_score': ImageQualityScore.HIGH,
+                'anatomy_score': AnatomyScore.GOOD,
+                'over_illuminated': False,
+            }
+            values.update(kwargs)
+            return Image(
+                patient_id=patient_id,
+                site_id=site_id,
+                eye_side=eye_side,
+                image_path=f"p{patient_id}_s{site_id}_{eye_side.value}.jpg",
+                acquisition_date=datetime.now(timezone.utc),
+                **values
+            )
+
+        db.session.add_all([
+            # Patient 2 at site 1: only the left eye is usable
+            make_image(2, 1, EyeSide.LEFT),
+            make_image(2, 1, EyeSide.RIGHT, quality_score=ImageQualityScore.LOW),
+            # Patient 3 at site 2: both eyes good
+            make_image(3, 2, EyeSide.LEFT, quality_score=ImageQualityScore.ACCEPTABLE),
+            make_image(3, 2, EyeSide.RIGHT, anatomy_score=AnatomyScore.ACCEPTABLE),
+            # Patient 1 at site 2: right eye has no anatomy score
+            make_image(1, 2, EyeSide.LEFT),
+            make_image(1, 2, EyeSide.RIGHT, anatomy_score=None),
+        ])
+        db.session.commit()
+        ReadinessService().backfill()
+        return sites
+
+    def test_get_sites_statistics(self, statistics_service, sample_sites):
+        site_stats = statistics_service.get_sites_statistics()
+
+        assert [site['name'] for site in site_stats] == ["Alpha Clinic", "Beta Hospital", "Gamma Center"]
+
+        alpha, beta, gamma = site_stats
+        assert alpha == {
+            "id": 1,
+            "name": "Alpha Clinic",
+            "location": "Boston, MA",
+            "total_patients": 2,
+            "available_for_ai": 0,
+            "availability_percentage": 0,
+        }
+        assert beta["total_patients"] == 2
+        assert beta["available_for_ai"] == 1
+        assert beta["availability_percentage"] == 50.0
+        assert gamma["total_patients"] == 0
+        assert gamma["available_for_ai"] == 0
+        assert gamma["availability_percentage"] == 0
+
+    def test_patient_becomes_available(self, statistics_service, sample_sites):
+        ImageService().create_image({
+            'patient_id': 1,
+            'site_id': 1,
+            'eye_side': EyeSide.RIGHT,
+            'quality_score': ImageQualityScore.ACCEPTABLE,
+            'anatomy_score': AnatomyScore.GOOD,
+            'image_path': "p1_s1_right_retake.jpg",
+        })
+
+        alpha = statistics_service.get_sites_statistics()[0]
+
+        assert alpha["total_patients"] == 2
+        assert alpha["available_for_ai"] == 1
+        assert alpha["availability_percentage"] == 50.0
+
+    def test_get_global_statistics(self, statistics_service, sample_sites):
+        global_stats = statistics_service.get_global_statistics()
+
+        assert global_stats == {
+            "total_sites": 3,
+            "total_patients": 4,
+            "available_patients": 1,
+            "readiness_percentage": 25.0,
+        }
+
+    def test_get_image_quality_statistics(self, statistics_service, sample_sites):
+        image_stats = statistics_service.get_image_quality_statistics()
+
+        assert image_stats == {
+            "total_images": 8,
+            "quality": {"HIGH": 5, "ACCEPTABLE": 2, "LOW": 1, "UNRATED": 0},
+            "anatomy": {"GOOD": 5, "ACCEPTABLE": 2, "POOR": 0, "UNRATED": 1},
+            "illumination": {"OVER_ILLUMINATED": 1, "NORMAL": 7},
+        }
+
+    def test_get_image_quality_statistics_breakdown(self, statistics_service, sample_sites):
+        overall = statistics_service.get_image_quality_statistics()
+        by_site = statistics_service.get_image_quality_statistics(by_site=True)
+        by_site_and_eye = statistics_service.get_image_quality_statistics(by_site=True, by_eye_side=True)
+
+        # Overall distributions are unchanged by the breakdown
+        for image_stats in (by_site, by_site_and_eye):
+            totals = {key: value for key, value in image_stats.items() if key != "breakdown"}
+            assert totals == overall
+            assert sum(entry["total_images"] for entry in image_stats["breakdown"]) == 8
+
+        site_1 = next(entry for entry in by_site["breakdown"] if entry["site_id"] == 1)
+        assert site_1["total_images"] == 4
+        assert site_1["quality"]["LOW"] == 1
+        assert site_1["illumination"] == {"OVER_ILLUMINATED": 1, "NORMAL": 3}
+
+        site_2_right = next(
+            entry for entry in by_site_and_eye["breakdown"]
+            if entry["site_id"] == 2 and entry["eye_side"] == "RIGHT"
+        )
+        assert site_2_right["total_images"] == 2
+        assert site_2_right["anatomy"] == {"GOOD": 0, "ACCEPTABLE": 1, "POOR": 0, "UNRATED": 1}
+
+    def test_get_image_quality_statistics_by_eye_side(self, statistics_service, sample_sites):
+        by_eye = statistics_service.get_image_quality_statistics(by_eye_side=True)
+
+        assert [entry["eye_side"] for entry in sorted(by_eye["breakdown"], key=lambda e: e["eye_side"])] == ["LEFT", "RIGHT"]
+        assert all("site_id" not in entry for entry in by_eye["breakdown"])
+
+    def test_get_dashboard_snapshot(self, statistics_service, sample_sites):
+        snapshot = statistics_service.get_dashboard_snapshot()
+
+        assert snapshot['site_stats'] == statistics_service.get_sites_statistics()
+        assert snapshot['generated_at'].tzinfo is not None
+        assert snapshot['image_stats'] == statistics_service.get_image_quality_statistics(by_site=True)
+        assert snapshot['global_stats'] == statistics_service.get_global_statistics()
+        assert snapshot['global_stats']['total_patients'] == sum(
+            site['total_patients'] for site in snapshot['site_stats']
+        )
+
+    def test_dashboard_counters_and_changes(self, statistics_service, sample_sites):
+        snapshot = statistics_service.get_dashboard_snapshot()
+        counters = dashboard_counters(snapshot)
+        site = snapshot['site_stats'][0]
+
+        assert counters[f"site.{site['id']}.available_for_ai"] == site['available_for_ai']
+        assert counters['quality.HIGH'] == snapshot['image_stats']['quality']['HIGH']
+        assert counters['global.total_patients'] == snapshot['global_stats']['total_patients']
+        assert counter_changes(counters, counters) == {}
+
+        changed = dict(counters, **{'quality.HIGH': counters['quality.HIGH'] + 1})
+        del changed[f"site.{site['id']}.name"]
+        assert counter_changes(counters, changed) == {
+            'quality.HIGH': counters['quality.HIGH'] + 1,
+            f"site.{site['id']}.name": None,
+        }
+
+    def test_statistics_without_sites(self, statistics_service):
+        assert statistics_service.get_sites_statistics() == []
+        assert statistics_service.get_global_statistics() == {
+            "total_sites": 0,
+            "total_patients": 0,
+            "available_patients": 0,
+            "readiness_percentage": 0,
+        }
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.services.storage_service import HashingFile, StorageService, link_file
+
+
+@pytest.mark.usefixtures('app_context')
+class TestStorageService:
+    @pytest.fixture
+    def storage_service(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        return StorageService()
+
+    def test_store_blob_names_upload_by_content(self, storage_service, tmp_path):
+        upload = FileStorage(stream=io.BytesIO(b"fundus"), filename="eye.jpg")
+
+        stored = storage_service.store_blob(upload, ".jpg")
+        sha256, image_path, size, details, _ = stored
+
+        assert sha256 == hashlib.sha256(b"fundus").hexdigest()
+        assert image_path == f"blobs/{sha256[:2]}/{sha256}.jpg"
+        assert size == 6
+        assert details is None
+        assert (tmp_path / "uploads" / image_path).read_bytes() == b"fundus"
+        storage_service.settle(stored)
+        assert (tmp_path / "uploads" / image_path).read_bytes() == b"fundus"
+        assert os.listdir(tmp_path / "uploads" / "blobs") == [sha256[:2]]
+
+    def test_store_blob_twice_keeps_one_file(self, storage_service, tmp_path):
+        first = storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus"), filename="a.jpg"), ".jpg")
+        second = storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus"), filename="b.jpg"), ".jpg")
+
+        assert first[:4] == second[:4]
+        storage_service.settle(first)
+        storage_service.settle(second)
+        assert len(os.listdir(tmp_path / "uploads" / "blobs" / first.sha256[:2])) == 1
+        assert len(os.listdir(tmp_path / "uploads" / "blobs")) == 1
+
+    def test_settle_restores_file_deleted_before_commit(self, storage_service, tmp_path):
+        first = storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus")), ".jpg")
+        storage_service.settle(first)
+        second = storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus")), ".jpg")
+
+        # The last image of the first upload is deleted before the second commits
+        assert storage_service.delete_unless(first.path, lambda: False)
+        assert not (tmp_path / "uploads" / first.path).exists()
+
+        storage_service.settle(second)
+        assert (tmp_path / "uploads" / second.path).read_bytes() == b"fundus"
+
+    def test_delete_unless_referenced_after_rename(self, storage_service, tmp_path):
+        stored = storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus")), ".jpg")
+        storage_service.settle(stored)
+
+        assert not storage_service.delete_unless(stored.path, lambda: True)
+        assert (tmp_path / "uploads" / stored.path).read_bytes() == b"fundus"
+        assert len(os.listdir(tmp_path / "uploads" / "blobs" / stored.sha256[:2])) == 1
+
+    def test_store_blob_links_local_file(self, storage_service, tmp_path):
+        source = tmp_path / "archive.jpg"
+        source.write_bytes(b"fundus")
+
+        sha256, image_path, size, _, _ = storage_service.store_blob(str(source), ".jpg")
+
+        stored = tmp_path / "uploads" / image_path
+        assert stored.read_bytes() == b"fundus"
+        # A reflink or copy, never a hardlink sharing the source's inode
+        assert os.stat(stored).st_ino != os.stat(source).st_ino
+        source.write_bytes(b"edited")
+        assert stored.read_bytes() == b"fundus"
+
+    def test_path_for_rejects_paths_outside_root(self, storage_service):
+        with pytest.raises(ValueError):
+            storage_service.path_for("../outside.jpg")
+
+    def test_external_roots(self, app, storage_service, tmp_path):
+        archive = tmp_path / "archive"
+        (archive / "site1").mkdir(parents=True)
+        (archive / "site1" / "eye.jpg").write_bytes(b"fundus")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(archive)}
+
+        image_path = storage_service.image_path_for(str(archive / "site1" / "eye.jpg"))
+
+        assert image_path == "external/archive/site1/eye.jpg"
+        assert storage_service.is_external(image_path)
+        assert storage_service.path_for(image_path) == str(archive / "site1" / "eye.jpg")
+        assert storage_service.image_path_for(str(tmp_path / "uploads" / "blobs" / "a.jpg")) == "blobs/a.jpg"
+        for invalid in ("external/other/eye.jpg", "external/archive", "external/archive/../../secret"):
+            with pytest.raises(ValueError):
+                storage_service.path_for(invalid)
+        with pytest.raises(ValueError):
+            storage_service.image_path_for(str(tmp_path / "elsewhere.jpg"))
+
+    def test_register_in_place_copies_nothing(self, app, storage_service, tmp_path):
+        archive = tmp_path / "archive"
+        archive.mkdir()
+        (archive / "eye.jpg").write_bytes(b"fundus")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(archive)}
+
+        stored = storage_service.register_in_place(str(archive / "eye.jpg"), inspect=lambda path: "details")
+
+        assert stored == (None, "external/archive/eye.jpg", 6, "details", None)
+        assert not (tmp_path / "uploads").exists()
+        with pytest.raises(ValueError):
+            storage_service.register_in_place(str(tmp_path / "uploads" / "eye.jpg"))
+
+    def test_register_in_place_rejects_overlong_paths(self, app, storage_service, tmp_path):
+        nested = tmp_path / "archive"
+        for _ in range(6):
+            nested = nested / ("d" * 200)
+        nested.mkdir(parents=True)
+        (nested / "eye.jpg").write_bytes(b"fundus")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(tmp_path / "archive")}
+
+        with pytest.raises(ValueError, match="longer than 1024 characters"):
+            storage_service.register_in_place(str(nested / "eye.jpg"))
+
+    def test_external_files_are_read_only(self, app, storage_service, tmp_path):
+        archive = tmp_path / "archive"
+        archive.mkdir()
+        (archive / "eye.jpg").write_bytes(b"fundus")
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(archive)}
+
+        storage_service.delete("external/archive/eye.jpg")
+        assert (archive / "eye.jpg").exists()
+
+        app.config['EXTERNAL_IMAGE_ROOTS_READ_ONLY'] = False
+        storage_service.delete("external/archive/eye.jpg")
+        assert not (archive / "eye.jpg").exists()
+
+    def test_store_blob_links_hashed_request_file(self, storage_service, tmp_path):
+        stream = HashingFile(storage_service.blob_directory())
+        stream.write(b"fun")
+        stream.write(b"dus")
+        inode = os.stat(stream.name).st_ino
+
+        stored = storage_service.store_blob(FileStorage(stream=stream), ".jpg")
+        sha256, image_path, size, _, _ = stored
+
+        assert sha256 == hashlib.sha256(b"fundus").hexdigest()
+        assert size == 6
+        # Linked into place, not read back and copied
+        assert os.stat(tmp_path / "uploads" / image_path).st_ino == inode
+        stream.close()
+        storage_service.settle(stored)
+        assert os.stat(tmp_path / "uploads" / image_path).st_ino == inode
+        assert os.listdir(tmp_path / "uploads" / "blobs") == [sha256[:2]]
+
+    def test_store_blob_enforces_max_size(self, storage_service, tmp_path):
+        source = tmp_path / "archive.jpg"
+        source.write_bytes(b"fundus")
+
+        with pytest.raises(ValueError, match="5 byte limit"):
+            storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus")), ".jpg", max_size=5)
+        with pytest.raises(ValueError, match="5 byte limit"):
+            storage_service.store_blob(str(source), ".jpg", max_size=5)
+        assert os.listdir(tmp_path / "uploads" / "blobs") == []
+
+    def test_store_blob_discards_rejected_content(self, storage_service, tmp_path):
+        def reject(path):
+            assert open(path, "rb").read() == b"fundus"
+            raise ValueError("not an image")
+
+        with pytest.raises(ValueError, match="not an image"):
+            storage_service.store_blob(FileStorage(stream=io.BytesIO(b"fundus")), ".jpg", inspect=reject)
+        assert os.listdir(tmp_path / "uploads" / "blobs") == []
+
+    def test_hashing_file_limit_and_cleanup(self, storage_service, tmp_path):
+        stream = HashingFile(storage_service.blob_directory(), max_size=4)
+        stream.write(b"fund")
+        with pytest.raises(RequestEntityTooLarge):
+            stream.write(b"us")
+
+        stream.close()
+        assert os.listdir(tmp_path / "uploads" / "blobs") == []
+
+    def test_delete_and_clear(self, storage_service, tmp_path):
+        (tmp_path / "uploads").mkdir()
+        (tmp_path / "uploads" / "a.jpg").write_bytes(b"a")
+        (tmp_path / "uploads" / "b.jpg").write_bytes(b"b")
+
+        storage_service.delete("a.jpg")
+        storage_service.delete("missing.jpg")
+        assert os.listdir(tmp_path / "uploads") == ["b.jpg"]
+
+        storage_service.clear()
+        assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_link_file_falls_back_to_copy(tmp_path, monkeypatch):
+    source = tmp_path / "source.jpg"
+    source.write_bytes(b"fundus")
+
+    def no_link(*args):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr('app.services.storage_service._reflink', no_link)
+
+    assert link_file(str(source), str(tmp_path / "copy.jpg")) == "copy"
+    assert (tmp_path / "copy.jpg").read_bytes() == b"fundus"
@@ -0,0 +1,112 @@
+import os
+import time
+
+import pytest
+from PIL import Image as PILImage
+from app.services.thumbnail_service import (
+    THUMBNAIL_FORMATS, THUMBNAIL_SIZES, ThumbnailService, size_for_width, supported_formats
+)
+
+
+@pytest.mark.usefixtures('app_context')
+class TestThumbnailService:
+    @pytest.fixture
+    def thumbnail_service(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        os.makedirs(tmp_path / "uploads" / "blobs")
+        PILImage.new("RGB", (3000, 2000), "orange").save(tmp_path / "uploads" / "blobs" / "eye.jpg")
+        return ThumbnailService()
+
+    def test_get_thumbnail_bounds_longest_edge(self, thumbnail_service, tmp_path):
+        path = thumbnail_service.get_thumbnail("blobs/eye.jpg", "thumb")
+
+        assert path == str(tmp_path / "uploads" / "thumbnails" / "thumb" / "blobs" / "eye.jpg.jpg")
+        with PILImage.open(path) as thumbnail:
+            assert thumbnail.format == "JPEG"
+            assert max(thumbnail.size) == THUMBNAIL_SIZES["thumb"]
+            assert thumbnail.size == (256, 171)
+
+    def test_get_thumbnail_reuses_cached_file(self, thumbnail_service, monkeypatch):
+        first = thumbnail_service.get_thumbnail("blobs/eye.jpg", "medium")
+        monkeypatch.setattr(thumbnail_service, "_generate", lambda *args: pytest.fail("regenerated"))
+
+        assert thumbnail_service.get_thumbnail("blobs/eye.jpg", "medium") == first
+
+    def test_external_image_edited_in_place_is_regenerated(self, app, thumbnail_service, tmp_path):
+        archive = tmp_path / "archive"
+        archive.mkdir()
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(archive)}
+        PILImage.new("RGB", (1000, 500), "orange").save(archive / "eye.jpg")
+        path = thumbnail_service.get_thumbnail("external/archive/eye.jpg", "thumb")
+
+        PILImage.new("RGB", (500, 1000), "orange").save(archive / "eye.jpg")
+        future = time.time() + 10
+        os.utime(archive / "eye.jpg", (future, future))
+
+        assert thumbnail_service.get_thumbnail("external/archive/eye.jpg", "thumb") == path
+        with PILImage.open(path) as thumbnail:
+            assert thumbnail.size == (128, 256)
+
+    def test_get_thumbnail_rejects_unknown_size_and_missing_image(self, thumbnail_service):
+        with pytest.raises(ValueError):
+            thumbnail_service.get_thumbnail("blobs/eye.jpg", "huge")
+        with pytest.raises(FileNotFoundError):
+            thumbnail_service.get_thumbnail("blobs/missing.jpg", "thumb")
+
+    def test_backfill_and_delete(self, thumbnail_service, tmp_path):
+        (tmp_path / "uploads" / "blobs" / "broken.jpg").write_bytes(b"not an image")
+
+        assert thumbnail_service.backfill(["blobs/eye.jpg", "blobs/broken.jpg"]) == (1, 1)
+        for size in THUMBNAIL_SIZES:
+            assert os.path.exists(tmp_path / "uploads" / "thumbnails" / size / "blobs" / "eye.jpg.jpg")
+
+        thumbnail_service.delete("blobs/eye.jpg")
+
+        for size in THUMBNAIL_SIZES:
+            assert not os.path.exists(tmp_path / "uploads" / "thumbnails" / size / "blobs" / "eye.jpg.jpg")
+
+    def test_get_thumbnail_in_other_formats(self, thumbnail_service, tmp_path):
+        path = thumbnail_service.get_thumbnail("blobs/eye.jpg", "medium", "webp")
+
+        assert path.endswith("thumbnails/medium/blobs/eye.jpg.webp")
+        with PILImage.open(path) as preview:
+            assert preview.format == "WEBP"
+            assert preview.size == (1024, 683)
+        # Only the requested format is generated on demand
+        assert not os.path.exists(tmp_path / "uploads" / "thumbnails" / "medium" / "blobs" / "eye.jpg.jpg")
+
+    def test_get_thumbnail_rejects_unsupported_format(self, thumbnail_service, monkeypatch):
+        monkeypatch.setattr("app.services.thumbnail_service.supported_formats", lambda: ["webp", "jpeg"])
+
+        with pytest.raises(ValueError):
+            thumbnail_service.get_thumbnail("blobs/eye.jpg", "thumb", "avif")
+
+    def test_generate_all_writes_every_supported_format(self, thumbnail_service, tmp_path):
+        thumbnail_service.generate_all("blobs/eye.jpg")
+
+        for size in THUMBNAIL_SIZES:
+            names = sorted(os.listdir(tmp_path / "uploads" / "thumbnails" / size / "blobs"))
+            assert names == sorted(
+                f"eye.jpg{THUMBNAIL_FORMATS[format][2]}" for format in supported_formats()
+            )
+        with PILImage.open(tmp_path / "uploads" / "thumbnails" / "large" / "blobs" / "eye.jpg.jpg") as preview:
+            assert preview.size == (2048, 1365)
+            assert preview.info.get("progressive") == 1
+
+    def test_schedule_generates_in_background(self, app, thumbnail_service, tmp_path):
+        assert thumbnail_service.schedule("blobs/eye.jpg") is False
+
+        app.config['IMAGE_VARIANT_GENERATION'] = True
+        assert thumbnail_service.schedule("blobs/eye.jpg") is True
+
+        expected = tmp_path / "uploads" / "thumbnails" / "large" / "blobs" / "eye.jpg.jpg"
+        deadline = time.monotonic() + 10
+        while not os.path.exists(expected) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert os.path.exists(expected)
+
+    def test_size_for_width(self):
+        assert size_for_width(100) == "thumb"
+        assert size_for_width(256) == "thumb"
+        assert size_for_width(800) == "medium"
+        assert size_for_width(5000) == "large"
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+from PIL import Image as PILImage
+from app.services.tile_service import TileService
+
+
+@pytest.mark.usefixtures('app_context')
+class TestTileService:
+    @pytest.fixture
+    def tile_service(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        os.makedirs(tmp_path / "uploads" / "blobs")
+        PILImage.new("RGB", (600, 300), "orange").save(tmp_path / "uploads" / "blobs" / "eye.jpg")
+        return TileService()
+
+    def tile_size(self, tile_service, level, column, row):
+        with PILImage.open(tile_service.get_tile("blobs/eye.jpg", level, column, row)) as tile:
+            return tile.size
+
+    def test_generate_builds_every_level(self, tile_service, tmp_path):
+        assert tile_service.generate("blobs/eye.jpg") == (600, 300)
+
+        levels = tmp_path / "uploads" / "tiles" / "blobs" / "eye.jpg_files"
+        # ceil(log2(600)) = 10, so levels 0 (1x1) to 10 (full size)
+        assert sorted(int(name) for name in os.listdir(levels)) == list(range(11))
+        assert sorted(os.listdir(levels / "10")) == ["0_0.jpg", "0_1.jpg", "1_0.jpg", "1_1.jpg", "2_0.jpg", "2_1.jpg"]
+        assert os.listdir(levels / "0") == ["0_0.jpg"]
+
+        # Tiles overlap their neighbours by one pixel on each inner edge
+        assert self.tile_size(tile_service, 10, 0, 0) == (257, 257)
+        assert self.tile_size(tile_service, 10, 1, 0) == (258, 257)
+        assert self.tile_size(tile_service, 10, 2, 1) == (89, 45)
+        assert self.tile_size(tile_service, 9, 0, 0) == (257, 150)
+        assert self.tile_size(tile_service, 0, 0, 0) == (1, 1)
+
+    def test_descriptor_marks_complete_pyramid(self, tile_service):
+        assert tile_service.has_pyramid("blobs/eye.jpg") is False
+        with pytest.raises(FileNotFoundError):
+            tile_service.get_descriptor("blobs/eye.jpg")
+
+        tile_service.generate("blobs/eye.jpg")
+
+        assert tile_service.has_pyramid("blobs/eye.jpg") is True
+        with open(tile_service.get_descriptor("blobs/eye.jpg")) as descriptor:
+            content = descriptor.read()
+        assert 'TileSize="256"' in content
+        assert 'Overlap="1"' in content
+        assert '<Size Width="600" Height="300"/>' in content
+
+    def test_pyramid_of_edited_external_image_is_out_of_date(self, app, tile_service, tmp_path):
+        archive = tmp_path / "archive"
+        archive.mkdir()
+        app.config['EXTERNAL_IMAGE_ROOTS'] = {'archive': str(archive)}
+        PILImage.new("RGB", (600, 300), "orange").save(archive / "eye.jpg")
+        tile_service.generate("external/archive/eye.jpg")
+        assert tile_service.has_pyramid("external/archive/eye.jpg") is True
+
+        future = time.time() + 10
+        os.utime(archive / "eye.jpg", (future, future))
+
+        assert tile_service.has_pyramid("external/archive/eye.jpg") is False
+        with pytest.raises(FileNotFoundError):
+            tile_service.get_descriptor("external/archive/eye.jpg")
+        with pytest.raises(FileNotFoundError):
+            tile_service.get_tile("external/archive/eye.jpg", 0, 0, 0)
+
+    def test_delete(self, tile_service, tmp_path):
+        tile_service.generate("blobs/eye.jpg")
+
+        tile_service.delete("blobs/eye.jpg")
+
+        assert tile_service.has_pyramid("blobs/eye.jpg") is False
+        assert os.listdir(tmp_path / "uploads" / "tiles" / "blobs") == []
+
+    def test_schedule_generates_in_background(self, app, tile_service):
+        assert tile_service.schedule("blobs/eye.jpg") is False
+
+        app.config['IMAGE_TILE_GENERATION'] = True
+        assert tile_service.schedule("blobs/eye.jpg") is True
+
+        deadline = time.monotonic() + 10
+        while not tile_service.has_pyramid("blobs/eye.jpg") and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert tile_service.has_pyramid("blobs/eye.jpg") is True
+        assert tile_service.schedule("blobs/eye.jpg") is False
+
+    def test_backfill_counts_failures(self, tile_service):
+        assert tile_service.backfill(["blobs/eye.jpg", "blobs/missing.jpg"]) == (1, 1)
+        assert tile_service.has_pyramid("blobs/eye.jpg") is True